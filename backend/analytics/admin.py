@@ -1,8 +1,14 @@
 """
 Админ панель для аналитики.
 """
+from collections import Counter
+
 from django.contrib import admin
-from .models import DailyReport, UserStats
+from django.http import HttpResponse
+from django.utils.html import format_html
+
+from call_system.profiler import folded_text
+from .models import DailyReport, UserStats, RequestProfile, TaskProfile
 
 
 @admin.register(DailyReport)
@@ -20,4 +26,79 @@ class UserStatsAdmin(admin.ModelAdmin):
     
     list_display = ('user', 'total_calls', 'total_duration', 'last_call_date')
     search_fields = ('user__username',)
+    list_select_related = ('user',)
     readonly_fields = ('updated_at',)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Админ панель для профилей запросов (самые медленные первыми)."""
+    
+    list_display = ('endpoint', 'method', 'status_code', 'duration_ms', 'sample_count', 'trigger', 'created_at')
+    list_filter = ('endpoint', 'trigger', 'method')
+    search_fields = ('endpoint', 'path')
+    ordering = ('-duration_ms',)
+    exclude = ('stacks',)
+    readonly_fields = (
+        'endpoint', 'method', 'path', 'status_code', 'duration_ms',
+        'sample_count', 'trigger', 'created_at', 'top_stacks'
+    )
+    actions = ('export_folded_stacks',)
+    
+    @admin.display(description='Топ стеков (folded)')
+    def top_stacks(self, obj):
+        """Показывает самые частые стеки профиля."""
+        lines = folded_text(obj.stacks).splitlines()[:50]
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', '\n'.join(lines))
+    
+    @admin.action(description='Скачать стеки для flamegraph')
+    def export_folded_stacks(self, request, queryset):
+        """Объединяет стеки выбранных профилей в один folded файл."""
+        merged = Counter()
+        for stacks in queryset.values_list('stacks', flat=True):
+            merged.update(stacks)
+        
+        response = HttpResponse(folded_text(merged), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="profiles.folded"'
+        return response
+
+
+@admin.register(TaskProfile)
+class TaskProfileAdmin(admin.ModelAdmin):
+    """Админ панель для профилей задач Celery."""
+    
+    list_display = (
+        'task_name', 'call_id', 'state', 'wall_ms', 'cpu_ms',
+        'rss_after_mb', 'rss_delta', 'peak_rss_mb', 'pid', 'created_at'
+    )
+    list_filter = ('task_name', 'state')
+    search_fields = ('task_id', 'call_id')
+    exclude = ('stages', 'allocations')
+    readonly_fields = (
+        'task_name', 'task_id', 'call_id', 'state', 'pid', 'wall_ms', 'cpu_ms',
+        'rss_before_mb', 'rss_after_mb', 'peak_rss_mb', 'created_at',
+        'stage_breakdown', 'top_allocations'
+    )
+    
+    @admin.display(description='Прирост RSS (МБ)')
+    def rss_delta(self, obj):
+        """Прирост RSS за задачу."""
+        return round(obj.rss_delta_mb, 1)
+    
+    @admin.display(description='Этапы')
+    def stage_breakdown(self, obj):
+        """Показывает длительность этапов, самые долгие первыми."""
+        lines = [
+            f'{name}: {duration:.1f} мс'
+            for name, duration in sorted(obj.stages.items(), key=lambda x: x[1], reverse=True)
+        ]
+        return format_html('<pre>{}</pre>', '\n'.join(lines))
+    
+    @admin.display(description='Топ аллокаций')
+    def top_allocations(self, obj):
+        """Показывает строки кода с наибольшими аллокациями."""
+        lines = [
+            f"{a['size_kb']:>10.1f} КБ {a['count']:>8} {a['location']}"
+            for a in obj.allocations
+        ]
+        return format_html('<pre>{}</pre>', '\n'.join(lines) or '—')
@@ -0,0 +1,147 @@
+"""
+Команда для сводки профилей задач Celery.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.models import TaskProfile
+
+
+def _percentile(values, percent):
+    """Перцентиль по отсортированному списку (ближайший ранг)."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Command(BaseCommand):
+    """
+    Показывает самые медленные этапы, рост памяти воркеров
+    и строки кода с наибольшими аллокациями.
+    """
+    
+    help = 'Сводка профилей задач Celery за последние часы'
+    
+    def add_arguments(self, parser):
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='За сколько последних часов брать профили (по умолчанию 24)'
+        )
+        parser.add_argument(
+            '--task',
+            default='',
+            help='Имя задачи (например calls.tasks.process_call_task)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=10,
+            help='Количество строк в каждом разделе (по умолчанию 10)'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет команду."""
+        limit = options['limit']
+        threshold = timezone.now() - timedelta(hours=options['hours'])
+        
+        profiles = TaskProfile.objects.filter(created_at__gte=threshold)
+        if options['task']:
+            profiles = profiles.filter(task_name=options['task'])
+        
+        rows = list(profiles.order_by('pid', 'created_at').values(
+            'task_name', 'call_id', 'pid', 'wall_ms', 'cpu_ms',
+            'rss_before_mb', 'rss_after_mb', 'peak_rss_mb',
+            'stages', 'allocations', 'created_at'
+        ))
+        
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('Профилей задач не найдено'))
+            return
+        
+        self.stdout.write(self.style.WARNING(f'Профилей задач: {len(rows)}'))
+        
+        self._report_stages(rows, limit)
+        self._report_slowest_tasks(rows, limit)
+        self._report_memory_growth(rows, limit)
+        self._report_allocations(rows, limit)
+    
+    def _report_stages(self, rows, limit):
+        """Этапы с наибольшим суммарным временем."""
+        durations = defaultdict(list)
+        for row in rows:
+            for name, duration in row['stages'].items():
+                durations[name].append(duration)
+        
+        self.stdout.write(self.style.MIGRATE_HEADING('\nСамые медленные этапы'))
+        self.stdout.write(f'{"этап":<24}{"кол-во":>8}{"сумма, с":>12}{"средн., мс":>12}{"p95, мс":>12}{"макс., мс":>12}')
+        
+        summary = sorted(durations.items(), key=lambda x: sum(x[1]), reverse=True)
+        for name, values in summary[:limit]:
+            values.sort()
+            self.stdout.write(
+                f'{name:<24}{len(values):>8}{sum(values) / 1000:>12.1f}'
+                f'{sum(values) / len(values):>12.1f}{_percentile(values, 95):>12.1f}{values[-1]:>12.1f}'
+            )
+    
+    def _report_slowest_tasks(self, rows, limit):
+        """Самые долгие задачи и доля процессорного времени."""
+        self.stdout.write(self.style.MIGRATE_HEADING('\nСамые медленные задачи'))
+        
+        for row in sorted(rows, key=lambda r: r['wall_ms'], reverse=True)[:limit]:
+            cpu_share = row['cpu_ms'] / row['wall_ms'] * 100 if row['wall_ms'] else 0
+            peak = f"{row['peak_rss_mb']:.0f}" if row['peak_rss_mb'] is not None else '—'
+            self.stdout.write(
+                f"{row['wall_ms'] / 1000:>8.1f} с  CPU {cpu_share:>5.0f}%  "
+                f"пик RSS {peak} МБ  {row['task_name']}  звонок {row['call_id'] or '—'}"
+            )
+    
+    def _report_memory_growth(self, rows, limit):
+        """
+        Рост RSS воркеров: для каждого процесса сравнивается RSS перед первой
+        и после последней задачи, а также число задач, после которых RSS вырос.
+        Устойчивый рост на последовательных задачах указывает на утечку
+        или на кеш без ограничения размера.
+        """
+        by_pid = defaultdict(list)
+        for row in rows:
+            by_pid[row['pid']].append(row)
+        
+        growth = []
+        for pid, items in by_pid.items():
+            total = items[-1]['rss_after_mb'] - items[0]['rss_before_mb']
+            grew = sum(1 for r in items if r['rss_after_mb'] > r['rss_before_mb'])
+            growth.append((pid, len(items), items[0]['rss_before_mb'], items[-1]['rss_after_mb'], total, grew))
+        
+        self.stdout.write(self.style.MIGRATE_HEADING('\nРост памяти воркеров'))
+        self.stdout.write(f'{"pid":>8}{"задач":>8}{"RSS нач., МБ":>14}{"RSS кон., МБ":>14}{"прирост, МБ":>14}{"задач с ростом":>16}')
+        
+        for pid, count, first, last, total, grew in sorted(growth, key=lambda x: x[4], reverse=True)[:limit]:
+            line = f'{pid:>8}{count:>8}{first:>14.1f}{last:>14.1f}{total:>14.1f}{grew:>16}'
+            if count > 1 and grew == count:
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+    
+    def _report_allocations(self, rows, limit):
+        """Строки кода с наибольшими аллокациями по задачам с tracemalloc."""
+        sizes = defaultdict(float)
+        counts = defaultdict(int)
+        sampled = 0
+        for row in rows:
+            if not row['allocations']:
+                continue
+            sampled += 1
+            for item in row['allocations']:
+                sizes[item['location']] += item['size_kb']
+                counts[item['location']] += item['count']
+        
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\nТоп аллокаций (задач с tracemalloc: {sampled})'))
+        
+        for location, size in sorted(sizes.items(), key=lambda x: x[1], reverse=True)[:limit]:
+            self.stdout.write(f'{size / 1024:>10.1f} МБ {counts[location]:>10}  {location}')
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(db_index=True, max_length=200, verbose_name='Endpoint')),
+                ('method', models.CharField(max_length=10, verbose_name='HTTP метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('status_code', models.IntegerField(blank=True, null=True, verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(db_index=True, verbose_name='Длительность (мс)')),
+                ('sample_count', models.IntegerField(default=0, verbose_name='Количество сэмплов')),
+                ('stacks', models.JSONField(default=dict, verbose_name='Стеки (folded)')),
+                ('trigger', models.CharField(choices=[('sample', 'Случайная выборка'), ('header', 'Заголовок администратора')], default='sample', max_length=10, verbose_name='Причина профилирования')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-duration_ms'],
+            },
+        ),
+    ]
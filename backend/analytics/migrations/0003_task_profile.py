@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(db_index=True, max_length=200, verbose_name='Задача')),
+                ('task_id', models.CharField(max_length=255, verbose_name='ID задачи')),
+                ('call_id', models.CharField(blank=True, db_index=True, max_length=36, null=True, verbose_name='ID звонка')),
+                ('state', models.CharField(blank=True, max_length=20, verbose_name='Состояние')),
+                ('pid', models.IntegerField(verbose_name='PID воркера')),
+                ('wall_ms', models.FloatField(verbose_name='Время выполнения (мс)')),
+                ('cpu_ms', models.FloatField(verbose_name='Процессорное время (мс)')),
+                ('rss_before_mb', models.FloatField(verbose_name='RSS до задачи (МБ)')),
+                ('rss_after_mb', models.FloatField(verbose_name='RSS после задачи (МБ)')),
+                ('peak_rss_mb', models.FloatField(blank=True, null=True, verbose_name='Пиковый RSS (МБ)')),
+                ('stages', models.JSONField(default=dict, verbose_name='Этапы (мс)')),
+                ('allocations', models.JSONField(blank=True, default=list, verbose_name='Топ аллокаций (tracemalloc)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Профиль задачи',
+                'verbose_name_plural': 'Профили задач',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
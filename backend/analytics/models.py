@@ -98,3 +98,159 @@ class UserStats(models.Model):
     
     def __str__(self):
         return f"Статистика {self.user.username}"
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль HTTP запроса, снятый сэмплирующим профайлером.
+    """
+    
+    TRIGGER_CHOICES = (
+        ('sample', 'Случайная выборка'),
+        ('header', 'Заголовок администратора'),
+    )
+    
+    endpoint = models.CharField(
+        max_length=200,
+        db_index=True,
+        verbose_name='Endpoint'
+    )
+    
+    method = models.CharField(
+        max_length=10,
+        verbose_name='HTTP метод'
+    )
+    
+    path = models.CharField(
+        max_length=500,
+        verbose_name='Путь'
+    )
+    
+    status_code = models.IntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Код ответа'
+    )
+    
+    duration_ms = models.FloatField(
+        db_index=True,
+        verbose_name='Длительность (мс)'
+    )
+    
+    sample_count = models.IntegerField(
+        default=0,
+        verbose_name='Количество сэмплов'
+    )
+    
+    stacks = models.JSONField(
+        default=dict,
+        verbose_name='Стеки (folded)'
+    )
+    
+    trigger = models.CharField(
+        max_length=10,
+        choices=TRIGGER_CHOICES,
+        default='sample',
+        verbose_name='Причина профилирования'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+    
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-duration_ms']
+    
+    def __str__(self):
+        return f"{self.endpoint} {self.duration_ms:.0f} мс"
+
+
+class TaskProfile(models.Model):
+    """
+    Профиль выполнения задачи Celery (см. call_system/task_profiler.py).
+    """
+    
+    task_name = models.CharField(
+        max_length=200,
+        db_index=True,
+        verbose_name='Задача'
+    )
+    
+    task_id = models.CharField(
+        max_length=255,
+        verbose_name='ID задачи'
+    )
+    
+    call_id = models.CharField(
+        max_length=36,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='ID звонка'
+    )
+    
+    state = models.CharField(
+        max_length=20,
+        blank=True,
+        verbose_name='Состояние'
+    )
+    
+    pid = models.IntegerField(
+        verbose_name='PID воркера'
+    )
+    
+    wall_ms = models.FloatField(
+        verbose_name='Время выполнения (мс)'
+    )
+    
+    cpu_ms = models.FloatField(
+        verbose_name='Процессорное время (мс)'
+    )
+    
+    rss_before_mb = models.FloatField(
+        verbose_name='RSS до задачи (МБ)'
+    )
+    
+    rss_after_mb = models.FloatField(
+        verbose_name='RSS после задачи (МБ)'
+    )
+    
+    peak_rss_mb = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Пиковый RSS (МБ)'
+    )
+    
+    stages = models.JSONField(
+        default=dict,
+        verbose_name='Этапы (мс)'
+    )
+    
+    allocations = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Топ аллокаций (tracemalloc)'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата создания'
+    )
+    
+    class Meta:
+        verbose_name = 'Профиль задачи'
+        verbose_name_plural = 'Профили задач'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.task_name} {self.wall_ms:.0f} мс"
+    
+    @property
+    def rss_delta_mb(self):
+        """Прирост RSS за задачу."""
+        return self.rss_after_mb - self.rss_before_mb
@@ -1,12 +1,16 @@
 """
 Views для аналитики и статистики.
 """
+from collections import Counter
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from django.db.models import Count, Avg, Sum
+from django.db.models import Count, Avg, Sum, Min, Max, Q, F, Value
+from django.db.models.functions import Floor, Least
 from django.utils import timezone
 from datetime import timedelta
 
@@ -14,6 +18,42 @@ from .models import DailyReport, UserStats
 from .serializers import DailyReportSerializer, UserStatsSerializer
 from calls.models import Call, CallAnalysis
 
+# Фильтры по тональности разговора (CallAnalysis.sentiment_*), общие для отчетов
+SENTIMENT_FILTERS = (
+    'sentiment_min__lte', 'sentiment_min__gte',
+    'sentiment_trend__lte', 'sentiment_trend__gte',
+    'sentiment_final__lte', 'sentiment_final__gte',
+)
+
+SENTIMENT_PARAMETERS = [
+    OpenApiParameter(name, float, description='Фильтр по тональности (баллы от -1 до 1, тренд - в минуту)')
+    for name in SENTIMENT_FILTERS
+]
+
+
+# Акустические показатели анализа, по которым можно группировать звонки
+ACOUSTIC_DIMENSIONS = ('loudness_dbfs', 'silence_ratio', 'hold_time', 'speaking_rate')
+
+
+def sentiment_filters(params, prefix=''):
+    """
+    Условия фильтрации по тональности из параметров запроса.
+    
+    Args:
+        params: request.query_params
+        prefix: Путь до CallAnalysis ('analysis__' для звонков)
+    """
+    lookups = {}
+    for name in SENTIMENT_FILTERS:
+        value = params.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            lookups[prefix + name] = float(value)
+        except ValueError:
+            raise ValidationError({name: 'Ожидается число'})
+    return lookups
+
 
 class AnalyticsViewSet(viewsets.ViewSet):
     """
@@ -24,6 +64,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
     
     @extend_schema(
         summary="Общая статистика",
+        parameters=SENTIMENT_PARAMETERS,
         responses={200: dict}
     )
     @action(detail=False, methods=['get'])
@@ -38,6 +79,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             calls = Call.objects.all()
         else:
             calls = Call.objects.filter(user=user)
+        calls = calls.filter(**sentiment_filters(request.query_params, 'analysis__'))
         
         # Статистика за последние 30 дней
         thirty_days_ago = timezone.now() - timedelta(days=30)
@@ -57,6 +99,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
     
     @extend_schema(
         summary="Статистика по категориям",
+        parameters=SENTIMENT_PARAMETERS,
         responses={200: dict}
     )
     @action(detail=False, methods=['get'])
@@ -70,6 +113,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             analyses = CallAnalysis.objects.all()
         else:
             analyses = CallAnalysis.objects.filter(call__user=user)
+        analyses = analyses.filter(**sentiment_filters(request.query_params))
         
         # Подсчет по категориям
         categories_data = analyses.values('category').annotate(
@@ -82,6 +126,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         summary="Статистика по дням",
         parameters=[
             OpenApiParameter('days', int, description='Количество дней (по умолчанию 30)'),
+            *SENTIMENT_PARAMETERS,
         ],
         responses={200: list}
     )
@@ -99,6 +144,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
             calls = Call.objects.all()
         else:
             calls = Call.objects.filter(user=user)
+        calls = calls.filter(**sentiment_filters(request.query_params, 'analysis__'))
         
         # Группируем по дням
         daily_data = calls.filter(
@@ -116,6 +162,7 @@ class AnalyticsViewSet(viewsets.ViewSet):
         summary="Топ ключевых слов",
         parameters=[
             OpenApiParameter('limit', int, description='Количество слов (по умолчанию 20)'),
+            *SENTIMENT_PARAMETERS,
         ],
         responses={200: list}
     )
@@ -131,24 +178,125 @@ class AnalyticsViewSet(viewsets.ViewSet):
             analyses = CallAnalysis.objects.all()
         else:
             analyses = CallAnalysis.objects.filter(call__user=user)
+        analyses = analyses.filter(**sentiment_filters(request.query_params))
         
-        # Собираем все ключевые слова
-        all_keywords = {}
-        for analysis in analyses:
-            for keyword in analysis.keywords:
-                all_keywords[keyword] = all_keywords.get(keyword, 0) + 1
+        # Собираем все ключевые слова: читаем только колонку keywords,
+        # без создания объектов моделей и без загрузки всей выборки в память
+        all_keywords = Counter()
+        for keywords in analyses.values_list('keywords', flat=True).iterator(chunk_size=2000):
+            all_keywords.update(keywords)
         
         # Сортируем и ограничиваем
-        sorted_keywords = sorted(
-            all_keywords.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:limit]
+        sorted_keywords = all_keywords.most_common(limit)
         
         return Response([
             {'keyword': k, 'count': v}
             for k, v in sorted_keywords
         ])
+    
+    @extend_schema(
+        summary="Тональность разговоров",
+        parameters=SENTIMENT_PARAMETERS,
+        responses={200: dict}
+    )
+    @action(detail=False, methods=['get'])
+    def sentiment(self, request):
+        """
+        Возвращает сводку тональности по сегментам: средние минимум,
+        тренд и итог, а также число звонков, где тональность ухудшалась
+        или разговор закончился негативно.
+        """
+        user = request.user
+        
+        if user.is_admin():
+            analyses = CallAnalysis.objects.all()
+        else:
+            analyses = CallAnalysis.objects.filter(call__user=user)
+        analyses = analyses.filter(
+            sentiment_final__isnull=False,
+            **sentiment_filters(request.query_params)
+        )
+        
+        stats = analyses.aggregate(
+            total=Count('id'),
+            average_min=Avg('sentiment_min'),
+            average_trend=Avg('sentiment_trend'),
+            average_final=Avg('sentiment_final'),
+            declining=Count('id', filter=Q(sentiment_trend__lt=0)),
+            negative_final=Count('id', filter=Q(sentiment_final__lt=0)),
+        )
+        
+        return Response(stats)
+    
+    @extend_schema(
+        summary="Звонки по акустическому показателю",
+        parameters=[
+            OpenApiParameter(
+                'dimension', str,
+                description=f"Показатель: {', '.join(ACOUSTIC_DIMENSIONS)} (по умолчанию silence_ratio)"
+            ),
+            OpenApiParameter('bins', int, description='Количество интервалов (по умолчанию 5)'),
+            *SENTIMENT_PARAMETERS,
+        ],
+        responses={200: list}
+    )
+    @action(detail=False, methods=['get'])
+    def acoustics(self, request):
+        """
+        Делит диапазон показателя на равные интервалы и возвращает
+        по каждому число звонков, среднюю длительность, среднюю итоговую
+        тональность и самую частую категорию.
+        """
+        dimension = request.query_params.get('dimension', 'silence_ratio')
+        if dimension not in ACOUSTIC_DIMENSIONS:
+            raise ValidationError({'dimension': f"Допустимые значения: {', '.join(ACOUSTIC_DIMENSIONS)}"})
+        try:
+            bins = min(max(int(request.query_params.get('bins', 5)), 1), 50)
+        except ValueError:
+            raise ValidationError({'bins': 'Ожидается целое число'})
+        
+        user = request.user
+        
+        if user.is_admin():
+            analyses = CallAnalysis.objects.all()
+        else:
+            analyses = CallAnalysis.objects.filter(call__user=user)
+        analyses = analyses.filter(
+            **{f'{dimension}__isnull': False},
+            **sentiment_filters(request.query_params)
+        )
+        
+        bounds = analyses.aggregate(low=Min(dimension), high=Max(dimension))
+        low, high = bounds['low'], bounds['high']
+        if low is None:
+            return Response([])
+        width = (high - low) / bins or 1.0
+        
+        # Номер интервала считается в БД; максимум попадает в последний интервал
+        bucket = Least(Floor((F(dimension) - low) / width), Value(bins - 1.0))
+        rows = analyses.annotate(bucket=bucket).values('bucket').annotate(
+            count=Count('id'),
+            average_duration=Avg('call__duration'),
+            average_sentiment_final=Avg('sentiment_final'),
+        ).order_by('bucket')
+        
+        categories = {}
+        for row in analyses.annotate(bucket=bucket).values('bucket', 'category').annotate(
+            count=Count('id')
+        ).order_by('-count'):
+            categories.setdefault(row['bucket'], row['category'])
+        
+        return Response([
+            {
+                'from': low + row['bucket'] * width,
+                'to': low + (row['bucket'] + 1) * width,
+                'count': row['count'],
+                'average_duration': row['average_duration'],
+                'average_sentiment_final': row['average_sentiment_final'],
+                'top_category': categories.get(row['bucket']),
+            }
+            for row in rows
+        ])
 
 
 class DailyReportViewSet(viewsets.ReadOnlyModelViewSet):
@@ -181,5 +329,5 @@ class UserStatsViewSet(viewsets.ReadOnlyModelViewSet):
         """Возвращает статистику пользователя или всех для админа."""
         user = self.request.user
         if user.is_admin():
-            return UserStats.objects.all()
-        return UserStats.objects.filter(user=user)
+            return UserStats.objects.select_related('user')
+        return UserStats.objects.filter(user=user).select_related('user')
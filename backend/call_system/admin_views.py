@@ -0,0 +1,137 @@
+"""
+Служебные страницы админ панели.
+"""
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib import admin
+from django.shortcuts import render
+
+
+def read_recent_spans(path, max_bytes):
+    """
+    Читает последние спаны из JSONL файла трассировки.
+
+    Args:
+        path: Путь к файлу traces.jsonl
+        max_bytes: Сколько байт с конца файла читать
+
+    Returns:
+        list: Словари спанов
+    """
+    if not os.path.exists(path):
+        return []
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - max_bytes))
+        data = f.read()
+
+    lines = data.splitlines()
+    if size > max_bytes and lines:
+        # Первая строка, скорее всего, обрезана
+        lines = lines[1:]
+
+    spans = []
+    for line in lines:
+        try:
+            spans.append(json.loads(line))
+        except ValueError:
+            continue
+    return spans
+
+
+def _summarize_trace(trace_id, spans):
+    """Считает длительность трассировки и время по типам спанов."""
+    start = min(s['start'] for s in spans)
+    end = max(s['start'] + s['duration_ms'] / 1000 for s in spans)
+
+    by_name = defaultdict(lambda: {'count': 0, 'total_ms': 0.0})
+    for s in spans:
+        by_name[s['name']]['count'] += 1
+        by_name[s['name']]['total_ms'] += s['duration_ms']
+
+    call_ids = {s['call_id'] for s in spans if s.get('call_id')}
+
+    return {
+        'trace_id': trace_id,
+        'call_id': ', '.join(sorted(call_ids)),
+        'start': start,
+        'duration_ms': round((end - start) * 1000, 1),
+        'span_count': len(spans),
+        'breakdown': sorted(
+            ({'name': name, 'count': v['count'], 'total_ms': round(v['total_ms'], 1)}
+             for name, v in by_name.items()),
+            key=lambda x: x['total_ms'],
+            reverse=True
+        ),
+    }
+
+
+def _span_tree(spans, trace_start):
+    """Упорядочивает спаны по времени и вычисляет глубину вложенности."""
+    by_id = {s['span_id']: s for s in spans}
+
+    def depth(span):
+        level = 0
+        parent = span.get('parent_id')
+        while parent in by_id and level < 50:
+            level += 1
+            parent = by_id[parent].get('parent_id')
+        return level
+
+    rows = []
+    for s in sorted(spans, key=lambda x: x['start']):
+        rows.append(dict(
+            s,
+            depth=depth(s),
+            indent=depth(s) * 16,
+            offset_ms=round((s['start'] - trace_start) * 1000, 1),
+        ))
+    return rows
+
+
+def traces_view(request):
+    """
+    Список медленных трассировок и детализация выбранной.
+    Фильтры: ?call_id=<uuid>, ?trace_id=<id>.
+    """
+    spans = read_recent_spans(settings.TRACING_EXPORT_FILE, settings.TRACING_ADMIN_MAX_BYTES)
+
+    traces = defaultdict(list)
+    for s in spans:
+        if s.get('trace_id'):
+            traces[s['trace_id']].append(s)
+
+    call_id = request.GET.get('call_id', '').strip()
+    trace_id = request.GET.get('trace_id', '').strip()
+
+    if call_id:
+        traces = {
+            tid: items for tid, items in traces.items()
+            if any(s.get('call_id') == call_id for s in items)
+        }
+
+    summaries = sorted(
+        (_summarize_trace(tid, items) for tid, items in traces.items()),
+        key=lambda t: t['duration_ms'],
+        reverse=True
+    )[:settings.TRACING_ADMIN_LIMIT]
+
+    selected = None
+    if trace_id and trace_id in traces:
+        summary = _summarize_trace(trace_id, traces[trace_id])
+        summary['spans'] = _span_tree(traces[trace_id], summary['start'])
+        selected = summary
+
+    context = dict(
+        admin.site.each_context(request),
+        title='Трассировки обработки звонков',
+        traces=summaries,
+        selected=selected,
+        call_id=call_id,
+    )
+    return render(request, 'admin/traces.html', context)
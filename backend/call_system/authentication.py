@@ -0,0 +1,20 @@
+"""
+Аутентификация API с привязкой пользователя к контексту логов.
+"""
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .logging_config import bind_log_context
+
+
+class LoggingJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, добавляющая user_id в контекст логирования.
+    LogContextMiddleware выполняется до аутентификации DRF и видит
+    только пользователя сессии, поэтому для JWT user_id ставится здесь.
+    """
+    
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            bind_log_context(user_id=result[0].id)
+        return result
@@ -3,6 +3,7 @@
 """
 import os
 from celery import Celery
+from celery.signals import before_task_publish, task_prerun, task_postrun
 
 # Устанавливаем модуль настроек Django по умолчанию
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'call_system.settings')
@@ -16,6 +17,48 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@before_task_publish.connect
+def inject_trace_headers(headers=None, **extra):
+    """Передает trace id текущего контекста в заголовках задачи."""
+    from .tracing import inject_task_headers
+    
+    inject_task_headers(headers=headers)
+
+
+@task_prerun.connect
+def bind_task_log_context(task_id=None, task=None, args=None, kwargs=None, **extra):
+    """
+    Добавляет task_id (и call_id, если передан именованно) в контекст логов
+    и продолжает трассировку из заголовков задачи.
+    """
+    from .logging_config import bind_log_context
+    from .query_stats import start_task_tracking
+    from .task_profiler import start_task_profile
+    from .tracing import start_task_span
+    
+    bind_log_context(task_id=task_id, call_id=(kwargs or {}).get('call_id'))
+    start_task_span(task_id, task)
+    start_task_profile(task_id, task)
+    start_task_tracking(task_id)
+
+
+@task_postrun.connect
+def clear_task_log_context(task_id=None, task=None, state=None, **extra):
+    """
+    Экспортирует статистику SQL, сохраняет профиль задачи,
+    закрывает спан задачи и очищает контекст логов.
+    """
+    from .logging_config import clear_log_context
+    from .query_stats import finish_task_tracking
+    from .task_profiler import finish_task_profile
+    from .tracing import finish_task_span
+    
+    finish_task_tracking(task_id, task.name if task is not None else 'unknown')
+    finish_task_profile(task_id, state=state)
+    finish_task_span(task_id, state=state)
+    clear_log_context()
+
+
 @app.task(bind=True)
 def debug_task(self):
     """Тестовая задача для отладки."""
@@ -1,21 +1,55 @@
 """
-Health check endpoint для мониторинга.
+Health check endpoints для мониторинга.
+
+- /health/live/  — liveness, без I/O;
+- /health/ready/ — readiness, ping БД и Redis;
+- /health/       — глубокая проверка из фонового кеша.
 """
-from django.http import JsonResponse
+import logging
+
+from django.http import HttpResponse, JsonResponse
 from django.views import View
-from .monitoring import SystemMonitor
+from . import metrics
+from .monitoring import SystemMonitor, DeepHealthCache
+
+logger = logging.getLogger(__name__)
+
+
+class LivenessView(View):
+    """
+    Endpoint для проверки живости процесса (для балансировщика).
+    """
+    
+    def get(self, request):
+        """Возвращает статус процесса без обращений к сервисам."""
+        return JsonResponse(SystemMonitor.get_liveness())
+
+
+class ReadinessView(View):
+    """
+    Endpoint для проверки готовности принимать запросы.
+    """
+    
+    def get(self, request):
+        """Возвращает результат ping базы данных и Redis."""
+        readiness = SystemMonitor.get_readiness()
+        
+        status_code = 200 if readiness['status'] == 'ready' else 503
+        
+        return JsonResponse(readiness, status=status_code)
 
 
 class HealthCheckView(View):
     """
-    Endpoint для проверки здоровья системы.
+    Endpoint для глубокой проверки здоровья системы.
+    Результат берется из кеша, обновляемого в фоне.
     """
     
     def get(self, request):
         """Возвращает статус здоровья системы."""
-        health = SystemMonitor.get_system_health()
+        health = DeepHealthCache.get()
         
-        status_code = 200 if health['status'] == 'healthy' else 503
+        status_code = 503 if health['status'] == 'degraded' else 200
         
         return JsonResponse(health, status=status_code)
 
@@ -23,9 +57,23 @@ class HealthCheckView(View):
 class MetricsView(View):
     """
     Endpoint для метрик производительности.
+    ?format=prometheus отдает метрики инструментирования в текстовом формате.
     """
     
     def get(self, request):
         """Возвращает метрики производительности."""
-        metrics = SystemMonitor.get_performance_metrics()
-        return JsonResponse(metrics)
+        try:
+            instrumentation = metrics.registry.read_all()
+        except Exception as e:
+            logger.warning("Метрики инструментирования недоступны: %s", e)
+            instrumentation = {}
+        
+        if request.GET.get('format') == 'prometheus':
+            return HttpResponse(
+                metrics.prometheus_text(instrumentation),
+                content_type='text/plain; version=0.0.4; charset=utf-8'
+            )
+        
+        performance = SystemMonitor.get_performance_metrics()
+        performance['instrumentation'] = instrumentation
+        return JsonResponse(performance)
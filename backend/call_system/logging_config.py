@@ -1,7 +1,227 @@
 """
 Конфигурация логирования для проекта.
+
+Все логгеры пишут через QueueHandler: вызывающий поток (event loop daphne,
+цикл бота, воркер Celery) только кладет запись в очередь, а запись в файлы
+и консоль выполняет фоновый QueueListener. Записи форматируются в JSON и
+автоматически дополняются call_id, user_id, task_id и trace_id из
+контекстных переменных.
 """
+import atexit
+import contextvars
+import copy
+import json
+import logging
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Контекстные переменные, которые попадают в каждую запись лога
+call_id_var = contextvars.ContextVar('call_id', default=None)
+user_id_var = contextvars.ContextVar('user_id', default=None)
+task_id_var = contextvars.ContextVar('task_id', default=None)
+trace_id_var = contextvars.ContextVar('trace_id', default=None)
+
+CONTEXT_VARS = {
+    'call_id': call_id_var,
+    'user_id': user_id_var,
+    'task_id': task_id_var,
+    'trace_id': trace_id_var,
+}
+
+
+def bind_log_context(**values):
+    """
+    Устанавливает значения контекста логирования для текущего потока/задачи.
+    
+    Args:
+        **values: call_id, user_id, task_id и/или trace_id
+    """
+    for name, value in values.items():
+        CONTEXT_VARS[name].set(str(value) if value is not None else None)
+
+
+def clear_log_context():
+    """Сбрасывает все значения контекста логирования."""
+    for var in CONTEXT_VARS.values():
+        var.set(None)
+
+
+@contextmanager
+def log_context(**values):
+    """
+    Контекстный менеджер, восстанавливающий прежние значения на выходе.
+    
+    Args:
+        **values: call_id, user_id, task_id и/или trace_id
+    """
+    tokens = [
+        (CONTEXT_VARS[name], CONTEXT_VARS[name].set(str(value) if value is not None else None))
+        for name, value in values.items()
+    ]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Добавляет в запись значения контекстных переменных.
+    Должен стоять на QueueHandler, чтобы выполняться в вызывающем потоке.
+    """
+    
+    def filter(self, record):
+        for name, var in CONTEXT_VARS.items():
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только каждую N-ю запись высокочастотных событий.
+    
+    Событие помечается через extra={'sample': '<ключ>'}, частота
+    задается словарем rates: {'<ключ>': N}.
+    """
+    
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._counters = {}
+        self._lock = threading.Lock()
+    
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        rate = self.rates.get(key) if key else None
+        if not rate or rate <= 1:
+            return True
+        
+        with self._lock:
+            count = self._counters.get(key, 0)
+            self._counters[key] = count + 1
+        
+        if count % rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись лога в одну строку JSON.
+    """
+    
+    BASE_FIELDS = ('call_id', 'user_id', 'task_id', 'trace_id', 'sample_rate')
+    
+    def format(self, record):
+        payload = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'process': record.process,
+            'thread': record.threadName,
+        }
+        
+        for name in self.BASE_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                payload[name] = value
+        
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exception'] = record.exc_text
+        if record.stack_info:
+            payload['stack'] = record.stack_info
+        
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class QueueListenerHandler(QueueHandler):
+    """
+    QueueHandler со встроенным QueueListener.
+    
+    Запись в целевые обработчики выполняется в фоновом потоке.
+    После fork (воркеры Celery) слушатель перезапускается в дочернем процессе.
+    """
+    
+    _instances = []
+    
+    def __init__(self, handlers, respect_handler_level=True):
+        super().__init__(queue.Queue(-1))
+        # ConvertingList из dictConfig разрешает cfg:// ссылки при обращении по индексу
+        self.target_handlers = [handlers[i] for i in range(len(handlers))]
+        self.respect_handler_level = respect_handler_level
+        self.listener = None
+        self._start_listener()
+        QueueListenerHandler._instances.append(self)
+    
+    def _start_listener(self):
+        self.listener = QueueListener(
+            self.queue,
+            *self.target_handlers,
+            respect_handler_level=self.respect_handler_level
+        )
+        self.listener.start()
+    
+    def _restart_after_fork(self):
+        # Поток слушателя не переживает fork, очередь может быть в неконсистентном состоянии
+        self.queue = queue.Queue(-1)
+        self._start_listener()
+    
+    def stop(self):
+        """Дожидается записи оставшихся сообщений и останавливает слушатель."""
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+    
+    def prepare(self, record):
+        """
+        Готовит запись к передаче в другой поток.
+        Сообщение и traceback форматируются здесь, args отбрасываются.
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    @classmethod
+    def stop_all(cls):
+        for handler in cls._instances:
+            handler.stop()
+    
+    @classmethod
+    def restart_all_after_fork(cls):
+        for handler in cls._instances:
+            handler._restart_after_fork()
+
+
+atexit.register(QueueListenerHandler.stop_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=QueueListenerHandler.restart_all_after_fork)
+
+
+LOG_DIR = os.environ.get('LOG_DIR', 'logs')
+os.makedirs(LOG_DIR, exist_ok=True)
+
+# Формат консоли: json (по умолчанию) или verbose для локальной разработки
+CONSOLE_FORMAT = os.environ.get('LOG_CONSOLE_FORMAT', 'json')
+
+# Сэмплирование высокочастотных событий: оставляется каждая N-я запись
+LOG_SAMPLE_RATES = {
+    'segment_progress': int(os.environ.get('LOG_SEGMENT_PROGRESS_SAMPLE', '20')),
+}
 
 LOGGING = {
     'version': 1,
@@ -15,59 +235,102 @@ LOGGING = {
             'format': '[{levelname}] {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'call_system.logging_config.JsonFormatter',
+        },
+        'raw': {
+            'format': '%(message)s',
+        },
     },
     'filters': {
         'require_debug_true': {
             '()': 'django.utils.log.RequireDebugTrue',
         },
+        'context': {
+            '()': 'call_system.logging_config.ContextFilter',
+        },
+        'sampling': {
+            '()': 'call_system.logging_config.SamplingFilter',
+            'rates': LOG_SAMPLE_RATES,
+        },
     },
     'handlers': {
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
-            'formatter': 'simple'
+            'formatter': CONSOLE_FORMAT,
         },
         'file': {
             'level': 'INFO',
             'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join('logs', 'call_system.log'),
+            'filename': os.path.join(LOG_DIR, 'call_system.log'),
             'maxBytes': 1024 * 1024 * 10,  # 10 MB
             'backupCount': 5,
-            'formatter': 'verbose',
+            'formatter': 'json',
         },
         'celery_file': {
             'level': 'INFO',
             'class': 'logging.handlers.RotatingFileHandler',
-            'filename': os.path.join('logs', 'celery.log'),
+            'filename': os.path.join(LOG_DIR, 'celery.log'),
             'maxBytes': 1024 * 1024 * 10,
             'backupCount': 5,
-            'formatter': 'verbose',
+            'formatter': 'json',
+        },
+        # Спаны трассировки (см. call_system.tracing), одна JSON строка на спан;
+        # путь совпадает с settings.TRACING_EXPORT_FILE
+        'traces_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(LOG_DIR, 'traces.jsonl'),
+            'maxBytes': 1024 * 1024 * 50,
+            'backupCount': 3,
+            'formatter': 'raw',
+        },
+        # Неблокирующие обработчики: имена сортируются после целевых,
+        # поэтому dictConfig создает их последними
+        'queue': {
+            'class': 'call_system.logging_config.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.file'],
+            'filters': ['sampling', 'context'],
+        },
+        'queue_celery': {
+            'class': 'call_system.logging_config.QueueListenerHandler',
+            'handlers': ['cfg://handlers.console', 'cfg://handlers.celery_file'],
+            'filters': ['sampling', 'context'],
+        },
+        'traces_queue': {
+            'class': 'call_system.logging_config.QueueListenerHandler',
+            'handlers': ['cfg://handlers.traces_file'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'calls': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'celery': {
-            'handlers': ['console', 'celery_file'],
+            'handlers': ['queue_celery'],
             'level': 'INFO',
             'propagate': False,
         },
         'telegram_bot': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'tracing': {
+            'handlers': ['traces_queue'],
             'level': 'INFO',
             'propagate': False,
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
+        'handlers': ['queue'],
         'level': 'INFO',
     },
 }
@@ -0,0 +1,173 @@
+"""
+Метрики инструментирования (запросы к БД, задачи, конвейер обработки).
+
+Значения накапливаются в памяти процесса и раз в METRICS_FLUSH_INTERVAL
+секунд сбрасываются в Redis одним pipeline, поэтому запись метрики не
+добавляет сетевых обращений в горячий путь. Метрики всех процессов
+(daphne, воркеры Celery, бот) суммируются в Redis и отдаются /metrics/.
+"""
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'metrics:'
+NAMES_KEY = 'metrics:names'
+
+
+def _labels_key(labels):
+    """Сериализует метки в стабильную строку: a=1,b=2."""
+    return ','.join(f'{k}={labels[k]}' for k in sorted(labels))
+
+
+class MetricsRegistry:
+    """
+    Буфер метрик процесса с фоновым сбросом в Redis.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = defaultdict(float)
+        self._maxima = {}
+        self._thread = None
+        self._pid = None
+        self._client = None
+        # Процесс, в котором создан клиент (после fork соединение не переиспользуется)
+        self._client_pid = None
+    
+    def incr(self, metric, value=1, **labels):
+        """Увеличивает счетчик."""
+        key = (metric, _labels_key(labels))
+        with self._lock:
+            self._values[key] += value
+        self._ensure_flusher()
+    
+    def observe(self, metric, value, **labels):
+        """
+        Записывает наблюдение: <metric>_count, <metric>_sum и <metric>_max.
+        """
+        labels_key = _labels_key(labels)
+        with self._lock:
+            self._values[(f'{metric}_count', labels_key)] += 1
+            self._values[(f'{metric}_sum', labels_key)] += value
+            max_key = (f'{metric}_max', labels_key)
+            if value > self._maxima.get(max_key, float('-inf')):
+                self._maxima[max_key] = value
+        self._ensure_flusher()
+    
+    def flush(self):
+        """Сбрасывает накопленные значения в Redis."""
+        with self._lock:
+            values, self._values = self._values, defaultdict(float)
+            maxima, self._maxima = self._maxima, {}
+        
+        if not values and not maxima:
+            return
+        
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            names = set()
+            for (name, labels_key), value in values.items():
+                pipe.hincrbyfloat(KEY_PREFIX + name, labels_key, value)
+                names.add(name)
+            for (name, labels_key), value in maxima.items():
+                # Максимум за все время: атомарность не критична для диагностики
+                pipe.eval(
+                    "local v = redis.call('HGET', KEYS[1], ARGV[1]) "
+                    "if (not v) or tonumber(v) < tonumber(ARGV[2]) then "
+                    "redis.call('HSET', KEYS[1], ARGV[1], ARGV[2]) end",
+                    1, KEY_PREFIX + name, labels_key, value
+                )
+                names.add(name)
+            pipe.sadd(NAMES_KEY, *names)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("Не удалось сбросить метрики в Redis: %s", e)
+    
+    def read_all(self):
+        """
+        Читает все метрики из Redis.
+        
+        Returns:
+            dict: {имя: {метки: значение}}
+        """
+        client = self._get_client()
+        names = sorted(n.decode() for n in client.smembers(NAMES_KEY))
+        pipe = client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(KEY_PREFIX + name)
+        
+        result = {}
+        for name, values in zip(names, pipe.execute()):
+            result[name] = {
+                labels.decode(): float(value)
+                for labels, value in sorted(values.items())
+            }
+        return result
+    
+    def _get_client(self):
+        pid = os.getpid()
+        if self._client is None or self._client_pid != pid:
+            import redis
+            self._client = redis.Redis.from_url(
+                settings.CELERY_BROKER_URL,
+                socket_timeout=settings.HEALTH_CHECK_TIMEOUT,
+                socket_connect_timeout=settings.HEALTH_CHECK_TIMEOUT,
+            )
+            self._client_pid = pid
+        return self._client
+    
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None:
+            return
+        
+        with self._lock:
+            if self._pid == pid and self._thread is not None:
+                return
+            # После fork наследованный буфер принадлежит родителю
+            if self._pid is not None and self._pid != pid:
+                self._values = defaultdict(float)
+                self._maxima = {}
+                self._client = None
+            self._pid = pid
+            self._thread = threading.Thread(
+                target=self._run,
+                name='metrics-flush',
+                daemon=True
+            )
+            self._thread.start()
+    
+    def _run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+
+registry = MetricsRegistry()
+
+incr = registry.incr
+observe = registry.observe
+
+
+def prometheus_text(metrics):
+    """
+    Форматирует метрики в текстовый формат Prometheus.
+    
+    Args:
+        metrics: Результат MetricsRegistry.read_all()
+    """
+    lines = []
+    for name, values in metrics.items():
+        for labels_key, value in values.items():
+            labels = ','.join(
+                '{}="{}"'.format(*pair.split('=', 1))
+                for pair in labels_key.split(',') if pair
+            )
+            lines.append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+    return '\n'.join(lines) + '\n'
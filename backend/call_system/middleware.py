@@ -0,0 +1,166 @@
+"""
+HTTP middleware проекта.
+"""
+import hmac
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from .logging_config import log_context
+from .profiler import SamplingProfiler
+from .query_stats import track_queries, report
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_endpoint(view_func, request):
+    """
+    Возвращает имя endpoint вида CallViewSet.list для DRF viewset
+    или qualname функции/класса для обычных view.
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is not None:
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{cls.__name__}.{action}'
+    view_class = getattr(view_func, 'view_class', None)
+    if view_class is not None:
+        return view_class.__name__
+    return getattr(view_func, '__qualname__', repr(view_func))
+
+
+class LogContextMiddleware:
+    """
+    Изолирует контекст логирования в рамках одного запроса.
+    Значения, установленные во view (user_id, call_id), сбрасываются после ответа.
+    
+    Здесь user_id известен только при аутентификации сессией (админка):
+    JWT проверяется позже, в DRF, и user_id API запросов ставит
+    LoggingJWTAuthentication (call_system/authentication.py).
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        user = getattr(request, 'user', None)
+        user_id = user.id if user is not None and user.is_authenticated else None
+        
+        with log_context(user_id=user_id, call_id=None, task_id=None):
+            return self.get_response(request)
+
+
+class QueryStatsMiddleware:
+    """
+    Считает SQL запросы и время в БД на каждый запрос,
+    сверяет с QUERY_BUDGETS и ищет повторяющиеся запросы (N+1).
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        with track_queries() as stats:
+            response = self.get_response(request)
+        
+        endpoint = getattr(request, 'query_stats_endpoint', None)
+        if endpoint is not None:
+            report(stats, 'http', endpoint)
+            if settings.DEBUG:
+                response['X-DB-Queries'] = str(stats.count)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Запоминает имя endpoint для метрик."""
+        request.query_stats_endpoint = resolve_endpoint(view_func, request)
+
+
+class RequestProfilerMiddleware:
+    """
+    Сэмплирующее профилирование запросов (включается PROFILER_ENABLED).
+    
+    Профилируется доля запросов PROFILER_SAMPLE_RATE, а также любой запрос
+    с заголовком X-Profile-Token, равным секрету PROFILER_TOKEN.
+    Результаты сохраняются в analytics.RequestProfile и доступны в админке.
+    """
+    
+    HEADER = 'HTTP_X_PROFILE_TOKEN'
+    
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        trigger = self._get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        
+        profiler = SamplingProfiler(
+            threading.get_ident(),
+            interval=settings.PROFILER_INTERVAL
+        )
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = profiler.stop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        
+        self._store(request, response, stacks, duration_ms, trigger)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Запоминает имя endpoint для профиля."""
+        request.profiler_endpoint = resolve_endpoint(view_func, request)
+    
+    def _get_trigger(self, request):
+        token = request.META.get(self.HEADER)
+        if token and settings.PROFILER_TOKEN and hmac.compare_digest(token, settings.PROFILER_TOKEN):
+            return 'header'
+        if random.random() < settings.PROFILER_SAMPLE_RATE:
+            return 'sample'
+        return None
+    
+    def _store(self, request, response, stacks, duration_ms, trigger):
+        if not stacks:
+            return
+        
+        from analytics.models import RequestProfile
+        
+        try:
+            RequestProfile.objects.create(
+                endpoint=getattr(request, 'profiler_endpoint', request.path)[:200],
+                method=request.method,
+                path=request.path[:500],
+                status_code=getattr(response, 'status_code', None),
+                duration_ms=duration_ms,
+                sample_count=sum(stacks.values()),
+                stacks=stacks,
+                trigger=trigger
+            )
+        except Exception as e:
+            logger.error("Ошибка сохранения профиля запроса: %s", e)
+
+
+def purge_request_profiles(days=None):
+    """
+    Удаляет профили запросов старше days (по умолчанию REQUEST_PROFILE_RETENTION_DAYS).
+    
+    Returns:
+        int: Количество удаленных профилей
+    """
+    from analytics.models import RequestProfile
+    
+    if days is None:
+        days = settings.REQUEST_PROFILE_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = RequestProfile.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
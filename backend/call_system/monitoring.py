@@ -1,22 +1,97 @@
 """
 Мониторинг и метрики системы.
 """
-from django.core.management.base import BaseCommand
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Count
 from django.utils import timezone
 from datetime import timedelta
 from calls.models import Call
 from users.models import User
 
+logger = logging.getLogger(__name__)
+
 
 class SystemMonitor:
     """
     Класс для мониторинга состояния системы.
+    
+    Проверки разделены на три уровня:
+    - liveness: процесс жив, без обращений к внешним сервисам;
+    - readiness: ping базы данных и Redis;
+    - deep: полная проверка с воркерами и очередью, выполняется в фоне
+      и отдается из кеша (см. DeepHealthCache).
     """
     
+    _redis_client = None
+    
+    @staticmethod
+    def get_liveness():
+        """
+        Возвращает статус живости процесса без какого-либо I/O.
+        
+        Returns:
+            dict: Статус процесса
+        """
+        return {
+            'status': 'alive',
+            'pid': os.getpid(),
+        }
+    
+    @classmethod
+    def get_readiness(cls):
+        """
+        Проверяет готовность принимать запросы: ping БД и Redis.
+        
+        Returns:
+            dict: Статус компонентов, необходимых для обслуживания запросов
+        """
+        readiness = {
+            'status': 'ready',
+            'components': {}
+        }
+        
+        for name, check in (('database', cls.check_database), ('redis', cls.check_redis)):
+            try:
+                check()
+                readiness['components'][name] = 'healthy'
+            except Exception as e:
+                readiness['components'][name] = f'unhealthy: {str(e)}'
+                readiness['status'] = 'not_ready'
+        
+        return readiness
+    
     @staticmethod
-    def get_system_health():
+    def check_database():
+        """Выполняет легкий запрос SELECT 1 к базе данных."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    
+    @classmethod
+    def check_redis(cls):
+        """Выполняет PING к Redis брокеру с коротким таймаутом."""
+        if cls._redis_client is None:
+            import redis
+            cls._redis_client = redis.Redis.from_url(
+                settings.CELERY_BROKER_URL,
+                socket_timeout=settings.HEALTH_CHECK_TIMEOUT,
+                socket_connect_timeout=settings.HEALTH_CHECK_TIMEOUT,
+            )
+        cls._redis_client.ping()
+    
+    @classmethod
+    def get_system_health(cls):
         """
-        Возвращает статус здоровья системы.
+        Возвращает статус здоровья системы (глубокая проверка).
+        
+        Выполняется в фоне через DeepHealthCache, поэтому может
+        обращаться к воркерам Celery и считать очередь.
         
         Returns:
             dict: Статус компонентов системы
@@ -29,25 +104,45 @@ class SystemMonitor:
         
         # Проверка базы данных
         try:
-            User.objects.count()
+            cls.check_database()
             health['components']['database'] = 'healthy'
         except Exception as e:
             health['components']['database'] = f'unhealthy: {str(e)}'
             health['status'] = 'degraded'
         
-        # Проверка Redis (через Celery)
+        # Проверка Redis
         try:
-            from call_system.celery import app
-            app.control.inspect().active()
+            cls.check_redis()
             health['components']['redis'] = 'healthy'
         except Exception as e:
             health['components']['redis'] = f'unhealthy: {str(e)}'
             health['status'] = 'degraded'
         
-        # Проверка очереди задач
+        # Проверка воркеров Celery (ping вместо inspect().active())
         try:
-            pending_calls = Call.objects.filter(status='pending').count()
-            processing_calls = Call.objects.filter(status='processing').count()
+            from call_system.celery import app
+            replies = app.control.ping(timeout=settings.HEALTH_CHECK_TIMEOUT) or []
+            health['components']['workers'] = {
+                'status': 'healthy' if replies else 'unavailable',
+                'count': len(replies)
+            }
+            if not replies:
+                health['status'] = 'degraded'
+        except Exception as e:
+            health['components']['workers'] = f'unhealthy: {str(e)}'
+            health['status'] = 'degraded'
+        
+        # Проверка очереди задач (один агрегирующий запрос)
+        try:
+            counts = dict(
+                Call.objects.filter(
+                    status__in=['pending', 'processing']
+                ).values('status').annotate(
+                    count=Count('id')
+                ).values_list('status', 'count')
+            )
+            pending_calls = counts.get('pending', 0)
+            processing_calls = counts.get('processing', 0)
             
             health['components']['queue'] = {
                 'status': 'healthy',
@@ -55,7 +150,7 @@ class SystemMonitor:
                 'processing': processing_calls
             }
             
-            if pending_calls > 50:
+            if pending_calls > settings.HEALTH_QUEUE_OVERLOAD_THRESHOLD:
                 health['status'] = 'degraded'
                 health['components']['queue']['status'] = 'overloaded'
         except Exception as e:
@@ -92,3 +187,71 @@ class SystemMonitor:
         }
         
         return metrics
+
+
+class DeepHealthCache:
+    """
+    Кеш результата глубокой проверки здоровья.
+    
+    Проверка выполняется в фоновом потоке раз в
+    HEALTH_DEEP_CHECK_INTERVAL секунд, а запросы получают
+    последний результат мгновенно, не нагружая брокер.
+    """
+    
+    _lock = threading.Lock()
+    _state = None  # (результат, время проверки по monotonic)
+    _thread = None
+    _pid = None
+    
+    @classmethod
+    def get(cls):
+        """
+        Возвращает последний результат глубокой проверки.
+        
+        Returns:
+            dict: Результат проверки с возрастом кеша
+        """
+        cls._ensure_started()
+        
+        state = cls._state
+        if state is None:
+            return {
+                'status': 'starting',
+                'timestamp': timezone.now().isoformat(),
+                'components': {}
+            }
+        
+        result, checked_at = state
+        return dict(result, cache_age=round(time.monotonic() - checked_at, 3))
+    
+    @classmethod
+    def _ensure_started(cls):
+        """Запускает фоновый поток (повторно после fork)."""
+        pid = os.getpid()
+        if cls._pid == pid and cls._thread is not None and cls._thread.is_alive():
+            return
+        
+        with cls._lock:
+            if cls._pid == pid and cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._pid = pid
+            cls._thread = threading.Thread(
+                target=cls._run,
+                name='deep-health-check',
+                daemon=True
+            )
+            cls._thread.start()
+    
+    @classmethod
+    def _run(cls):
+        """Цикл фонового обновления результата."""
+        interval = settings.HEALTH_DEEP_CHECK_INTERVAL
+        while True:
+            try:
+                cls._state = (SystemMonitor.get_system_health(), time.monotonic())
+            except Exception as e:
+                logger.error("Ошибка глубокой проверки здоровья: %s", e)
+            finally:
+                # Соединения этого потока не должны висеть между проверками
+                connections.close_all()
+            time.sleep(interval)
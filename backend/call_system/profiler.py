@@ -0,0 +1,99 @@
+"""
+Статистический (сэмплирующий) профайлер для HTTP запросов.
+
+Фоновый поток с заданным интервалом снимает стек потока, обрабатывающего
+запрос, через sys._current_frames(). Стеки сохраняются в свернутом
+формате (folded stacks): "модуль:функция;модуль:функция ... N", который
+напрямую принимают flamegraph.pl и speedscope.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+
+
+def _frame_label(frame):
+    """Возвращает подпись кадра: файл:функция (без строки, чтобы сэмплы агрегировались)."""
+    code = frame.f_code
+    filename = code.co_filename
+    # Укорачиваем путь до пакета, чтобы стеки были читаемыми
+    for marker in ('site-packages' + os.sep, 'backend' + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            filename = filename[index + len(marker):]
+            break
+    return f'{filename}:{code.co_name}'
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер одного потока.
+    
+    Пример:
+        profiler = SamplingProfiler(threading.get_ident())
+        profiler.start()
+        ...
+        stacks = profiler.stop()
+    """
+    
+    def __init__(self, thread_id, interval=0.005, max_depth=128):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """Запускает поток сэмплирования."""
+        self._thread = threading.Thread(
+            target=self._run,
+            name='request-profiler',
+            daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self):
+        """
+        Останавливает сэмплирование.
+        
+        Returns:
+            dict: Свернутые стеки {стек: количество сэмплов}
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return dict(self.stacks)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            
+            # Корень стека первым, как ожидают инструменты flamegraph
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+
+def folded_text(stacks):
+    """
+    Форматирует стеки в текст для flamegraph.pl / speedscope.
+    
+    Args:
+        stacks: Словарь {стек: количество сэмплов}
+    
+    Returns:
+        str: Строки "стек количество", самые частые первыми
+    """
+    return '\n'.join(
+        f'{stack} {count}'
+        for stack, count in sorted(stacks.items(), key=lambda x: x[1], reverse=True)
+    )
+
@@ -0,0 +1,133 @@
+"""
+Учет SQL запросов в рамках HTTP запроса или задачи Celery.
+
+Через execute wrapper Django считаются количество запросов и время в БД,
+а запросы группируются по "форме" (SQL без литералов). Если одна и та же
+форма повторяется N_PLUS_ONE_THRESHOLD и более раз, это почти всегда
+N+1: обращение к связанному объекту в цикле. Итоги пишутся в метрики
+(call_system.metrics) и в лог предупреждением.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+
+# Открытые трекеры задач Celery: task_id -> (QueryStats, ExitStack)
+_task_trackers = {}
+
+
+def normalize_sql(sql):
+    """
+    Приводит SQL к форме без литералов и с единым списком IN (...).
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryStats:
+    """
+    Execute wrapper, накапливающий статистику запросов.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.shapes = Counter()
+    
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration_ms += (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.shapes[normalize_sql(sql)] += 1
+    
+    def repeated_shapes(self, threshold=None):
+        """
+        Формы запросов, повторившиеся не менее threshold раз.
+        
+        Returns:
+            list: [(sql, количество)], самые частые первыми
+        """
+        threshold = threshold or settings.N_PLUS_ONE_THRESHOLD
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+@contextmanager
+def track_queries():
+    """
+    Считает запросы ко всем базам данных внутри блока.
+    
+    Yields:
+        QueryStats: Статистика, заполняемая по мере выполнения
+    """
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+def report(stats, kind, name):
+    """
+    Экспортирует статистику в метрики и предупреждает о превышении бюджета и N+1.
+    
+    Args:
+        stats: QueryStats
+        kind: 'http' или 'task'
+        name: Имя endpoint (CallViewSet.list) или задачи
+    """
+    metrics.observe(f'{kind}_db_queries', stats.count, name=name)
+    metrics.observe(f'{kind}_db_time_ms', stats.duration_ms, name=name)
+    
+    budget = settings.QUERY_BUDGETS.get(name)
+    if budget is not None and stats.count > budget:
+        metrics.incr(f'{kind}_query_budget_exceeded', name=name)
+        logger.warning(
+            "%s: %d SQL запросов при бюджете %d",
+            name, stats.count, budget
+        )
+    
+    repeated = stats.repeated_shapes()
+    if repeated:
+        metrics.incr(f'{kind}_n_plus_one', name=name)
+        shape, count = repeated[0]
+        logger.warning(
+            "Возможный N+1 в %s: запрос выполнен %d раз: %s",
+            name, count, shape[:300]
+        )
+
+
+def start_task_tracking(task_id):
+    """Начинает учет запросов задачи. Вызывается из task_prerun."""
+    stack = ExitStack()
+    stats = stack.enter_context(track_queries())
+    _task_trackers[task_id] = (stats, stack)
+
+
+def finish_task_tracking(task_id, task_name):
+    """Завершает учет запросов задачи и экспортирует итоги. Вызывается из task_postrun."""
+    tracker = _task_trackers.pop(task_id, None)
+    if tracker is None:
+        return
+    stats, stack = tracker
+    stack.close()
+    report(stats, 'task', task_name)
@@ -6,6 +6,8 @@ from pathlib import Path
 from datetime import timedelta
 from celery.schedules import crontab
 
+from .logging_config import LOGGING, LOG_DIR
+
 # Базовая директория проекта
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,6 +52,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'call_system.middleware.LogContextMiddleware',
+    'call_system.middleware.QueryStatsMiddleware',
+    'call_system.middleware.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'call_system.urls'
@@ -57,7 +62,7 @@ ROOT_URLCONF = 'call_system.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -122,7 +127,7 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Конфигурация REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'call_system.authentication.LoggingJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -178,6 +183,23 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
+# Очередь второго прохода каскада и непиковые часы (с, до), в которые
+# воркеры TRANSCRIPTION_CASCADE_WORKER_PREFIX ее обрабатывают
+TRANSCRIPTION_CASCADE_QUEUE = os.environ.get('TRANSCRIPTION_CASCADE_QUEUE', 'offpeak')
+TRANSCRIPTION_CASCADE_WORKER_PREFIX = os.environ.get('TRANSCRIPTION_CASCADE_WORKER_PREFIX', 'offpeak@')
+TRANSCRIPTION_CASCADE_HOURS = tuple(
+    int(hour) for hour in os.environ.get('TRANSCRIPTION_CASCADE_HOURS', '22-7').split('-')
+)
+CELERY_TASK_ROUTES = {
+    # Второй проход каскада транскрипции обрабатывается отдельным воркером
+    'calls.tasks.refine_transcription_task': {
+        'queue': TRANSCRIPTION_CASCADE_QUEUE,
+    },
+    # Черновики не ждут в очереди за полными транскрипциями
+    'calls.tasks.draft_transcription_task': {
+        'queue': os.environ.get('TRANSCRIPTION_DRAFT_QUEUE', 'draft'),
+    },
+}
 
 # Celery Beat настройки
 CELERY_BEAT_SCHEDULE = {
@@ -185,6 +207,16 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'calls.tasks.generate_daily_report_task',
         'schedule': crontab(hour=0, minute=30),
     },
+    # Очередь каскада включается только в непиковые часы; проверка
+    # повторяется, чтобы перезапущенный воркер получил нужное состояние
+    'sync-offpeak-queue': {
+        'task': 'calls.tasks.sync_offpeak_queue_task',
+        'schedule': crontab(minute='*/10'),
+    },
+    'purge-profiles': {
+        'task': 'calls.tasks.purge_profiles_task',
+        'schedule': crontab(hour=1, minute=0),
+    },
 }
 
 # Telegram Bot настройки
@@ -193,7 +225,127 @@ TELEGRAM_WEBHOOK_URL = os.environ.get('TELEGRAM_WEBHOOK_URL', '')
 
 # Настройки транскрипции
 WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+# Каскад: сегменты первого прохода с низким качеством уточняет крупная модель.
+# Первый проход выполняет та же WHISPER_MODEL, поэтому уточнение добавляет
+# процессорное время к каждому звонку; включается явно (opt-in)
+TRANSCRIPTION_CASCADE_ENABLED = os.environ.get('TRANSCRIPTION_CASCADE_ENABLED', 'False') == 'True'
+WHISPER_CASCADE_MODEL = os.environ.get('WHISPER_CASCADE_MODEL', 'medium')
+TRANSCRIPTION_CASCADE_LOGPROB_THRESHOLD = -1.0
+TRANSCRIPTION_CASCADE_COMPRESSION_THRESHOLD = 2.4
+TRANSCRIPTION_CASCADE_NO_SPEECH_THRESHOLD = 0.6
+TRANSCRIPTION_CASCADE_PAD_SECONDS = 0.3
+# Черновик: быстрая модель по началу записи, публикуется до полной транскрипции
+TRANSCRIPTION_DRAFT_ENABLED = os.environ.get('TRANSCRIPTION_DRAFT_ENABLED', 'True') == 'True'
+WHISPER_DRAFT_MODEL = os.environ.get('WHISPER_DRAFT_MODEL', 'tiny')
+TRANSCRIPTION_DRAFT_SECONDS = int(os.environ.get('TRANSCRIPTION_DRAFT_SECONDS', '30'))
 SUPPORTED_LANGUAGES = ['ru', 'en']
+# Язык звонка без явно указанного языка определяется по началу записи
+LANGUAGE_DETECTION_SECONDS = 30
+# Транскрипция окнами: длительность окна PCM в памяти и длина текстового контекста
+TRANSCRIPTION_WINDOW_SECONDS = int(os.environ.get('TRANSCRIPTION_WINDOW_SECONDS', '30'))
+TRANSCRIPTION_PROMPT_CHARS = 500
+# Время отдельных слов (хранится вместе с сегментами, calls/segments.py)
+TRANSCRIPTION_WORD_TIMESTAMPS = os.environ.get('TRANSCRIPTION_WORD_TIMESTAMPS', 'False') == 'True'
+
+# Потоковая транскрипция (calls/live.py, WebSocket ws/live/): окно распознавания,
+# шаг между запусками модели, запас до конца окна, после которого сегмент фиксируется,
+# и ограничения сессии
+LIVE_WHISPER_MODEL = os.environ.get('LIVE_WHISPER_MODEL', 'base')
+LIVE_WINDOW_SECONDS = int(os.environ.get('LIVE_WINDOW_SECONDS', '30'))
+LIVE_STEP_SECONDS = float(os.environ.get('LIVE_STEP_SECONDS', '3'))
+LIVE_COMMIT_MARGIN_SECONDS = 2.0
+LIVE_MAX_BUFFER_SECONDS = int(os.environ.get('LIVE_MAX_BUFFER_SECONDS', '60'))
+LIVE_MAX_DURATION_SECONDS = int(os.environ.get('LIVE_MAX_DURATION_SECONDS', '7200'))
+LIVE_MAX_SESSIONS = int(os.environ.get('LIVE_MAX_SESSIONS', '4'))
+
+# Декодеры в процессе для WAV и Ogg/Opus (calls/decoders.py), остальные форматы - ffmpeg
+AUDIO_NATIVE_DECODING = os.environ.get('AUDIO_NATIVE_DECODING', 'True') == 'True'
+# Расширения, которые open_pcm декодирует в процессе. Ogg/Opus libsndfile
+# декодирует медленнее ffmpeg (manage.py benchmark_decoding), поэтому по умолчанию
+# только WAV; длительность Ogg/Opus по-прежнему читается из заголовка
+AUDIO_NATIVE_FORMATS = [
+    ext for ext in os.environ.get('AUDIO_NATIVE_FORMATS', '.wav,.wave').split(',') if ext
+]
+
+# Компоненты spaCy, которые анализу не нужны (синтаксис, именованные сущности)
+SPACY_DISABLED_COMPONENTS = [
+    name for name in os.environ.get('SPACY_DISABLED_COMPONENTS', 'parser,ner').split(',') if name
+]
+
+# Разделение дикторов на CPU (calls/diarization.py) и ожидаемое число дикторов
+DIARIZATION_ENABLED = os.environ.get('DIARIZATION_ENABLED', 'True') == 'True'
+DIARIZATION_SPEAKERS = int(os.environ.get('DIARIZATION_SPEAKERS', '2'))
+
+# Бюджет длины экстрактивного краткого содержания звонка (символов)
+SUMMARY_MAX_CHARS = int(os.environ.get('SUMMARY_MAX_CHARS', '600'))
+
+# Максимальная длина текста для анализа без аудио (calls/analyze-text/)
+TEXT_ANALYSIS_MAX_CHARS = int(os.environ.get('TEXT_ANALYSIS_MAX_CHARS', '100000'))
+
+# Словари категорий и тональности (calls/lexicon.py): как часто проверять,
+# изменились ли они в БД, и сколько вхождений сохранять в анализе
+LEXICON_CHECK_INTERVAL = int(os.environ.get('LEXICON_CHECK_INTERVAL', '30'))
+LEXICON_MAX_MATCHES = 500
+
+# Кеш декодированного PCM рядом с медиа файлами (calls/audio_cache.py)
+AUDIO_CACHE_ENABLED = os.environ.get('AUDIO_CACHE_ENABLED', 'True') == 'True'
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get('AUDIO_CACHE_MAX_BYTES', str(2 * 1024 ** 3)))
+# Не реже этого интервала (сек) размер кеша пересчитывается обходом каталога
+AUDIO_CACHE_SCAN_INTERVAL = int(os.environ.get('AUDIO_CACHE_SCAN_INTERVAL', '300'))
+
+# Перекрытие декодирования и инференса (calls/prefetch.py):
+# блоков по 10 с, декодируемых наперед внутри задачи, и следующих звонков в очереди
+TRANSCRIPTION_DECODE_AHEAD = int(os.environ.get('TRANSCRIPTION_DECODE_AHEAD', '3'))
+AUDIO_PREFETCH_DEPTH = int(os.environ.get('AUDIO_PREFETCH_DEPTH', '2'))
+AUDIO_PREFETCH_WORKERS = int(os.environ.get('AUDIO_PREFETCH_WORKERS', '1'))
+# Сколько секунд задача ждет предзагрузку своего файла, прежде чем декодировать сама
+AUDIO_PREFETCH_WAIT = float(os.environ.get('AUDIO_PREFETCH_WAIT', '60'))
+
+# Трассировка обработки звонков (см. call_system/tracing.py)
+TRACING_EXPORT_FILE = os.path.join(LOG_DIR, 'traces.jsonl')
+TRACING_ADMIN_MAX_BYTES = 5 * 1024 * 1024
+TRACING_ADMIN_LIMIT = 50
+
+# Сэмплирующий профайлер запросов (opt-in)
+PROFILER_ENABLED = os.environ.get('PROFILER_ENABLED', 'False') == 'True'
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0.01'))
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')  # секрет для заголовка X-Profile-Token
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', '0.005'))
+# Профили запросов старше этого срока удаляет purge_profiles_task, дней
+REQUEST_PROFILE_RETENTION_DAYS = int(os.environ.get('REQUEST_PROFILE_RETENTION_DAYS', '14'))
+
+# Профилирование задач Celery (call_system/task_profiler.py)
+TASK_PROFILER_ENABLED = os.environ.get('TASK_PROFILER_ENABLED', 'True') == 'True'
+TASK_PROFILER_TRACEMALLOC_RATE = float(os.environ.get('TASK_PROFILER_TRACEMALLOC_RATE', '0.02'))
+TASK_PROFILER_TRACEMALLOC_FRAMES = 10
+TASK_PROFILER_TOP_ALLOCATIONS = 20
+# Профили задач старше этого срока удаляет purge_profiles_task, дней
+TASK_PROFILE_RETENTION_DAYS = int(os.environ.get('TASK_PROFILE_RETENTION_DAYS', '14'))
+
+# Метрики (call_system/metrics.py): период сброса в Redis, секунд
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', '10'))
+
+# Бюджеты SQL запросов (call_system/query_stats.py): превышение пишется
+# в лог и в метрику <http|task>_query_budget_exceeded
+QUERY_BUDGETS = {
+    'CallViewSet.list': 4,
+    'CallViewSet.retrieve': 3,
+    'CallViewSet.search': 3,
+    'CallNoteViewSet.list': 3,
+    'AnalyticsViewSet.overview': 8,
+    'AnalyticsViewSet.categories': 2,
+    'AnalyticsViewSet.daily_stats': 2,
+    'AnalyticsViewSet.top_keywords': 2,
+    'UserStatsViewSet.list': 2,
+    'calls.tasks.process_call_task': 15,
+    'calls.tasks.send_notification_task': 3,
+}
+N_PLUS_ONE_THRESHOLD = 5
+
+# Health check настройки
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', '1.0'))
+HEALTH_DEEP_CHECK_INTERVAL = int(os.environ.get('HEALTH_DEEP_CHECK_INTERVAL', '30'))
+HEALTH_QUEUE_OVERLOAD_THRESHOLD = 50
 
 # Максимальный размер загружаемого файла (100MB)
 MAX_UPLOAD_SIZE = 100 * 1024 * 1024
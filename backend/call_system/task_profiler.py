@@ -0,0 +1,222 @@
+"""
+Профилирование задач Celery.
+
+Для каждой задачи (сигналы task_prerun/task_postrun) фиксируются время
+выполнения, процессорное время, RSS до и после и пиковый RSS. Пик
+сбрасывается перед задачей через /proc/self/clear_refs, поэтому он
+относится именно к задаче, а не ко всей жизни воркера. Для доли задач
+TASK_PROFILER_TRACEMALLOC_RATE включается tracemalloc и сохраняются
+строки кода с наибольшими Python аллокациями (память torch/numpy вне
+кучи Python видна только по RSS).
+
+Этапы обработки внутри задачи размечаются через stage(): длительность
+попадает в профиль задачи и, как и span(), в трассировку.
+
+Профили сохраняются в analytics.TaskProfile; сводка:
+python manage.py task_profile_report
+"""
+import contextvars
+import logging
+import os
+import random
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .logging_config import call_id_var
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_MB = 1024 * 1024
+
+_current_run = contextvars.ContextVar('task_profile_run', default=None)
+
+# Открытые профили задач: task_id -> TaskRun
+_task_runs = {}
+
+
+def read_rss_mb():
+    """Текущий RSS процесса в МБ."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / _MB
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def reset_peak_rss():
+    """
+    Сбрасывает пиковый RSS процесса (VmHWM), только Linux.
+    
+    Returns:
+        bool: True, если пик сброшен и read_peak_rss_mb() относится к интервалу
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def read_peak_rss_mb():
+    """Пиковый RSS процесса в МБ (с последнего reset_peak_rss)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class TaskRun:
+    """
+    Измерения одной задачи между task_prerun и task_postrun.
+    """
+    
+    def __init__(self, task_name):
+        self.task_name = task_name
+        self.stages = {}
+        self.peak_reset = reset_peak_rss()
+        self.rss_before = read_rss_mb()
+        self.tracing_memory = self._maybe_start_tracemalloc()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+    
+    def add_stage(self, name, duration_ms):
+        """Суммирует длительность этапа (этап может повторяться)."""
+        self.stages[name] = round(self.stages.get(name, 0.0) + duration_ms, 3)
+    
+    def finish(self):
+        """
+        Returns:
+            dict: Поля для analytics.TaskProfile
+        """
+        wall_ms = (time.perf_counter() - self._wall) * 1000
+        cpu_ms = (time.process_time() - self._cpu) * 1000
+        rss_after = read_rss_mb()
+        
+        allocations = []
+        if self.tracing_memory:
+            allocations = self._top_allocations()
+        
+        return {
+            'task_name': self.task_name,
+            'wall_ms': wall_ms,
+            'cpu_ms': cpu_ms,
+            'rss_before_mb': self.rss_before,
+            'rss_after_mb': rss_after,
+            'peak_rss_mb': read_peak_rss_mb() if self.peak_reset else None,
+            'stages': self.stages,
+            'allocations': allocations,
+        }
+    
+    def _maybe_start_tracemalloc(self):
+        if tracemalloc.is_tracing():
+            return False
+        if random.random() >= settings.TASK_PROFILER_TRACEMALLOC_RATE:
+            return False
+        tracemalloc.start(settings.TASK_PROFILER_TRACEMALLOC_FRAMES)
+        return True
+    
+    def _top_allocations(self):
+        try:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            ))
+        finally:
+            tracemalloc.stop()
+        
+        return [
+            {
+                'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count,
+            }
+            for stat in snapshot.statistics('lineno')[:settings.TASK_PROFILER_TOP_ALLOCATIONS]
+        ]
+
+
+@contextmanager
+def stage(name, **attrs):
+    """
+    Этап обработки: спан трассировки и время этапа в профиле задачи.
+    
+    Args:
+        name: Имя этапа (model_load, decode, inference, analysis...)
+        **attrs: Атрибуты спана
+    """
+    started = time.perf_counter()
+    try:
+        with span(name, **attrs) as span_attrs:
+            yield span_attrs
+    finally:
+        run = _current_run.get()
+        if run is not None:
+            run.add_stage(name, (time.perf_counter() - started) * 1000)
+
+
+def start_task_profile(task_id, task):
+    """Начинает профилирование задачи. Вызывается из task_prerun."""
+    if not settings.TASK_PROFILER_ENABLED or task is None:
+        return
+    run = TaskRun(task.name)
+    _task_runs[task_id] = run
+    _current_run.set(run)
+
+
+def finish_task_profile(task_id, state=None):
+    """Завершает профилирование задачи и сохраняет профиль. Вызывается из task_postrun."""
+    run = _task_runs.pop(task_id, None)
+    if run is None:
+        return
+    _current_run.set(None)
+    
+    data = run.finish()
+    name = data['task_name']
+    metrics.observe('task_wall_ms', data['wall_ms'], task=name)
+    metrics.observe('task_cpu_ms', data['cpu_ms'], task=name)
+    metrics.observe('task_rss_delta_mb', data['rss_after_mb'] - data['rss_before_mb'], task=name)
+    for stage_name, duration_ms in data['stages'].items():
+        metrics.observe('task_stage_ms', duration_ms, task=name, stage=stage_name)
+    
+    from analytics.models import TaskProfile
+    
+    try:
+        TaskProfile.objects.create(
+            task_id=task_id or '',
+            call_id=call_id_var.get(),
+            state=state or '',
+            pid=os.getpid(),
+            **data
+        )
+    except Exception as e:
+        logger.error("Ошибка сохранения профиля задачи: %s", e)
+
+
+def purge_task_profiles(days=None):
+    """
+    Удаляет профили задач старше days (по умолчанию TASK_PROFILE_RETENTION_DAYS).
+    
+    Returns:
+        int: Количество удаленных профилей
+    """
+    from analytics.models import TaskProfile
+    
+    if days is None:
+        days = settings.TASK_PROFILE_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = TaskProfile.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
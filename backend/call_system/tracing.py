@@ -0,0 +1,203 @@
+"""
+Легковесная трассировка обработки звонков.
+
+Trace id создается при загрузке звонка (CallViewSet.upload, upload_voice_handler),
+передается в заголовках задач Celery и в сообщениях channel layer. Спаны
+(запросы к БД, публикации в Redis, декодирование, инференс, анализ, доставка
+в WebSocket) пишутся логгером 'tracing' в JSONL файл через неблокирующую
+очередь (см. logging_config) и просматриваются в админке: /admin/traces/.
+"""
+import json
+import logging
+import os
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+
+from .logging_config import trace_id_var, call_id_var, task_id_var
+
+exporter = logging.getLogger('tracing')
+
+_span_id_var = contextvars.ContextVar('span_id', default=None)
+
+# Открытые спаны задач Celery: task_id -> Span (между task_prerun и task_postrun)
+_task_spans = {}
+
+
+def new_trace_id():
+    """Генерирует новый trace id."""
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    """Возвращает trace id текущего контекста или None."""
+    return trace_id_var.get()
+
+
+@contextmanager
+def start_trace(trace_id=None):
+    """
+    Открывает трассировку (новую или продолжает переданную).
+    
+    Args:
+        trace_id: Существующий trace id, если трассировка продолжается
+    
+    Yields:
+        str: trace id
+    """
+    token = trace_id_var.set(trace_id or new_trace_id())
+    try:
+        yield trace_id_var.get()
+    finally:
+        trace_id_var.reset(token)
+
+
+@contextmanager
+def continue_trace(trace_id):
+    """Продолжает трассировку, только если trace id передан."""
+    if not trace_id:
+        yield None
+        return
+    with start_trace(trace_id) as current:
+        yield current
+
+
+class Span:
+    """
+    Интервал выполнения внутри трассировки.
+    Создается через span() или begin_span(), завершается finish().
+    """
+    
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = trace_id_var.get()
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = _span_id_var.get()
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self._token = _span_id_var.set(self.span_id)
+    
+    def finish(self, error=None):
+        """
+        Завершает спан и отправляет его в экспортер.
+        
+        Args:
+            error: Текст ошибки, если операция завершилась исключением
+        """
+        duration_ms = (time.perf_counter() - self._started) * 1000
+        try:
+            _span_id_var.reset(self._token)
+        except ValueError:
+            # Спан завершается в другом контексте (например, другой asyncio задаче)
+            pass
+        
+        record = {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.started_at,
+            'duration_ms': round(duration_ms, 3),
+            'call_id': call_id_var.get(),
+            'task_id': task_id_var.get(),
+            'pid': os.getpid(),
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if error is not None:
+            record['error'] = error
+        
+        export_span(record)
+        return duration_ms
+
+
+def begin_span(name, **attrs):
+    """
+    Открывает спан вручную (для сигналов, где нет общего блока with).
+    
+    Returns:
+        Span | None: Спан или None, если трассировка не активна
+    """
+    if trace_id_var.get() is None:
+        return None
+    return Span(name, attrs)
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Контекстный менеджер спана. Вне трассировки ничего не делает.
+    
+    Args:
+        name: Имя операции (decode, inference, analysis, publish, db.query...)
+        **attrs: Дополнительные атрибуты спана
+    
+    Yields:
+        dict | None: Атрибуты, которые можно дополнить внутри блока
+    """
+    current = begin_span(name, **attrs)
+    if current is None:
+        yield None
+        return
+    
+    try:
+        yield current.attrs
+    except BaseException as e:
+        current.finish(error=repr(e))
+        raise
+    else:
+        current.finish()
+
+
+def export_span(record):
+    """Отправляет спан в JSONL экспортер."""
+    if exporter.isEnabledFor(logging.INFO):
+        exporter.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+def db_query_wrapper(execute, sql, params, many, context):
+    """
+    Execute wrapper Django: спан на каждый SQL запрос внутри трассировки.
+    """
+    if trace_id_var.get() is None:
+        return execute(sql, params, many, context)
+    
+    with span('db.query', sql=sql[:300], many=many):
+        return execute(sql, params, many, context)
+
+
+def install_db_tracing(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает db_query_wrapper."""
+    if db_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_query_wrapper)
+
+
+def inject_task_headers(headers=None, **kwargs):
+    """Обработчик before_task_publish: передает trace id в заголовках задачи."""
+    trace_id = trace_id_var.get()
+    if trace_id and headers is not None:
+        headers.setdefault('trace_id', trace_id)
+
+
+def start_task_span(task_id, task):
+    """
+    Продолжает трассировку из заголовков задачи и открывает спан задачи.
+    Вызывается из task_prerun.
+    """
+    trace_id = task.request.get('trace_id') if task is not None else None
+    if not trace_id:
+        return
+    trace_id_var.set(trace_id)
+    _task_spans[task_id] = Span(f'task:{task.name}', {'retries': task.request.retries})
+
+
+def finish_task_span(task_id, state=None):
+    """Закрывает спан задачи. Вызывается из task_postrun."""
+    current = _task_spans.pop(task_id, None)
+    if current is None:
+        return
+    if state:
+        current.attrs['state'] = state
+    current.finish(error=None if state in (None, 'SUCCESS') else state)
@@ -6,13 +6,17 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from .health_check import HealthCheckView, MetricsView
+from .admin_views import traces_view
+from .health_check import LivenessView, ReadinessView, HealthCheckView, MetricsView
 
 urlpatterns = [
     # Админ панель Django
+    path('admin/traces/', admin.site.admin_view(traces_view), name='admin-traces'),
     path('admin/', admin.site.urls),
     
     # Health check и метрики
+    path('health/live/', LivenessView.as_view(), name='health-live'),
+    path('health/ready/', ReadinessView.as_view(), name='health-ready'),
     path('health/', HealthCheckView.as_view(), name='health-check'),
     path('metrics/', MetricsView.as_view(), name='metrics'),
     
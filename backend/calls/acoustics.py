@@ -0,0 +1,89 @@
+"""
+Акустические показатели звонка по декодированному PCM.
+
+PCM (16 кГц, моно, из кеша транскрипции) делится на кадры по FRAME_SECONDS
+одним reshape. Для каждого кадра считается RMS, из него - громкость
+в dBFS. Все показатели вычисляются из этого массива и границ сегментов
+транскрипции:
+
+    loudness_dbfs  - средняя мощность не тихих кадров, dBFS
+    silence_ratio  - доля тихих кадров (ниже SILENCE_DBFS)
+    hold_time      - суммарная длительность отрезков без речи в транскрипции
+                     (ожидание, музыка на удержании) от HOLD_MIN_SECONDS
+    speaking_rate  - слов в минуту по времени сегментов транскрипции
+"""
+import numpy as np
+
+FRAME_SECONDS = 0.02
+SILENCE_DBFS = -45.0
+HOLD_MIN_SECONDS = 15.0
+
+EMPTY_METRICS = {
+    'loudness_dbfs': None,
+    'silence_ratio': None,
+    'hold_time': None,
+    'speaking_rate': None,
+}
+
+
+def frame_levels(pcm, sample_rate):
+    """
+    Уровень кадров в dBFS.
+    
+    Returns:
+        np.ndarray: Громкость каждого полного кадра
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    count = len(pcm) // frame
+    frames = np.asarray(pcm[:count * frame], dtype=np.float32).reshape(count, frame)
+    power = np.einsum('ij,ij->i', frames, frames) / frame
+    return 10.0 * np.log10(power + 1e-12)
+
+
+def measure(pcm, sample_rate, segments):
+    """
+    Акустические показатели звонка.
+    
+    Args:
+        pcm: Отсчеты float32
+        sample_rate: Частота дискретизации
+        segments: SegmentList транскрипции
+    
+    Returns:
+        dict: Значения полей CallAnalysis (EMPTY_METRICS для пустого аудио)
+    """
+    levels = frame_levels(pcm, sample_rate)
+    if not levels.size:
+        return dict(EMPTY_METRICS)
+    
+    silent = levels < SILENCE_DBFS
+    loud = levels[~silent]
+    loudness = 10.0 * np.log10(np.mean(10.0 ** (loud / 10.0))) if loud.size else None
+    
+    times = np.arange(levels.size) * FRAME_SECONDS
+    if len(segments):
+        starts = np.asarray(segments.starts, dtype=np.float64)
+        ends = np.asarray(segments.ends, dtype=np.float64)
+        index = np.searchsorted(starts, times, side='right') - 1
+        speech = (index >= 0) & (times < ends[np.maximum(index, 0)])
+        words = sum(len(text.split()) for text in segments.texts)
+        speech_minutes = float(np.maximum(ends - starts, 0).sum()) / 60.0
+        speaking_rate = words / speech_minutes if speech_minutes else None
+    else:
+        # Без транскрипции удержанием считаются длинные паузы
+        speech = ~silent
+        speaking_rate = None
+    
+    return {
+        'loudness_dbfs': round(float(loudness), 2) if loudness is not None else None,
+        'silence_ratio': round(float(silent.mean()), 4),
+        'hold_time': round(_long_runs(~speech, HOLD_MIN_SECONDS / FRAME_SECONDS) * FRAME_SECONDS, 2),
+        'speaking_rate': round(speaking_rate, 1) if speaking_rate is not None else None,
+    }
+
+
+def _long_runs(mask, min_length):
+    """Суммарная длина серий True в mask не короче min_length кадров."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+    return float(lengths[lengths >= min_length].sum())
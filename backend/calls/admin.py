@@ -2,7 +2,7 @@
 Админ панель для управления звонками.
 """
 from django.contrib import admin
-from .models import Call, Transcription, CallAnalysis, CallNote
+from .models import Call, Transcription, CallAnalysis, CallNote, LexiconEntry
 
 
 @admin.register(Call)
@@ -10,8 +10,9 @@ class CallAdmin(admin.ModelAdmin):
     """Админ панель для модели Call."""
     
     list_display = ('id', 'user', 'status', 'source', 'language', 'duration', 'created_at')
-    list_filter = ('status', 'source', 'language', 'created_at')
+    list_filter = ('status', 'source', 'language', 'language_source', 'created_at')
     search_fields = ('id', 'user__username')
+    list_select_related = ('user',)
     readonly_fields = ('id', 'created_at', 'updated_at')
 
 
@@ -21,6 +22,7 @@ class TranscriptionAdmin(admin.ModelAdmin):
     
     list_display = ('id', 'call', 'confidence', 'created_at')
     search_fields = ('call__id', 'text')
+    list_select_related = ('call__user',)
     readonly_fields = ('id', 'created_at')
 
 
@@ -31,6 +33,7 @@ class CallAnalysisAdmin(admin.ModelAdmin):
     list_display = ('id', 'call', 'category', 'sentiment', 'created_at')
     list_filter = ('category', 'sentiment')
     search_fields = ('call__id', 'summary')
+    list_select_related = ('call__user',)
     readonly_fields = ('id', 'created_at')
 
 
@@ -40,4 +43,16 @@ class CallNoteAdmin(admin.ModelAdmin):
     
     list_display = ('id', 'call', 'user', 'created_at')
     search_fields = ('call__id', 'user__username', 'text')
+    list_select_related = ('call__user', 'user')
     readonly_fields = ('id', 'created_at')
+
+
+@admin.register(LexiconEntry)
+class LexiconEntryAdmin(admin.ModelAdmin):
+    """Админ панель для словарей категорий и тональности."""
+    
+    list_display = ('term', 'language', 'kind', 'label', 'weight', 'is_active', 'updated_at')
+    list_filter = ('language', 'kind', 'label', 'is_active')
+    list_editable = ('weight', 'is_active')
+    search_fields = ('term',)
+    readonly_fields = ('updated_at',)
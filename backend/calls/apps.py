@@ -13,6 +13,11 @@ class CallsConfig(AppConfig):
     
     def ready(self):
         """
-        Импортирует signals при запуске приложения.
+        Импортирует signals при запуске приложения
+        и подключает трассировку SQL запросов.
         """
         import calls.signals
+        
+        from django.db.backends.signals import connection_created
+        from call_system.tracing import install_db_tracing
+        connection_created.connect(install_db_tracing)
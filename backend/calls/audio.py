@@ -0,0 +1,150 @@
+"""
+Декодирование аудио для транскрипции.
+
+Аудио читается потоком PCM (16 кГц, моно) порциями, поэтому в памяти
+одновременно находится только текущее окно, а не весь файл целиком.
+Форматы из AUDIO_NATIVE_FORMATS (по умолчанию WAV) декодируются в процессе
+(calls/decoders.py), остальные - ffmpeg, из pipe которого читается s16le.
+"""
+import json
+import logging
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+from django.conf import settings
+
+from call_system import metrics
+from . import decoders
+
+logger = logging.getLogger(__name__)
+
+# Частота дискретизации, с которой работает Whisper
+SAMPLE_RATE = 16000
+
+_BYTES_PER_SAMPLE = 2
+
+
+def open_pcm(path, sample_rate=SAMPLE_RATE, max_seconds=None):
+    """
+    Открывает поток PCM: декодером в процессе, если формат поддерживается
+    и включен в AUDIO_NATIVE_FORMATS, иначе через ffmpeg.
+    
+    Returns:
+        NativePcmStream | PcmStream: Поток с интерфейсом PcmStream
+    """
+    if settings.AUDIO_NATIVE_DECODING and os.path.splitext(path)[1].lower() in settings.AUDIO_NATIVE_FORMATS:
+        reader = decoders.open_reader(path)
+        if reader is not None:
+            metrics.incr('audio_decode', decoder='native')
+            return decoders.NativePcmStream(path, reader, sample_rate, max_seconds)
+    
+    metrics.incr('audio_decode', decoder='ffmpeg')
+    return PcmStream(path, sample_rate, max_seconds)
+
+
+def probe_duration(path):
+    """
+    Возвращает длительность аудио файла в секундах: из заголовка
+    для форматов, декодируемых в процессе, иначе по данным ffprobe.
+    
+    Returns:
+        float | None: Длительность или None, если ffprobe не смог ее определить
+    """
+    if settings.AUDIO_NATIVE_DECODING:
+        reader = decoders.open_reader(path)
+        if reader is not None:
+            try:
+                if reader.rate and reader.frames >= 0:
+                    return reader.frames / reader.rate
+            finally:
+                reader.close()
+    
+    try:
+        output = subprocess.run(
+            [
+                'ffprobe', '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'json', path
+            ],
+            capture_output=True,
+            check=True,
+            timeout=30
+        ).stdout
+        return float(json.loads(output)['format']['duration'])
+    except (OSError, subprocess.SubprocessError, KeyError, ValueError) as e:
+        logger.warning("Не удалось определить длительность %s: %s", path, e)
+        return None
+
+
+class PcmStream:
+    """
+    Поток PCM из ffmpeg.
+    
+    Пример:
+        with PcmStream(path) as stream:
+            while (chunk := stream.read(SAMPLE_RATE * 30)).size:
+                ...
+    """
+    
+    def __init__(self, path, sample_rate=SAMPLE_RATE, max_seconds=None):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.samples_read = 0
+        # Ограничение длительности: ffmpeg декодирует только начало файла
+        limit = ['-t', str(max_seconds)] if max_seconds else []
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                'ffmpeg', '-nostdin', '-loglevel', 'error', '-threads', '0',
+                '-i', path, *limit,
+                '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le',
+                '-ar', str(sample_rate), '-'
+            ],
+            stdout=subprocess.PIPE,
+            stderr=self._stderr
+        )
+    
+    def read(self, samples):
+        """
+        Читает до samples отсчетов.
+        
+        Returns:
+            np.ndarray: float32 в диапазоне [-1, 1]; короче запрошенного только в конце потока
+        """
+        data = self._process.stdout.read(samples * _BYTES_PER_SAMPLE)
+        # Нечетный хвост возможен только при обрыве потока
+        data = data[:len(data) - len(data) % _BYTES_PER_SAMPLE]
+        chunk = np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        self.samples_read += chunk.size
+        
+        if chunk.size < samples:
+            self._check_exit()
+        return chunk
+    
+    @property
+    def seconds_read(self):
+        """Длительность прочитанного аудио в секундах."""
+        return self.samples_read / self.sample_rate
+    
+    def close(self):
+        """Останавливает ffmpeg, если поток не дочитан."""
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.stdout.close()
+        self._process.wait()
+        self._stderr.close()
+    
+    def _check_exit(self):
+        code = self._process.wait()
+        if code != 0:
+            self._stderr.seek(0)
+            message = self._stderr.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError(f'Ошибка декодирования аудио ({code}): {message}')
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
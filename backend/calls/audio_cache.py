@@ -0,0 +1,335 @@
+"""
+Кеш декодированного PCM.
+
+Декодированное аудио (16 кГц, моно, float32) сохраняется в .npy рядом
+с медиа файлом звонка при первом декодировании. Повторные задачи
+(retry, повторная транскрипция, повторный анализ) открывают его через
+np.memmap и не декодируют файл повторно: страницы файла подгружаются ОС по мере
+чтения и разделяются между процессами.
+
+Общий размер кеша ограничен AUDIO_CACHE_MAX_BYTES, при превышении
+удаляются файлы, к которым дольше всего не обращались (LRU по mtime,
+который обновляется при каждом попадании). Процесс ведет оценку размера
+кеша и обходит каталог, только когда оценка превышает лимит или старше
+AUDIO_CACHE_SCAN_INTERVAL (чтобы учесть файлы других процессов).
+
+Пока файл декодирует предзагрузка (calls/prefetch.py), рядом с кешем лежит
+lock файл; задача того же звонка ждет кеш до AUDIO_PREFETCH_WAIT секунд,
+а не декодирует файл второй раз.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from call_system import metrics
+from .audio import SAMPLE_RATE, open_pcm
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.pcm16k.npy'
+
+_DTYPE = np.dtype('<f4')
+# Заголовок .npy фиксированной длины, чтобы дописать shape после записи данных
+_HEADER_SIZE = 128
+
+# Оценка размера кеша по последнему обходу и записям этого процесса
+_size_lock = threading.Lock()
+_estimated_size = None
+_scanned_at = 0.0
+# Вытеснение освобождает место с запасом, чтобы следующие записи
+# не обходили каталог сразу же снова
+EVICT_TO_RATIO = 0.9
+
+# Блокировка предзагрузки старше этого считается брошенной
+LOCK_TIMEOUT = 600
+# Период проверки, завершилась ли предзагрузка
+_LOCK_POLL_INTERVAL = 0.1
+
+
+def cache_path(audio_path):
+    """Путь к файлу кеша для аудио файла."""
+    return audio_path + SUFFIX
+
+
+def lock_path(audio_path):
+    """Путь к lock файлу предзагрузки аудио файла."""
+    return cache_path(audio_path) + '.lock'
+
+
+def _lock_active(lock):
+    try:
+        return time.time() - os.path.getmtime(lock) <= LOCK_TIMEOUT
+    except OSError:
+        return False
+
+
+def wait_for_prefetch(audio_path):
+    """
+    Если файл сейчас декодирует предзагрузка, ждет ее завершения
+    (не дольше AUDIO_PREFETCH_WAIT секунд).
+    
+    Returns:
+        bool: Ожидание было (после него стоит снова проверить кеш)
+    """
+    lock = lock_path(audio_path)
+    if not _lock_active(lock):
+        return False
+    
+    started = time.perf_counter()
+    deadline = time.monotonic() + settings.AUDIO_PREFETCH_WAIT
+    while _lock_active(lock) and time.monotonic() < deadline:
+        time.sleep(_LOCK_POLL_INTERVAL)
+    
+    metrics.observe('audio_prefetch_wait_ms', (time.perf_counter() - started) * 1000)
+    return True
+
+
+def _header(samples):
+    magic = np.lib.format.magic(1, 0)
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (_DTYPE.str, samples)
+    # 2 байта длины заголовка после magic, заголовок дополняется пробелами до '\n'
+    padding = _HEADER_SIZE - len(magic) - 2 - len(header) - 1
+    header = header + ' ' * padding + '\n'
+    return magic + len(header).to_bytes(2, 'little') + header.encode('latin1')
+
+
+def load(audio_path):
+    """
+    Открывает кеш PCM через memmap.
+    
+    Returns:
+        np.memmap | None: Отсчеты float32 или None, если кеша нет или он устарел
+    """
+    if not settings.AUDIO_CACHE_ENABLED:
+        return None
+    
+    path = cache_path(audio_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(audio_path):
+            return None
+        pcm = np.load(path, mmap_mode='r')
+        # Отметка использования для LRU
+        os.utime(path)
+        return pcm
+    except (OSError, ValueError):
+        return None
+
+
+def is_cached(audio_path):
+    """Есть ли актуальный кеш PCM (без открытия файла)."""
+    try:
+        return os.path.getmtime(cache_path(audio_path)) >= os.path.getmtime(audio_path)
+    except OSError:
+        return False
+
+
+def remove(audio_path):
+    """Удаляет кеш PCM аудио файла, если он есть."""
+    try:
+        os.remove(cache_path(audio_path))
+    except FileNotFoundError:
+        pass
+
+
+class MappedPcmStream:
+    """
+    Поток поверх закешированного PCM с интерфейсом PcmStream.
+    """
+    
+    def __init__(self, pcm, sample_rate=SAMPLE_RATE):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.samples_read = 0
+    
+    def read(self, samples):
+        chunk = self.pcm[self.samples_read:self.samples_read + samples]
+        self.samples_read += chunk.size
+        return chunk
+    
+    @property
+    def seconds_read(self):
+        return self.samples_read / self.sample_rate
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CachingPcmStream:
+    """
+    Поток PCM (open_pcm), который по мере чтения записывает PCM в файл кеша.
+    Кеш публикуется только если поток прочитан до конца без ошибок.
+    """
+    
+    def __init__(self, path, sample_rate=SAMPLE_RATE):
+        self.stream = open_pcm(path, sample_rate)
+        self.sample_rate = sample_rate
+        self._target = cache_path(path)
+        self._partial = f'{self._target}.{os.getpid()}.{threading.get_ident()}.part'
+        self._complete = False
+        try:
+            self._file = open(self._partial, 'wb')
+            self._file.write(_header(0))
+        except OSError as e:
+            logger.warning("Кеш PCM недоступен для %s: %s", path, e)
+            self._file = None
+    
+    def read(self, samples):
+        chunk = self.stream.read(samples)
+        if self._file is not None:
+            self._file.write(chunk.astype(_DTYPE, copy=False).tobytes())
+        if chunk.size < samples:
+            self._complete = True
+        return chunk
+    
+    @property
+    def samples_read(self):
+        return self.stream.samples_read
+    
+    @property
+    def seconds_read(self):
+        return self.stream.seconds_read
+    
+    def close(self):
+        self.stream.close()
+        if self._file is None:
+            return
+        
+        try:
+            if self._complete:
+                self._file.seek(0)
+                self._file.write(_header(self.samples_read))
+                self._file.close()
+                os.replace(self._partial, self._target)
+                _stored(_HEADER_SIZE + self.samples_read * _DTYPE.itemsize)
+            else:
+                self._file.close()
+                os.remove(self._partial)
+        except OSError as e:
+            logger.warning("Ошибка записи кеша PCM %s: %s", self._target, e)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_stream(audio_path):
+    """
+    Открывает поток PCM: из кеша, если он есть, иначе декодирует
+    файл (open_pcm) с одновременным заполнением кеша.
+    """
+    pcm = load(audio_path)
+    if pcm is None and wait_for_prefetch(audio_path):
+        pcm = load(audio_path)
+    if pcm is not None:
+        return MappedPcmStream(pcm)
+    if settings.AUDIO_CACHE_ENABLED:
+        return CachingPcmStream(audio_path)
+    return open_pcm(audio_path)
+
+
+def load_pcm(audio_path, wait=True):
+    """
+    Возвращает весь PCM файла для произвольного доступа (по отрезкам сегментов).
+    Если кеша нет, файл декодируется и кешируется.
+    
+    Args:
+        audio_path: Путь к аудио файлу
+        wait: Ждать идущую предзагрузку файла (сама предзагрузка передает False)
+    
+    Returns:
+        np.ndarray: Отсчеты float32 (np.memmap, если кеш включен)
+    """
+    pcm = load(audio_path)
+    if pcm is None and wait and wait_for_prefetch(audio_path):
+        pcm = load(audio_path)
+    if pcm is not None:
+        return pcm
+    
+    if settings.AUDIO_CACHE_ENABLED:
+        with CachingPcmStream(audio_path) as stream:
+            _read_all(stream, keep=False)
+        pcm = load(audio_path)
+        if pcm is not None:
+            return pcm
+    
+    # Кеш выключен или не записался: держим PCM в памяти
+    with open_pcm(audio_path) as stream:
+        return _read_all(stream, keep=True)
+
+
+def _read_all(stream, keep):
+    window = SAMPLE_RATE * 60
+    chunks = []
+    while True:
+        chunk = stream.read(window)
+        if keep:
+            chunks.append(chunk)
+        if chunk.size < window:
+            break
+    return np.concatenate(chunks) if keep else None
+
+
+def _stored(size):
+    """
+    Учитывает записанный файл кеша; каталог обходится (evict), только
+    если оценка размера превысила лимит или устарела.
+    """
+    global _estimated_size
+    with _size_lock:
+        fresh = _estimated_size is not None and time.monotonic() - _scanned_at < settings.AUDIO_CACHE_SCAN_INTERVAL
+        if fresh:
+            _estimated_size += size
+            if _estimated_size <= settings.AUDIO_CACHE_MAX_BYTES:
+                return
+    evict()
+
+
+def evict(max_bytes=None):
+    """
+    Если общий размер превышает AUDIO_CACHE_MAX_BYTES, удаляет самые
+    давно использованные файлы кеша, пока размер не станет не больше
+    EVICT_TO_RATIO от лимита.
+    """
+    global _estimated_size, _scanned_at
+    max_bytes = settings.AUDIO_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    root = os.path.join(settings.MEDIA_ROOT, 'calls')
+    
+    entries = []
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total = sum(size for _, size, _ in entries)
+    target = max_bytes * EVICT_TO_RATIO if total > max_bytes else total
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            logger.info("Удален кеш PCM %s", path)
+        except FileNotFoundError:
+            total -= size
+    
+    with _size_lock:
+        _estimated_size = total
+        _scanned_at = time.monotonic()
@@ -1,16 +1,36 @@
 """
 WebSocket consumers для real-time обновлений.
 """
+import asyncio
 import json
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 import logging
 
+from call_system.tracing import continue_trace, span
+
 logger = logging.getLogger(__name__)
 
 
-class TranscriptionConsumer(AsyncWebsocketConsumer):
+class TracedSendMixin:
+    """
+    Отправка событий channel layer клиенту с продолжением трассировки.
+    """
+    
+    async def send_event(self, event, payload):
+        """
+        Отправляет payload клиенту и записывает спан доставки,
+        если сообщение channel layer содержит trace id.
+        """
+        with continue_trace(event.get('trace_id')), span('websocket.deliver', type=payload['type']):
+            await self.send(text_data=json.dumps(payload))
+
+
+class TranscriptionConsumer(TracedSendMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer для отслеживания прогресса транскрипции конкретного звонка.
     Отправляет промежуточные результаты транскрипции в реальном времени.
@@ -44,7 +64,7 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        logger.info(f"WebSocket подключен: user={user.username}, call_id={self.call_id}")
+        logger.info("WebSocket подключен: user=%s, call_id=%s", user.username, self.call_id)
         
         # Отправляем текущий статус звонка
         call_status = await self.get_call_status(self.call_id)
@@ -64,7 +84,7 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        logger.info(f"WebSocket отключен: call_id={self.call_id}, code={close_code}")
+        logger.info("WebSocket отключен: call_id=%s, code=%s", self.call_id, close_code)
     
     async def receive(self, text_data):
         """
@@ -79,55 +99,68 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
                 await self.send(text_data=json.dumps({
                     'type': 'pong'
                 }))
-            
+        
         except json.JSONDecodeError:
-            logger.error(f"Ошибка парсинга JSON: {text_data}")
+            logger.error("Ошибка парсинга JSON: %s", text_data)
     
     async def transcription_progress(self, event):
         """
         Отправляет прогресс транскрипции клиенту.
         Вызывается через channel_layer.group_send().
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'transcription_progress',
             'call_id': event['call_id'],
             'progress': event['progress'],
             'text': event.get('text', ''),
             'segment': event.get('segment'),
             'timestamp': event.get('timestamp')
-        }))
+        })
+    
+    async def transcription_draft(self, event):
+        """
+        Отправляет черновик транскрипции (начало записи, быстрая модель).
+        Заменяется итоговой транскрипцией в transcription_completed.
+        """
+        await self.send_event(event, {
+            'type': 'transcription_draft',
+            'call_id': event['call_id'],
+            'text': event['text'],
+            'seconds': event['seconds'],
+            'model': event.get('model')
+        })
     
     async def transcription_completed(self, event):
         """
         Отправляет уведомление о завершении транскрипции.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'transcription_completed',
             'call_id': event['call_id'],
             'transcription': event['transcription'],
             'analysis': event.get('analysis')
-        }))
+        })
     
     async def transcription_error(self, event):
         """
         Отправляет уведомление об ошибке транскрипции.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'transcription_error',
             'call_id': event['call_id'],
             'error': event['error']
-        }))
+        })
     
     async def status_update(self, event):
         """
         Отправляет обновление статуса звонка.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'status_update',
             'call_id': event['call_id'],
             'status': event['status'],
             'message': event.get('message')
-        }))
+        })
     
     @database_sync_to_async
     def check_call_access(self, user, call_id):
@@ -158,7 +191,190 @@ class TranscriptionConsumer(AsyncWebsocketConsumer):
             return {'status': 'not_found'}
 
 
-class CallsConsumer(AsyncWebsocketConsumer):
+class LiveTranscriptionConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer потоковой транскрипции.
+    
+    Клиент подключается к ws/live/?language=ru&format=pcm|opus и передает
+    аудио бинарными сообщениями (pcm: s16le 16 кГц моно; opus: поток
+    WebM/Ogg, например от MediaRecorder). Сервер распознает скользящее окно
+    и отправляет live_segment (зафиксированный сегмент) и live_partial
+    (текст еще не зафиксированной части). Сообщение {"type": "stop"} или
+    закрытие соединения завершает сессию: запись сохраняется как Call
+    с транскрипцией, анализ выполняет задача analyze_call_task.
+    """
+    
+    # Число активных сессий процесса (модель одна, инференс сериализован)
+    active_sessions = 0
+    
+    async def connect(self):
+        """
+        Проверяет авторизацию и лимит сессий, создает сессию.
+        """
+        self.session = None
+        self.decoder = None
+        self.worker = None
+        self.finished = False
+        self.overflow = False
+        
+        user = self.scope.get('user')
+        if not user or isinstance(user, AnonymousUser):
+            await self.close(code=4001)
+            return
+        
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        language = params.get('language', ['ru'])[0]
+        audio_format = params.get('format', ['pcm'])[0]
+        if language not in settings.SUPPORTED_LANGUAGES or audio_format not in ('pcm', 'opus'):
+            await self.close(code=4000)
+            return
+        
+        if LiveTranscriptionConsumer.active_sessions >= settings.LIVE_MAX_SESSIONS:
+            await self.close(code=4029)
+            return
+        
+        from .live import LiveSession, StreamDecoder
+        
+        # Место занимается до загрузки модели, чтобы параллельные подключения
+        # не превысили лимит; если сессия не создалась, место освобождается
+        LiveTranscriptionConsumer.active_sessions += 1
+        try:
+            self.session = await sync_to_async(LiveSession, thread_sensitive=False)(user, language)
+        except Exception as e:
+            LiveTranscriptionConsumer.active_sessions -= 1
+            logger.error("Не удалось открыть потоковую сессию: %s", e)
+            await self.close(code=1011)
+            return
+        if audio_format == 'opus':
+            self.decoder = StreamDecoder(self.feed)
+            await self.decoder.start()
+        
+        await self.accept()
+        
+        logger.info("Потоковая сессия открыта: user=%s, format=%s", user.username, audio_format)
+        await self.send(text_data=json.dumps({
+            'type': 'live_started',
+            'language': language,
+            'format': audio_format,
+            'sample_rate': 16000
+        }))
+    
+    async def disconnect(self, close_code):
+        """
+        Завершает сессию, если клиент закрыл соединение без stop.
+        """
+        if self.session is None:
+            return
+        await self.finish(send=False)
+        logger.info("Потоковая сессия закрыта: code=%s", close_code)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Принимает аудио (бинарные сообщения) и управляющие команды.
+        """
+        if self.finished:
+            return
+        
+        if bytes_data:
+            if self.decoder is not None:
+                await self.decoder.write(bytes_data)
+            else:
+                await self.feed(bytes_data)
+            return
+        
+        try:
+            message_type = json.loads(text_data).get('type')
+        except (json.JSONDecodeError, AttributeError):
+            logger.error("Ошибка парсинга JSON: %s", text_data)
+            return
+        
+        if message_type == 'ping':
+            await self.send(text_data=json.dumps({'type': 'pong'}))
+        elif message_type == 'stop':
+            await self.stop()
+    
+    async def stop(self, code=None):
+        """Завершает сессию и закрывает соединение."""
+        await self.finish(send=True)
+        await self.close(code=code)
+    
+    async def feed(self, pcm):
+        """
+        Добавляет PCM в сессию и запускает шаг распознавания,
+        если модель свободна и накопилось достаточно аудио.
+        """
+        from .live import LiveBufferOverflow
+        
+        if self.overflow:
+            return
+        try:
+            self.session.feed(pcm)
+        except LiveBufferOverflow as e:
+            logger.warning("Потоковая сессия прервана: %s", e)
+            self.overflow = True
+            await self.send(text_data=json.dumps({'type': 'live_error', 'error': str(e)}))
+            # feed может вызываться из задачи декодера, которую ждет finish()
+            asyncio.ensure_future(self.stop(code=4008))
+            return
+        
+        if (self.worker is None or self.worker.done()) and self.session.ready():
+            self.worker = asyncio.ensure_future(self.run_steps())
+    
+    async def run_steps(self):
+        """
+        Распознает окно, пока есть новое аудио; инференс выполняется в потоке.
+        """
+        while not self.finished and self.session.ready():
+            segments, partial = await sync_to_async(self.session.step, thread_sensitive=False)()
+            for segment in segments:
+                await self.send(text_data=json.dumps({'type': 'live_segment', 'segment': segment}))
+            await self.send(text_data=json.dumps({'type': 'live_partial', 'text': partial}))
+    
+    async def finish(self, send):
+        """
+        Распознает остаток записи и сохраняет ее (один раз за сессию).
+        
+        Args:
+            send: Отправлять ли клиенту итоговые события (соединение еще открыто)
+        """
+        if self.finished:
+            return
+        
+        session = self.session
+        try:
+            if self.decoder is not None:
+                await self.decoder.close()
+            self.finished = True
+            if self.worker is not None:
+                await self.worker
+            
+            segments = await sync_to_async(session.finish, thread_sensitive=False)()
+            call = await database_sync_to_async(session.persist)()
+        except Exception as e:
+            logger.error("Ошибка завершения потоковой сессии: %s", e)
+            self.finished = True
+            session.discard()
+            if send:
+                await self.send(text_data=json.dumps({'type': 'live_error', 'error': str(e)}))
+            return
+        finally:
+            LiveTranscriptionConsumer.active_sessions -= 1
+        
+        if call is not None:
+            from .tasks import analyze_call_task
+            await sync_to_async(analyze_call_task.delay)(str(call.id))
+        
+        if send:
+            for segment in segments:
+                await self.send(text_data=json.dumps({'type': 'live_segment', 'segment': segment}))
+            await self.send(text_data=json.dumps({
+                'type': 'live_completed',
+                'call_id': str(call.id) if call else None,
+                'duration': session.duration
+            }))
+
+
+class CallsConsumer(TracedSendMixin, AsyncWebsocketConsumer):
     """
     WebSocket consumer для отслеживания всех звонков пользователя.
     Отправляет уведомления о новых звонках и изменении статусов.
@@ -184,7 +400,7 @@ class CallsConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        logger.info(f"WebSocket подключен к списку звонков: user={user.username}")
+        logger.info("WebSocket подключен к списку звонков: user=%s", user.username)
     
     async def disconnect(self, close_code):
         """
@@ -195,7 +411,7 @@ class CallsConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        logger.info(f"WebSocket отключен от списка звонков: user_id={self.user_id}")
+        logger.info("WebSocket отключен от списка звонков: user_id=%s", self.user_id)
     
     async def receive(self, text_data):
         """
@@ -207,35 +423,35 @@ class CallsConsumer(AsyncWebsocketConsumer):
             
             if message_type == 'ping':
                 await self.send(text_data=json.dumps({'type': 'pong'}))
-            
+        
         except json.JSONDecodeError:
-            logger.error(f"Ошибка парсинга JSON: {text_data}")
+            logger.error("Ошибка парсинга JSON: %s", text_data)
     
     async def call_created(self, event):
         """
         Отправляет уведомление о создании нового звонка.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'call_created',
             'call': event['call']
-        }))
+        })
     
     async def call_updated(self, event):
         """
         Отправляет уведомление об обновлении звонка.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'call_updated',
             'call_id': event['call_id'],
             'status': event.get('status'),
             'updates': event.get('updates')
-        }))
+        })
     
     async def call_deleted(self, event):
         """
         Отправляет уведомление об удалении звонка.
         """
-        await self.send(text_data=json.dumps({
+        await self.send_event(event, {
             'type': 'call_deleted',
             'call_id': event['call_id']
-        }))
+        })
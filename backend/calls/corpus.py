@@ -0,0 +1,171 @@
+"""
+Документные частоты лемм и ранжирование ключевых слов по TF-IDF.
+
+Таблица DocumentFrequency ведется инкрементально: при создании анализа
+звонка его леммы (CallAnalysis.document_terms) прибавляются к частотам,
+при удалении - вычитаются, при повторном анализе учитывается разница.
+Ранжирование читает частоты только для лемм самих документов одним
+запросом, без прохода по корпусу.
+"""
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+from django.db.models import F
+from scipy import sparse
+
+# Строка таблицы с пустым термином хранит число документов языка
+TOTAL_TERM = ''
+
+# Размер порции term__in в запросах к таблице частот
+QUERY_CHUNK_SIZE = 500
+
+# Длина термина в DocumentFrequency
+MAX_TERM_LENGTH = 100
+
+
+def document_terms(language, terms):
+    """Значение CallAnalysis.document_terms для лемм документа."""
+    return {
+        'language': language,
+        'terms': sorted(term for term in set(terms) if len(term) <= MAX_TERM_LENGTH),
+    }
+
+
+def collect_deltas(old, new, deltas=None):
+    """
+    Изменения частот при замене терминов документа old на new
+    (любое из значений может быть пустым: создание или удаление).
+    
+    Returns:
+        Counter: (язык, термин) -> изменение числа документов
+    """
+    if deltas is None:
+        deltas = Counter()
+    for value, sign in ((old, -1), (new, 1)):
+        if not value:
+            continue
+        language = value['language']
+        deltas[(language, TOTAL_TERM)] += sign
+        for term in value['terms']:
+            deltas[(language, term)] += sign
+    return deltas
+
+
+def apply_deltas(deltas):
+    """
+    Применяет изменения частот: недостающие строки создаются, счетчики
+    меняются атомарными UPDATE (F-выражения) по группам с одинаковым
+    изменением, строки с нулевой частотой удаляются.
+    """
+    from .models import DocumentFrequency
+    
+    groups = {}
+    for (language, term), delta in deltas.items():
+        if delta:
+            groups.setdefault((language, delta), []).append(term)
+    if not groups:
+        return
+    
+    with transaction.atomic():
+        DocumentFrequency.objects.bulk_create(
+            [
+                DocumentFrequency(language=language, term=term)
+                for (language, delta), terms in groups.items() if delta > 0
+                for term in terms
+            ],
+            batch_size=QUERY_CHUNK_SIZE,
+            ignore_conflicts=True
+        )
+        for (language, delta), terms in groups.items():
+            for chunk in _chunks(terms):
+                DocumentFrequency.objects.filter(language=language, term__in=chunk).update(
+                    document_count=F('document_count') + delta
+                )
+        for (language, delta), terms in groups.items():
+            if delta < 0:
+                for chunk in _chunks(terms):
+                    DocumentFrequency.objects.filter(
+                        language=language, term__in=chunk, document_count__lte=0
+                    ).exclude(term=TOTAL_TERM).delete()
+
+
+def replace_document(old, new):
+    """Учитывает в частотах замену терминов документа."""
+    apply_deltas(collect_deltas(old, new))
+
+
+def frequencies(language, terms):
+    """
+    Документные частоты терминов языка.
+    
+    Returns:
+        tuple: (число документов, {термин: частота})
+    """
+    from .models import DocumentFrequency
+    
+    found = {}
+    for chunk in _chunks(list(terms) + [TOTAL_TERM]):
+        found.update(
+            DocumentFrequency.objects.filter(language=language, term__in=chunk)
+            .values_list('term', 'document_count')
+        )
+    total = found.pop(TOTAL_TERM, 0)
+    return total, found
+
+
+def rank_keywords(language, documents, limit=20):
+    """
+    Ключевые слова документов по TF-IDF.
+    
+    Документы собираются в разреженную матрицу (документы x леммы)
+    с сублинейным TF = 1 + ln(частота в документе), веса умножаются
+    на сглаженный IDF = ln((1 + N) / (1 + df)) + 1 сразу для всей матрицы.
+    Пока корпус пуст, IDF одинаков и порядок совпадает с порядком по частоте.
+    Документ, который анализируется повторно, уже учтен в частотах;
+    на больших корпусах это почти не меняет ранжирование.
+    
+    Args:
+        language: Язык документов
+        documents: Список пар (леммы, числа вхождений) - по документу
+        limit: Сколько ключевых слов вернуть для документа
+    
+    Returns:
+        list: Для каждого документа список лемм по убыванию веса
+    """
+    vocabulary = {}
+    indices = []
+    counts = []
+    indptr = [0]
+    for terms, term_counts in documents:
+        indices.extend(vocabulary.setdefault(term, len(vocabulary)) for term in terms)
+        counts.extend(term_counts)
+        indptr.append(len(indices))
+    
+    if not vocabulary:
+        return [[] for _ in documents]
+    
+    words = list(vocabulary)
+    total, found = frequencies(language, words)
+    df = np.fromiter((found.get(word, 0) for word in words), dtype=np.float64, count=len(words))
+    idf = np.log((1.0 + total) / (1.0 + df)) + 1.0
+    
+    # Порядок лемм в строке сохраняется (первое вхождение в тексте),
+    # поэтому при равном весе выше остается лемма, встретившаяся раньше
+    matrix = sparse.csr_matrix(
+        (1.0 + np.log(np.asarray(counts, dtype=np.float64)), np.asarray(indices), np.asarray(indptr)),
+        shape=(len(documents), len(words))
+    )
+    matrix.data *= idf[matrix.indices]
+    
+    ranked = []
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        order = np.argsort(-matrix.data[start:end], kind='stable')[:limit]
+        ranked.append([words[i] for i in matrix.indices[start:end][order]])
+    return ranked
+
+
+def _chunks(items):
+    for start in range(0, len(items), QUERY_CHUNK_SIZE):
+        yield items[start:start + QUERY_CHUNK_SIZE]
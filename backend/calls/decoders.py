@@ -0,0 +1,301 @@
+"""
+Декодирование аудио в процессе, без запуска ffmpeg.
+
+- WAV (PCM 8/16/32 бит, float32): данные открываются через np.memmap;
+- Ogg/Opus, Ogg/Vorbis (голосовые сообщения Telegram): libsndfile (soundfile).
+
+Каналы сводятся в моно, частота приводится к целевой полифазной
+передискретизацией (scipy.signal.resample_poly) блоками с перекрытием,
+результат совпадает с передискретизацией всего сигнала целиком.
+Остальные форматы (mp3, m4a, flac) декодирует ffmpeg (calls/audio.py).
+"""
+import logging
+import math
+import os
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WAV_EXTENSIONS = ('.wav', '.wave')
+SOUNDFILE_EXTENSIONS = ('.ogg', '.oga', '.opus')
+
+# Блок исходного сигнала, читаемый за раз (кадров)
+BLOCK_FRAMES = 1 << 16
+
+# (format tag, бит на отсчет) -> (dtype, смещение, масштаб)
+_WAV_FORMATS = {
+    (1, 8): ('u1', 128.0, 128.0),
+    (1, 16): ('<i2', 0.0, 32768.0),
+    (1, 32): ('<i4', 0.0, 2147483648.0),
+    (3, 32): ('<f4', 0.0, 1.0),
+}
+
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _lowpass(up, down):
+    """
+    Фильтр, который resample_poly строит по умолчанию (окно Кайзера, beta=5).
+    Считается один раз на поток: для 44.1 -> 16 кГц это 8821 коэффициент,
+    и расчет на каждый блок занимал заметную часть передискретизации.
+    """
+    from scipy.signal import firwin
+    
+    max_rate = max(up, down)
+    return firwin(2 * 10 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0)).astype(np.float32)
+
+
+def _downmix(block):
+    """
+    Сводит кадры (кадры x каналы) в моно float32 сложением столбцов:
+    mean(axis=1) по коротким строкам в несколько раз медленнее.
+    """
+    channels = block.shape[1]
+    mono = block[:, 0].astype(np.float32)
+    for channel in range(1, channels):
+        mono += block[:, channel]
+    if channels > 1:
+        mono /= channels
+    return mono
+
+
+class Resampler:
+    """
+    Потоковая полифазная передискретизация.
+    
+    Блоки выхода выравниваются по down отсчетам входа (up отсчетам выхода),
+    и каждый блок считается с контекстом pad отсчетов с обеих сторон,
+    не меньше половины длины фильтра resample_poly, поэтому границы
+    блоков не дают артефактов.
+    """
+    
+    def __init__(self, rate_in, rate_out):
+        g = math.gcd(rate_in, rate_out)
+        self.up = rate_out // g
+        self.down = rate_in // g
+        # Половина длины фильтра resample_poly по умолчанию: 10 * max(up, down)
+        # отсчетов повышенной частоты; переводим во входные отсчеты
+        half = 10 * max(self.up, self.down) / self.up
+        self.pad = self.down * (math.ceil(half / self.down) + 1)
+        self._filter = _lowpass(self.up, self.down)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._base = 0  # индекс входа, соответствующий _buffer[0]
+        self._next = 0  # индекс входа, с которого начинается следующий блок выхода
+    
+    def process(self, samples, final=False):
+        """
+        Добавляет входные отсчеты и возвращает готовые выходные.
+        
+        Args:
+            samples: Моно float32 исходной частоты
+            final: Конец сигнала, вернуть остаток
+        """
+        from scipy.signal import resample_poly
+        
+        if samples.size:
+            self._buffer = np.concatenate((self._buffer, samples))
+        end = self._base + self._buffer.size
+        
+        if final:
+            block_end = end
+        else:
+            blocks = (end - self.pad - self._next) // self.down
+            block_end = self._next + blocks * self.down
+        if block_end <= self._next:
+            return np.zeros(0, dtype=np.float32)
+        
+        lo = max(0, self._next - self.pad)
+        hi = end if final else block_end + self.pad
+        resampled = resample_poly(
+            self._buffer[lo - self._base:hi - self._base], self.up, self.down, window=self._filter
+        )
+        
+        skip = (self._next - lo) * self.up // self.down
+        count = math.ceil((block_end - self._next) * self.up / self.down)
+        out = resampled[skip:skip + count].astype(np.float32, copy=False)
+        
+        self._next = block_end
+        keep = max(self._base, self._next - self.pad)
+        self._buffer = self._buffer[keep - self._base:]
+        self._base = keep
+        return out
+
+
+class WavReader:
+    """
+    Чтение WAV через np.memmap: страницы файла подгружаются по мере чтения.
+    """
+    
+    def __init__(self, path):
+        (tag, channels, rate, bits), offset, size = _parse_wav(path)
+        layout = _WAV_FORMATS.get((tag, bits))
+        if layout is None or not channels:
+            raise ValueError(f'Неподдерживаемый формат WAV: tag={tag}, bits={bits}')
+        
+        dtype, self._shift, self._scale = layout
+        self.rate = rate
+        self.channels = channels
+        self.frames = size // (np.dtype(dtype).itemsize * channels)
+        self._data = (
+            np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(self.frames, channels))
+            if self.frames else np.zeros((0, channels), dtype=dtype)
+        )
+        self._position = 0
+    
+    def read(self, frames):
+        """Читает до frames кадров, возвращает моно float32 в [-1, 1]."""
+        block = self._data[self._position:self._position + frames]
+        self._position += block.shape[0]
+        
+        mono = _downmix(block)
+        if self._shift:
+            mono -= self._shift
+        if self._scale != 1.0:
+            mono /= self._scale
+        return mono
+    
+    def close(self):
+        self._data = None
+
+
+class SoundFileReader:
+    """
+    Чтение Ogg (Opus, Vorbis) через libsndfile в процессе.
+    """
+    
+    def __init__(self, path):
+        import soundfile
+        
+        self._file = soundfile.SoundFile(path)
+        self.rate = self._file.samplerate
+        self.channels = self._file.channels
+        self.frames = self._file.frames
+    
+    def read(self, frames):
+        """Читает до frames кадров, возвращает моно float32 в [-1, 1]."""
+        return _downmix(self._file.read(frames, dtype='float32', always_2d=True))
+    
+    def close(self):
+        self._file.close()
+
+
+class NativePcmStream:
+    """
+    Поток PCM с интерфейсом PcmStream поверх декодера в процессе.
+    """
+    
+    def __init__(self, path, reader, sample_rate, max_seconds=None):
+        self.path = path
+        self.reader = reader
+        self.sample_rate = sample_rate
+        self.samples_read = 0
+        self._resampler = Resampler(reader.rate, sample_rate) if reader.rate != sample_rate else None
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._eof = False
+        # Ограничение длительности: читается только начало файла
+        self._frames_left = math.ceil(max_seconds * reader.rate) if max_seconds else None
+    
+    def read(self, samples):
+        """
+        Читает до samples отсчетов.
+        
+        Returns:
+            np.ndarray: float32 в диапазоне [-1, 1]; короче запрошенного только в конце потока
+        """
+        parts = [self._buffer]
+        available = self._buffer.size
+        
+        while available < samples and not self._eof:
+            frames = BLOCK_FRAMES
+            if self._frames_left is not None:
+                frames = min(frames, self._frames_left)
+                self._frames_left -= frames
+            block = self.reader.read(frames) if frames else np.zeros(0, dtype=np.float32)
+            self._eof = block.size < BLOCK_FRAMES
+            
+            if self._resampler is not None:
+                block = self._resampler.process(block, final=self._eof)
+            parts.append(block)
+            available += block.size
+        
+        data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        chunk, self._buffer = data[:samples], data[samples:]
+        self.samples_read += chunk.size
+        return chunk
+    
+    @property
+    def seconds_read(self):
+        """Длительность прочитанного аудио в секундах."""
+        return self.samples_read / self.sample_rate
+    
+    def close(self):
+        self.reader.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_reader(path):
+    """
+    Открывает декодер в процессе по расширению файла.
+    
+    Returns:
+        WavReader | SoundFileReader | None: None, если формат нужно декодировать ffmpeg
+    """
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        if ext in WAV_EXTENSIONS:
+            return WavReader(path)
+        if ext in SOUNDFILE_EXTENSIONS:
+            return SoundFileReader(path)
+    except ImportError:
+        logger.warning("soundfile не установлен, %s декодируется ffmpeg", path)
+    except (OSError, ValueError, RuntimeError) as e:
+        # Файл с нестандартным заголовком или кодеком: ffmpeg разберется
+        logger.info("Декодер в процессе не подошел для %s: %s", path, e)
+    return None
+
+
+def _parse_wav(path):
+    """
+    Разбирает чанки RIFF/WAVE.
+    
+    Returns:
+        tuple: ((format tag, каналы, частота, бит на отсчет), смещение данных, размер данных)
+    """
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            raise ValueError('Не RIFF/WAVE файл')
+        
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError('В WAV нет чанка data')
+            chunk_id, size = header[:4], struct.unpack('<I', header[4:])[0]
+            
+            if chunk_id == b'fmt ':
+                body = f.read(size + size % 2)
+                tag, channels, rate = struct.unpack('<HHI', body[:8])
+                bits = struct.unpack('<H', body[14:16])[0]
+                if tag == _WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                    # Формат в первых двух байтах SubFormat GUID
+                    tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (tag, channels, rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError('Чанк data перед fmt')
+                offset = f.tell()
+                # Потоковая запись может оставить размер 0 или 0xFFFFFFFF
+                available = os.fstat(f.fileno()).st_size - offset
+                if not size or size > available:
+                    size = available
+                return fmt, offset, size
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
@@ -0,0 +1,332 @@
+"""
+Разделение дикторов на CPU и статистика говорящих.
+
+Из PCM звонка (16 кГц, моно) считаются MFCC кадров 25 мс с шагом 10 мс.
+Кадры речи (внутри сегментов транскрипции и громче фона) группируются
+в блоки по BLOCK_SECONDS; вектор блока - средние и разбросы MFCC
+(без нулевого коэффициента, зависящего от громкости). Блоки речи
+кластеризуются k-means на заданное число дикторов, метки сглаживаются
+по соседним блокам.
+
+Наложение речи на одном канале напрямую не наблюдается, поэтому
+используется эвристика: блок на смене дикторов, который почти одинаково
+близок к центрам обоих кластеров, считается перебиванием (голоса
+смешаны). Перебиванием (interruption) считается смена диктора,
+начавшаяся с такого блока, и оно засчитывается вступившему диктору.
+"""
+import functools
+
+import numpy as np
+from scipy.fft import dct
+
+FRAME_LENGTH = 400  # 25 мс при 16 кГц
+FRAME_HOP = 160  # 10 мс
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 13
+
+# Кадров на порцию вычисления MFCC (ограничивает память на длинных звонках)
+CHUNK_FRAMES = 6000
+
+BLOCK_SECONDS = 0.5
+# Кадр речи громче фона (10-й перцентиль энергии) на 10 дБ, но порог
+# не выше 20 дБ под громкими кадрами (90-й перцентиль): в записи
+# почти без пауз 10-й перцентиль приходится на речь
+SPEECH_ENERGY_MARGIN = np.log(10.0)
+SPEECH_DYNAMIC_RANGE = np.log(100.0)
+# Кадры тише этого уровня речью не считаются при любом пороге
+# (тишина и ровный фон, где перцентили совпадают)
+SPEECH_MIN_DBFS = -55.0
+# Доля кадров речи, при которой блок считается речью
+SPEECH_BLOCK_SHARE = 0.5
+
+# Окно сглаживания меток (в блоках речи)
+SMOOTHING_BLOCKS = 5
+# Кластеры ближе (в единицах внутрикластерного разброса) или меньше
+# этой доли блоков считаются одним диктором
+MIN_SEPARATION = 0.8
+MIN_SPEAKER_SHARE = 0.05
+# Меньше блоков речи на диктора (5 с) - разделение не выполняется
+MIN_SPEAKER_BLOCKS = 10
+# Относительная разница расстояний до двух ближайших центров,
+# ниже которой блок на смене дикторов считается наложением речи
+OVERTALK_MARGIN = 0.1
+
+KMEANS_ITERATIONS = 25
+
+
+def basic_stats(segments):
+    """
+    Статистика по сегментам без разделения дикторов
+    (если аудио недоступно или разделение выключено).
+    """
+    if not segments:
+        return {}
+    
+    total_duration = segments[-1]['end']
+    
+    return {
+        'total_segments': len(segments),
+        'total_duration': total_duration,
+        'average_segment_length': total_duration / len(segments)
+    }
+
+
+@functools.lru_cache(maxsize=4)
+def mel_filterbank(sample_rate, n_fft=N_FFT, n_mels=N_MELS):
+    """Треугольные мел-фильтры (n_mels x n_fft // 2 + 1)."""
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+    
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+    
+    edges = to_hz(np.linspace(to_mel(0.0), to_mel(sample_rate / 2), n_mels + 2))
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def mfcc(pcm, sample_rate):
+    """
+    MFCC и логарифм энергии кадров.
+    
+    Returns:
+        tuple: (коэффициенты кадров x N_MFCC, энергия кадров)
+    """
+    pcm = np.asarray(pcm, dtype=np.float32)
+    if pcm.size < FRAME_LENGTH:
+        return np.zeros((0, N_MFCC), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    
+    frames = np.lib.stride_tricks.sliding_window_view(pcm, FRAME_LENGTH)[::FRAME_HOP]
+    window = np.hamming(FRAME_LENGTH).astype(np.float32)
+    filterbank = mel_filterbank(sample_rate)
+    
+    coefficients = np.empty((len(frames), N_MFCC), dtype=np.float32)
+    energy = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), CHUNK_FRAMES):
+        chunk = frames[start:start + CHUNK_FRAMES]
+        power = np.abs(np.fft.rfft(chunk * window, n=N_FFT)) ** 2
+        log_mel = np.log(power.astype(np.float32) @ filterbank.T + 1e-10)
+        coefficients[start:start + len(chunk)] = dct(log_mel, type=2, norm='ortho', axis=1)[:, :N_MFCC]
+        energy[start:start + len(chunk)] = np.log(np.einsum('ij,ij->i', chunk, chunk) + 1e-10)
+    return coefficients, energy
+
+
+def diarize(pcm, sample_rate, segments, speakers=2):
+    """
+    Метки дикторов по блокам речи.
+    
+    Args:
+        pcm: Отсчеты float32
+        sample_rate: Частота дискретизации
+        segments: SegmentList транскрипции (границы речи)
+        speakers: Ожидаемое число дикторов
+    
+    Returns:
+        dict: block_seconds, starts (начала блоков речи, с), labels (0..k-1),
+            overtalk (маска блоков наложения), speakers (найдено дикторов)
+    """
+    coefficients, energy = mfcc(pcm, sample_rate)
+    frame_seconds = FRAME_HOP / sample_rate
+    block_frames = int(round(BLOCK_SECONDS / frame_seconds))
+    empty = {
+        'block_seconds': block_frames * frame_seconds,
+        'starts': np.zeros(0),
+        'labels': np.zeros(0, dtype=np.int64),
+        'overtalk': np.zeros(0, dtype=bool),
+        'speakers': 0,
+    }
+    if len(energy) < block_frames:
+        return empty
+    
+    # Кадры речи: внутри сегментов и громче фона
+    times = np.arange(len(energy)) * frame_seconds
+    floor, loud = np.percentile(energy, [10, 90])
+    # energy - логарифм суммы квадратов отсчетов кадра
+    absolute = np.log(FRAME_LENGTH * 10.0 ** (SPEECH_MIN_DBFS / 10.0))
+    speech = energy > max(min(floor + SPEECH_ENERGY_MARGIN, loud - SPEECH_DYNAMIC_RANGE), absolute)
+    if len(segments):
+        starts = np.asarray(segments.starts, dtype=np.float64)
+        ends = np.asarray(segments.ends, dtype=np.float64)
+        index = np.searchsorted(starts, times, side='right') - 1
+        speech &= (index >= 0) & (times < ends[np.maximum(index, 0)])
+    
+    # Нормализация кепстрального среднего по речи звонка
+    if speech.any():
+        coefficients = coefficients - coefficients[speech].mean(axis=0)
+    
+    blocks = len(energy) // block_frames
+    usable = blocks * block_frames
+    mask = speech[:usable].reshape(blocks, block_frames)
+    features = coefficients[:usable, 1:].reshape(blocks, block_frames, N_MFCC - 1)
+    
+    counts = mask.sum(axis=1)
+    is_speech = counts >= SPEECH_BLOCK_SHARE * block_frames
+    if not is_speech.any():
+        return empty
+    
+    weights = mask[is_speech, :, None]
+    selected = features[is_speech]
+    n = counts[is_speech, None]
+    mean = (selected * weights).sum(axis=1) / n
+    std = np.sqrt(np.maximum(((selected - mean[:, None]) ** 2 * weights).sum(axis=1) / n, 0.0))
+    embeddings = np.hstack([mean, std])
+    embeddings = (embeddings - embeddings.mean(axis=0)) / (embeddings.std(axis=0) + 1e-6)
+    
+    block_starts = np.flatnonzero(is_speech) * block_frames * frame_seconds
+    labels, distances = _cluster(embeddings, speakers)
+    found = distances.shape[1]
+    
+    if found > 1:
+        labels = _smooth(labels, found)
+        nearest = np.sort(distances, axis=1)
+        margin = (nearest[:, 1] - nearest[:, 0]) / (nearest[:, 1] + nearest[:, 0] + 1e-9)
+        change = np.zeros(len(labels), dtype=bool)
+        change[1:] = labels[1:] != labels[:-1]
+        near_change = change.copy()
+        near_change[:-1] |= change[1:]
+        overtalk = near_change & (margin < OVERTALK_MARGIN)
+    else:
+        overtalk = np.zeros(len(labels), dtype=bool)
+    
+    # Дикторы нумеруются в порядке первого появления (после сглаживания
+    # кластер может исчезнуть)
+    values, first = np.unique(labels, return_index=True)
+    appearance = values[np.argsort(first)]
+    remap = np.zeros(found, dtype=np.int64)
+    remap[appearance] = np.arange(len(appearance))
+    
+    return {
+        'block_seconds': block_frames * frame_seconds,
+        'starts': block_starts,
+        'labels': remap[labels],
+        'overtalk': overtalk,
+        'speakers': len(appearance),
+    }
+
+
+def speaker_stats(pcm, sample_rate, segments, speakers=2):
+    """
+    Статистика говорящих: время речи, доля, число реплик, перебивания
+    и отношение говорения к слушанию по каждому диктору, общее время
+    наложения речи и метки дикторов сегментов.
+    """
+    stats = basic_stats(segments)
+    result = diarize(pcm, sample_rate, segments, speakers)
+    block = result['block_seconds']
+    starts, labels, overtalk = result['starts'], result['labels'], result['overtalk']
+    found = result['speakers']
+    
+    talk = np.bincount(labels, minlength=found) * block
+    total_talk = float(talk.sum())
+    
+    # Реплики: смена диктора между соседними блоками речи
+    change = np.zeros(len(labels), dtype=bool)
+    change[1:] = labels[1:] != labels[:-1]
+    turn_starts = change.copy()
+    if len(labels):
+        turn_starts[0] = True
+    turns = np.bincount(labels[turn_starts], minlength=found)
+    interruptions = np.bincount(labels[change & overtalk], minlength=found)
+    
+    speaker_data = {}
+    for index in range(found):
+        listen = total_talk - talk[index]
+        speaker_data[f'speaker_{index + 1}'] = {
+            'talk_time': round(float(talk[index]), 2),
+            'talk_share': round(float(talk[index] / total_talk), 4) if total_talk else 0.0,
+            'turns': int(turns[index]),
+            'interruptions': int(interruptions[index]),
+            'talk_listen_ratio': round(float(talk[index] / listen), 4) if listen else None,
+        }
+    
+    overtalk_time = float(overtalk.sum() * block)
+    stats.update({
+        'speaker_count': found,
+        'speakers': speaker_data,
+        'talk_time': round(total_talk, 2),
+        'overtalk_time': round(overtalk_time, 2),
+        'overtalk_ratio': round(overtalk_time / total_talk, 4) if total_talk else 0.0,
+        'interruptions': int(interruptions.sum()),
+        'segment_speakers': _segment_speakers(segments, starts + block / 2, labels, found),
+    })
+    return stats
+
+
+def _cluster(embeddings, speakers):
+    """
+    k-means с детерминированной инициализацией по главной компоненте.
+    Если кластеры плохо разделены или один из них слишком мал,
+    все блоки относятся к одному диктору.
+    
+    Returns:
+        tuple: (метки, расстояния до центров)
+    """
+    if speakers < 2 or len(embeddings) < speakers * MIN_SPEAKER_BLOCKS:
+        return np.zeros(len(embeddings), dtype=np.int64), np.zeros((len(embeddings), 1))
+    
+    # Начальные центры - средние по квантилям проекции на главную компоненту
+    centered = embeddings - embeddings.mean(axis=0)
+    projection = centered @ np.linalg.svd(centered, full_matrices=False)[2][0]
+    bins = np.quantile(projection, np.linspace(0, 1, speakers + 1)[1:-1])
+    initial = np.searchsorted(bins, projection)
+    sizes = np.bincount(initial, minlength=speakers)
+    if sizes.min() == 0:
+        # Проекция вырождена (одинаковые блоки): разделять нечего
+        return np.zeros(len(embeddings), dtype=np.int64), np.zeros((len(embeddings), 1))
+    centers = np.array([embeddings[initial == k].mean(axis=0) for k in range(speakers)])
+    
+    labels = None
+    for _ in range(KMEANS_ITERATIONS):
+        distances = np.linalg.norm(embeddings[:, None, :] - centers[None, :, :], axis=2)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for k in range(speakers):
+            members = embeddings[labels == k]
+            if len(members):
+                centers[k] = members.mean(axis=0)
+    
+    distances = np.linalg.norm(embeddings[:, None, :] - centers[None, :, :], axis=2)
+    sizes = np.bincount(labels, minlength=speakers)
+    spread = distances[np.arange(len(labels)), labels].mean() + 1e-9
+    separation = min(
+        np.linalg.norm(centers[a] - centers[b])
+        for a in range(speakers) for b in range(a + 1, speakers)
+    ) / spread
+    if separation < MIN_SEPARATION or sizes.min() < MIN_SPEAKER_SHARE * len(labels):
+        return np.zeros(len(embeddings), dtype=np.int64), np.zeros((len(embeddings), 1))
+    return labels, distances
+
+
+def _smooth(labels, speakers):
+    """Метка блока - самая частая в окне SMOOTHING_BLOCKS соседних блоков."""
+    one_hot = np.eye(speakers)[labels]
+    kernel = np.ones(SMOOTHING_BLOCKS)
+    votes = np.stack(
+        [np.convolve(one_hot[:, k], kernel, mode='same') for k in range(speakers)],
+        axis=1
+    )
+    # При равенстве голосов остается собственная метка блока
+    votes[np.arange(len(labels)), labels] += 0.5
+    return votes.argmax(axis=1)
+
+
+def _segment_speakers(segments, block_centers, labels, speakers):
+    """Диктор каждого сегмента (1..k) по большинству его блоков, 0 - не определен."""
+    if not len(segments):
+        return []
+    starts = np.asarray(segments.starts, dtype=np.float64)
+    ends = np.asarray(segments.ends, dtype=np.float64)
+    index = np.searchsorted(starts, block_centers, side='right') - 1
+    inside = (index >= 0) & (block_centers < ends[np.maximum(index, 0)])
+    
+    votes = np.zeros((len(segments), max(speakers, 1)), dtype=np.int64)
+    np.add.at(votes, (index[inside], labels[inside]), 1)
+    result = votes.argmax(axis=1) + 1
+    result[votes.sum(axis=1) == 0] = 0
+    return result.tolist()
@@ -0,0 +1,65 @@
+"""
+Версия анализатора и хеш текста для пропуска повторного анализа.
+
+Результат анализа определяется текстом транскрипции и анализатором:
+версиями spaCy и модели языка, набором включенных компонентов,
+версией словарей (lexicon.lexicon_version) и версией кода анализа
+ANALYZER_CODE_VERSION. Все это сворачивается в отпечаток, который вместе
+с хешем текста хранится в CallAnalysis. Если оба совпадают с текущими,
+анализ актуален и повторно не выполняется.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import lexicon
+
+# Меняется вместе с кодом анализа (calls/services.py, tokens.py, corpus.py,
+# sentiment.py, summary.py), если от этого меняется результат
+ANALYZER_CODE_VERSION = '2026.10.1'
+
+
+def text_hash(text):
+    """SHA-256 текста транскрипции (hex)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def analyzer_fingerprint(nlp, language):
+    """
+    Отпечаток анализатора языка.
+    
+    Args:
+        nlp: Модель spaCy языка
+        language: Язык
+    
+    Returns:
+        str: SHA-256 описания анализатора (hex)
+    """
+    import spacy
+    
+    meta = getattr(nlp, 'meta', {}) or {}
+    description = {
+        'code': ANALYZER_CODE_VERSION,
+        'spacy': spacy.__version__,
+        'model': f"{meta.get('lang', language)}_{meta.get('name', '')}-{meta.get('version', '')}",
+        'components': list(getattr(nlp, 'pipe_names', [])),
+        'lexicon': lexicon.lexicon_version(),
+        'summary_max_chars': settings.SUMMARY_MAX_CHARS,
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def stale(version, prefix=''):
+    """
+    Условие на устаревший анализ: отпечаток отличается от version.
+    
+    Неравенство записано двумя диапазонами, чтобы запрос шел
+    по индексу analyzer_version, а не полным просмотром таблицы.
+    
+    Args:
+        version: Текущий отпечаток анализатора
+        prefix: Путь к CallAnalysis ('call__analysis__' для Transcription)
+    """
+    return Q(**{f'{prefix}analyzer_version__lt': version}) | Q(**{f'{prefix}analyzer_version__gt': version})
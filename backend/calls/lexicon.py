@@ -0,0 +1,300 @@
+"""
+Словари категорий и тональности (LexiconEntry) и поиск по ним.
+
+Термины языка компилируются в один автомат Ахо-Корасик, который находит
+все вхождения за один проход по тексту. Термин совпадает с началом слова
+(«недовольн» находит «недовольна», «недовольство»), а не с произвольной
+подстрокой. Автоматы кешируются в процессе и пересобираются при изменении
+словарей: версия (число записей и время последнего изменения) проверяется
+не чаще раза в LEXICON_CHECK_INTERVAL секунд, изменения в этом же
+процессе (сигналы модели) сбрасывают кеш сразу.
+"""
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+
+from call_system import metrics
+
+logger = logging.getLogger(__name__)
+
+# Порядок категорий при равных баллах
+CATEGORY_PRIORITY = ('complaint', 'order', 'support')
+DEFAULT_CATEGORY = 'inquiry'
+
+
+class Automaton:
+    """
+    Автомат Ахо-Корасик для набора терминов.
+    
+    Args:
+        terms: Список терминов (в нижнем регистре)
+    """
+    
+    def __init__(self, terms):
+        self.terms = list(terms)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        # Термины, совпадающие с путем до узла (без суффиксных)
+        self._terminal = [()]
+        # Длина самого длинного термина: дальше спуск от начала слова не заходит
+        self._depth = max((len(term) for term in self.terms), default=0)
+        
+        for index, term in enumerate(self.terms):
+            node = 0
+            for char in term:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._terminal.append(())
+                node = child
+            self._output[node] += (index,)
+            self._terminal[node] += (index,)
+        
+        # Ссылки неудач обходом в ширину; выходы узла дополняются выходами
+        # суффиксного узла, чтобы при поиске не ходить по цепочке
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] += self._output[self._fail[child]]
+                queue.append(child)
+    
+    def search(self, text, word_starts=None):
+        """
+        Находит вхождения терминов, начинающиеся с начала слова.
+        
+        Args:
+            text: Текст в нижнем регистре
+            word_starts: Смещения начала слов (из токенизации); если не заданы,
+                началом слова считается позиция после не буквенно-цифрового символа
+        
+        Yields:
+            tuple: (индекс термина, начало, конец)
+        """
+        if word_starts is not None:
+            yield from self._search_from(text, word_starts)
+            return
+        
+        goto, fail, output, terms = self._goto, self._fail, self._output, self.terms
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                start = position - len(terms[index]) + 1
+                if start and text[start - 1].isalnum():
+                    continue
+                yield index, start, position + 1
+    
+    def count(self, text, word_starts):
+        """
+        Число вхождений терминов, начинающихся в word_starts.
+        
+        Спуск по бору зависит только от первых _depth символов после
+        начала слова, поэтому одинаковые префиксы считаются один раз.
+        
+        Returns:
+            Counter: Индекс термина -> число вхождений
+        """
+        depth = self._depth
+        counts = Counter()
+        prefixes = Counter(text[start:start + depth] for start in word_starts)
+        for prefix, repeats in prefixes.items():
+            for index, _ in self._walk(prefix):
+                counts[index] += repeats
+        return counts
+    
+    def _search_from(self, text, word_starts):
+        """
+        Вхождения, начинающиеся в word_starts: спуск по бору от каждого
+        начала слова, результат спуска кешируется по префиксу.
+        """
+        depth = self._depth
+        walks = {}
+        for start in word_starts:
+            prefix = text[start:start + depth]
+            found = walks.get(prefix)
+            if found is None:
+                found = walks[prefix] = self._walk(prefix)
+            for index, length in found:
+                yield index, start, start + length
+    
+    def _walk(self, prefix):
+        """Термины, которыми начинается prefix: список (индекс, длина)."""
+        goto, terminal = self._goto, self._terminal
+        found = []
+        node = 0
+        for length, char in enumerate(prefix, 1):
+            node = goto[node].get(char)
+            if node is None:
+                break
+            found.extend((index, length) for index in terminal[node])
+        return found
+
+
+class CompiledLexicon:
+    """
+    Словарь языка: автомат и для каждого термина список
+    (вид, метка, вес) записей, в которых он встречается.
+    """
+    
+    def __init__(self, entries):
+        payloads = {}
+        for term, kind, label, weight in entries:
+            payloads.setdefault(term, []).append((kind, label, weight))
+        self.automaton = Automaton(payloads)
+        self.payloads = [payloads[term] for term in self.automaton.terms]
+    
+    def scan(self, text, word_starts=None):
+        """
+        Один проход по тексту в нижнем регистре.
+        
+        Баллы считаются по числу вхождений каждого термина; список
+        вхождений собирается только до LEXICON_MAX_MATCHES.
+        
+        Returns:
+            dict: Баллы категорий и тональности и найденные вхождения
+                {'categories': {...}, 'sentiment': {...}, 'matches': [...]}
+        """
+        scores = {'category': {}, 'sentiment': {}}
+        matches = []
+        limit = settings.LEXICON_MAX_MATCHES
+        
+        if word_starts is None:
+            counts = Counter(index for index, _, _ in self.automaton.search(text))
+        else:
+            counts = self.automaton.count(text, word_starts)
+        
+        for index, repeats in counts.items():
+            for kind, label, weight in self.payloads[index]:
+                # Отрицания учитываются только в тональности по сегментам (calls/sentiment.py)
+                bucket = scores.get(kind)
+                if bucket is not None:
+                    bucket[label] = bucket.get(label, 0.0) + weight * repeats
+        
+        if limit > 0:
+            for index, start, end in self.automaton.search(text, word_starts):
+                for kind, label, weight in self.payloads[index]:
+                    if kind in scores and len(matches) < limit:
+                        matches.append({
+                            'term': self.automaton.terms[index],
+                            'kind': kind,
+                            'label': label,
+                            'start': start,
+                            'end': end,
+                        })
+                if len(matches) >= limit:
+                    break
+        
+        return {
+            'categories': scores['category'],
+            'sentiment': scores['sentiment'],
+            'matches': matches,
+        }
+
+
+_lock = threading.Lock()
+_compiled = {}
+_version = None
+_checked_at = 0.0
+
+
+def lexicon_version():
+    """
+    Версия словарей: число записей и время последнего изменения.
+    Запрашивается из БД не чаще раза в LEXICON_CHECK_INTERVAL секунд.
+    """
+    global _version, _checked_at
+    from django.db.models import Count, Max
+    from .models import LexiconEntry
+    
+    now = time.monotonic()
+    if _version is None or now - _checked_at > settings.LEXICON_CHECK_INTERVAL:
+        state = LexiconEntry.objects.aggregate(count=Count('id'), changed=Max('updated_at'))
+        changed = state['changed'].timestamp() if state['changed'] else 0
+        _version = f"{state['count']}:{changed:.6f}"
+        _checked_at = now
+    return _version
+
+
+def invalidate():
+    """Сбрасывает кеш версии; автоматы пересоберутся при следующем обращении."""
+    global _version
+    _version = None
+
+
+def get_lexicon(language):
+    """
+    Возвращает скомпилированный словарь языка из кеша процесса,
+    пересобирая его, если словари изменились.
+    """
+    from .models import LexiconEntry
+    
+    version = lexicon_version()
+    cached = _compiled.get(language)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    
+    with _lock:
+        cached = _compiled.get(language)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        started = time.perf_counter()
+        entries = LexiconEntry.objects.filter(
+            language=language, is_active=True
+        ).values_list('term', 'kind', 'label', 'weight')
+        lexicon = CompiledLexicon(entries)
+        _compiled[language] = (version, lexicon)
+        
+        metrics.observe('lexicon_compile_ms', (time.perf_counter() - started) * 1000, language=language)
+        logger.info(
+            "Словарь %s скомпилирован: %d терминов, версия %s",
+            language, len(lexicon.automaton.terms), version
+        )
+        return lexicon
+
+
+def scan_tokens(tokens, language):
+    """
+    Баллы по словарю языка для потока токенов анализа (calls/tokens.py):
+    используются уже посчитанные нижний регистр и начала слов.
+    """
+    return get_lexicon(language).scan(tokens.lowered, tokens.word_starts)
+
+
+def best_category(scores):
+    """Категория с наибольшим баллом (при равенстве - по CATEGORY_PRIORITY)."""
+    if not scores:
+        return DEFAULT_CATEGORY
+    
+    def rank(label):
+        priority = CATEGORY_PRIORITY.index(label) if label in CATEGORY_PRIORITY else len(CATEGORY_PRIORITY)
+        return (-scores[label], priority)
+    
+    return min(scores, key=rank)
+
+
+def sentiment_label(scores):
+    """Тональность по баллам positive/negative."""
+    positive = scores.get('positive', 0)
+    negative = scores.get('negative', 0)
+    if positive > negative:
+        return 'positive'
+    elif negative > positive:
+        return 'negative'
+    return 'neutral'
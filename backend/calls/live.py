@@ -0,0 +1,287 @@
+"""
+Потоковая транскрипция (WebSocket ws/live/).
+
+Клиент передает аудио чанками (PCM s16le 16 кГц моно или Opus/WebM,
+который декодируется потоковым ffmpeg). Сессия держит в памяти только
+скользящее окно еще не зафиксированного аудио: модель периодически
+распознает окно, сегменты, закончившиеся раньше конца окна на
+LIVE_COMMIT_MARGIN_SECONDS, фиксируются и вырезаются из буфера.
+Полная запись пишется на диск в WAV и при закрытии сессии сохраняется
+как обычный Call с транскрипцией; анализ выполняет задача Celery.
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import uuid
+import wave
+
+import numpy as np
+from django.conf import settings
+from django.core.files import File
+
+from call_system.task_profiler import stage
+from .audio import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# whisper.transcribe ставит хуки kv-cache на модули модели,
+# поэтому параллельные вызовы одной модели сериализуются
+_inference_lock = threading.Lock()
+
+
+class LiveBufferOverflow(Exception):
+    """Клиент присылает аудио быстрее, чем сессия успевает распознавать."""
+
+
+class LiveSession:
+    """
+    Состояние одной потоковой сессии.
+    
+    feed() вызывается из event loop consumer, step()/finish() -
+    в потоке (sync_to_async), поэтому буфер защищен блокировкой.
+    """
+    
+    def __init__(self, user, language):
+        from .services import TranscriptionService
+        
+        self.user = user
+        self.language = language
+        self.service = TranscriptionService(settings.LIVE_WHISPER_MODEL)
+        self.segments = []
+        self.prompt = ''
+        self.total_samples = 0
+        
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # Сколько отсчетов буфера модель уже видела
+        self._seen = 0
+        # Время начала буфера от начала записи, секунд
+        self._offset = 0.0
+        self._tail = b''
+        self._lock = threading.Lock()
+        
+        fd, self._wav_path = tempfile.mkstemp(suffix='.wav', prefix='live_')
+        os.close(fd)
+        self._wav = wave.open(self._wav_path, 'wb')
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(SAMPLE_RATE)
+    
+    @property
+    def duration(self):
+        """Длительность принятого аудио в секундах."""
+        return self.total_samples / SAMPLE_RATE
+    
+    def feed(self, data):
+        """
+        Принимает PCM s16le: пишет в WAV и добавляет в окно.
+        
+        Raises:
+            LiveBufferOverflow: Буфер превысил LIVE_MAX_BUFFER_SECONDS
+                или запись превысила LIVE_MAX_DURATION_SECONDS
+        """
+        data = self._tail + data
+        usable = len(data) - len(data) % 2
+        data, self._tail = data[:usable], data[usable:]
+        if not data:
+            return
+        
+        self._wav.writeframes(data)
+        chunk = np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+        
+        with self._lock:
+            self._buffer = np.concatenate((self._buffer, chunk))
+            self.total_samples += chunk.size
+            buffered = self._buffer.size
+        
+        if buffered > settings.LIVE_MAX_BUFFER_SECONDS * SAMPLE_RATE:
+            raise LiveBufferOverflow('Буфер потоковой сессии переполнен')
+        if self.duration > settings.LIVE_MAX_DURATION_SECONDS:
+            raise LiveBufferOverflow('Превышена максимальная длительность записи')
+    
+    def ready(self):
+        """Накопилось ли достаточно нового аудио для очередного шага."""
+        with self._lock:
+            pending = self._buffer.size - self._seen
+        return pending >= settings.LIVE_STEP_SECONDS * SAMPLE_RATE
+    
+    def step(self, final=False):
+        """
+        Распознает текущее окно и фиксирует устоявшиеся сегменты.
+        
+        Args:
+            final: Зафиксировать все сегменты (конец записи)
+        
+        Returns:
+            tuple: (зафиксированные сегменты, текст незафиксированной части)
+        """
+        with self._lock:
+            audio = self._buffer[:int(settings.LIVE_WINDOW_SECONDS * SAMPLE_RATE)]
+            offset = self._offset
+        
+        if not audio.size:
+            return [], ''
+        
+        with _inference_lock, stage('inference.live', model=self.service.model_name):
+            result = self.service.model.transcribe(
+                audio,
+                language=self.language,
+                initial_prompt=self.prompt or None,
+                task='transcribe'
+            )
+        
+        window_end = audio.size / SAMPLE_RATE
+        window_full = window_end >= settings.LIVE_WINDOW_SECONDS
+        segments = result['segments']
+        
+        if final or window_full:
+            committed, pending = segments, []
+        else:
+            limit = window_end - settings.LIVE_COMMIT_MARGIN_SECONDS
+            committed = [s for s in segments if s['end'] <= limit]
+            pending = segments[len(committed):]
+        
+        if committed:
+            cut = committed[-1]['end']
+        elif window_full:
+            # Окно заполнено без речи: отбрасываем его
+            cut = window_end
+        else:
+            cut = 0.0
+        
+        result_segments = []
+        for segment in committed:
+            segment['start'] += offset
+            segment['end'] += offset
+            data = self.service._segment_data(segment)
+            if data['text']:
+                result_segments.append(data)
+        self.segments.extend(result_segments)
+        
+        text = ' '.join(s['text'] for s in result_segments)
+        if text:
+            self.prompt = (self.prompt + ' ' + text)[-settings.TRANSCRIPTION_PROMPT_CHARS:]
+        
+        cut_samples = int(cut * SAMPLE_RATE)
+        with self._lock:
+            self._buffer = self._buffer[cut_samples:].copy()
+            self._offset += cut_samples / SAMPLE_RATE
+            self._seen = max(0, audio.size - cut_samples)
+        
+        return result_segments, ' '.join(s['text'].strip() for s in pending)
+    
+    def finish(self):
+        """
+        Распознает остаток буфера.
+        
+        Returns:
+            list: Зафиксированные сегменты остатка
+        """
+        committed = []
+        while True:
+            with self._lock:
+                remaining = self._buffer.size
+            if not remaining:
+                break
+            segments, _ = self.step(final=True)
+            committed.extend(segments)
+            with self._lock:
+                # Модель не нашла речи в остатке
+                if self._buffer.size == remaining:
+                    self._buffer = self._buffer[:0]
+        return committed
+    
+    def persist(self):
+        """
+        Сохраняет запись как Call с транскрипцией.
+        
+        Returns:
+            Call | None: Созданный звонок или None, если аудио не было
+        """
+        from .models import Call, Transcription
+        
+        self._wav.close()
+        try:
+            if not self.total_samples:
+                return None
+            
+            with open(self._wav_path, 'rb') as f:
+                call = Call.objects.create(
+                    user=self.user,
+                    audio_file=File(f, name=f'live_{uuid.uuid4().hex}.wav'),
+                    source='live',
+                    language=self.language,
+                    language_source='user',
+                    duration=self.duration,
+                    status='processing'
+                )
+            
+            confidence = (
+                sum(s['confidence'] for s in self.segments) / len(self.segments)
+                if self.segments else 0
+            )
+            Transcription.objects.create(
+                call=call,
+                text=' '.join(s['text'] for s in self.segments),
+                confidence=confidence * 100,
+                segments=self.segments
+            )
+            return call
+        finally:
+            self.discard()
+    
+    def discard(self):
+        """Удаляет временный WAV."""
+        try:
+            self._wav.close()
+        except Exception:
+            pass
+        try:
+            os.unlink(self._wav_path)
+        except FileNotFoundError:
+            pass
+
+
+class StreamDecoder:
+    """
+    Потоковый декодер сжатого аудио (Opus/WebM/Ogg) через ffmpeg:
+    чанки пишутся в stdin, PCM s16le 16 кГц из stdout передается в on_pcm.
+    """
+    
+    def __init__(self, on_pcm):
+        self.on_pcm = on_pcm
+        self._process = None
+        self._reader = None
+    
+    async def start(self):
+        self._process = await asyncio.create_subprocess_exec(
+            'ffmpeg', '-nostdin', '-loglevel', 'error',
+            '-i', 'pipe:0',
+            '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le',
+            '-ar', str(SAMPLE_RATE), 'pipe:1',
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        self._reader = asyncio.create_task(self._read())
+    
+    async def write(self, data):
+        self._process.stdin.write(data)
+        await self._process.stdin.drain()
+    
+    async def close(self):
+        """Закрывает stdin и дожидается, пока ffmpeg отдаст остаток PCM."""
+        if self._process is None:
+            return
+        if not self._process.stdin.is_closing():
+            self._process.stdin.close()
+        await self._reader
+        await self._process.wait()
+    
+    async def _read(self):
+        while True:
+            data = await self._process.stdout.read(SAMPLE_RATE * 2)
+            if not data:
+                return
+            await self.on_pcm(data)
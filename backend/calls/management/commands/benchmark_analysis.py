@@ -0,0 +1,181 @@
+"""
+Команда для замера времени анализа транскрипции.
+"""
+import re
+import statistics
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from calls import lexicon
+from calls.models import Transcription
+from calls.services import get_analysis_service
+from calls.tokens import TokenStream
+
+# Прежние списки AnalysisService (до словарей в БД)
+_LEGACY_CATEGORIES = (
+    ('complaint', ['жалоба', 'проблема', 'плохо', 'недовольн', 'complaint', 'problem']),
+    ('order', ['заказ', 'купить', 'оформить', 'order', 'purchase', 'buy']),
+    ('support', ['помощь', 'поддержка', 'как', 'вопрос', 'help', 'support', 'question']),
+)
+_LEGACY_POSITIVE = ['хорошо', 'отлично', 'спасибо', 'благодарю', 'good', 'great', 'thanks']
+_LEGACY_NEGATIVE = ['плохо', 'ужасно', 'проблема', 'жалоба', 'bad', 'terrible', 'problem']
+
+_SAMPLE = (
+    'Здравствуйте, у меня проблема с заказом, который я оформила на прошлой неделе. '
+    'Курьер так и не приехал, и в поддержке мне не смогли ответить, когда будет доставка. '
+    'Спасибо, что перезвонили, давайте посмотрим статус заказа и оформим возврат. '
+)
+
+# Средний темп речи для оценки длины транскрипции по длительности
+_WORDS_PER_MINUTE = 130
+
+
+def _legacy_analysis(nlp, text):
+    """Прежний анализ: spaCy со всеми компонентами, повторная токенизация и два прохода по спискам."""
+    timings = {}
+    
+    started = time.perf_counter()
+    doc = nlp(text)
+    timings['nlp'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    keywords = [
+        token.lemma_.lower() for token in doc
+        if token.pos_ in ['NOUN', 'PROPN', 'VERB', 'ADJ'] and len(token.text) > 3 and not token.is_stop
+    ]
+    Counter(keywords).most_common(20)
+    timings['keywords'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    words = [w for w in re.findall(r'\b\w+\b', text.lower()) if len(w) > 3]
+    dict(Counter(words).most_common(50))
+    timings['frequency'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    text_lower = text.lower()
+    next((label for label, terms in _LEGACY_CATEGORIES if any(t in text_lower for t in terms)), 'inquiry')
+    text_lower = text.lower()
+    sum(1 for w in _LEGACY_POSITIVE if w in text_lower) - sum(1 for w in _LEGACY_NEGATIVE if w in text_lower)
+    timings['lexicon'] = time.perf_counter() - started
+    
+    return timings
+
+
+def _current_analysis(service, nlp, text, language):
+    """
+    Анализ одним проходом: spaCy без лишних компонентов и общий поток токенов.
+    Ключевые слова и частота считаются методами AnalysisService, ключевые
+    слова - вместе с ранжированием по частотам документов (TF-IDF).
+    """
+    timings = {}
+    
+    started = time.perf_counter()
+    tokens = TokenStream(nlp(text))
+    timings['nlp'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    service._extract_keywords(tokens, language)
+    timings['keywords'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    service._calculate_word_frequency(tokens)
+    timings['frequency'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    result = lexicon.scan_tokens(tokens, language)
+    lexicon.best_category(result['categories'])
+    lexicon.sentiment_label(result['sentiment'])
+    timings['lexicon'] = time.perf_counter() - started
+    
+    return timings
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает время анализа одной транскрипции прежним способом
+    (несколько токенизаций и проходов по тексту) и одним проходом.
+    """
+    
+    help = 'Замер времени анализа длинной транскрипции: до и после общего потока токенов'
+    
+    def add_arguments(self, parser):
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--call',
+            default='',
+            help='ID звонка, транскрипция которого берется за основу'
+        )
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=60,
+            help='Длительность разговора, до которой дополняется текст (по умолчанию 60)'
+        )
+        parser.add_argument(
+            '--language',
+            default='ru',
+            help='Язык модели spaCy (по умолчанию ru)'
+        )
+        parser.add_argument(
+            '--model',
+            default='',
+            help='Имя или путь модели spaCy (по умолчанию стандартная модель языка)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Число повторов, в отчете медиана (по умолчанию 5)'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет команду."""
+        import spacy
+        
+        language = options['language']
+        models = {'ru': 'ru_core_news_sm', 'en': 'en_core_web_sm'}
+        if language not in models:
+            raise CommandError(f'Неизвестный язык: {language}')
+        
+        text = self._text(options['call'], options['minutes'])
+        self.stdout.write(f'Текст: {len(text)} символов, {len(text.split())} слов')
+        
+        model = options['model'] or models[language]
+        legacy_nlp = spacy.load(model)
+        nlp = spacy.load(model, disable=settings.SPACY_DISABLED_COMPONENTS)
+        self.stdout.write(f"Модель: {model}, компоненты: {', '.join(legacy_nlp.pipe_names) or '-'}")
+        service = get_analysis_service()
+        
+        # Прогрев: словари, кеши spaCy
+        _legacy_analysis(legacy_nlp, _SAMPLE)
+        _current_analysis(service, nlp, _SAMPLE, language)
+        
+        before = [_legacy_analysis(legacy_nlp, text) for _ in range(options['repeat'])]
+        after = [_current_analysis(service, nlp, text, language) for _ in range(options['repeat'])]
+        
+        self.stdout.write(f"\n{'Этап':<12} {'до, мс':>10} {'после, мс':>10} {'ускорение':>10}")
+        for step in ('nlp', 'keywords', 'frequency', 'lexicon', 'total'):
+            old = self._median(before, step)
+            new = self._median(after, step)
+            speedup = f'{old / new:.1f}x' if new else '-'
+            self.stdout.write(f'{step:<12} {old:>10.1f} {new:>10.1f} {speedup:>10}')
+    
+    def _text(self, call_id, minutes):
+        """Текст транскрипции (звонка или самой длинной), дополненный до нужной длины."""
+        transcriptions = Transcription.objects.all()
+        if call_id:
+            transcriptions = transcriptions.filter(call_id=call_id)
+        base = transcriptions.order_by('-call__duration').values_list('text', flat=True).first() or _SAMPLE
+        
+        words = base.split()
+        target = minutes * _WORDS_PER_MINUTE
+        repeats = max(1, -(-target // max(len(words), 1)))
+        return ' '.join((words * repeats)[:max(target, len(words))])
+    
+    def _median(self, runs, step):
+        if step == 'total':
+            return statistics.median(sum(run.values()) for run in runs) * 1000
+        return statistics.median(run[step] for run in runs) * 1000
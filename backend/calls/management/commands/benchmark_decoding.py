@@ -0,0 +1,102 @@
+"""
+Команда для сравнения декодирования аудио в процессе и через ffmpeg.
+"""
+import os
+import resource
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from calls import decoders
+from calls.audio import SAMPLE_RATE, open_pcm
+
+# Окно, которым читается поток (как при транскрипции)
+_WINDOW = SAMPLE_RATE * 30
+_NATIVE_FORMATS = decoders.WAV_EXTENSIONS + decoders.SOUNDFILE_EXTENSIONS
+
+
+def _decode(path):
+    """
+    Декодирует файл целиком через open_pcm.
+    
+    Returns:
+        tuple: (время, мс; процессорное время вместе с дочерними процессами, мс; секунд аудио)
+    """
+    cpu_before = _cpu_seconds()
+    started = time.perf_counter()
+    with open_pcm(path) as stream:
+        while stream.read(_WINDOW).size == _WINDOW:
+            pass
+        seconds = stream.seconds_read
+    wall = time.perf_counter() - started
+    return wall * 1000, (_cpu_seconds() - cpu_before) * 1000, seconds
+
+
+def _cpu_seconds():
+    """Процессорное время процесса и завершенных дочерних процессов (ffmpeg)."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def _cpu_model():
+    """Модель процессора из /proc/cpuinfo (Linux)."""
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return 'unknown'
+
+
+class Command(BaseCommand):
+    """
+    Замеряет декодирование файлов в PCM 16 кГц: декодером в процессе
+    (для всех поддерживаемых форматов, независимо от AUDIO_NATIVE_FORMATS)
+    и через pipe ffmpeg.
+    """
+    
+    help = 'Замер декодирования аудио: в процессе и через ffmpeg'
+    
+    def add_arguments(self, parser):
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            help='Аудио файлы (WAV, Ogg/Opus)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Число повторов, в отчете медиана (по умолчанию 10)'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет команду."""
+        self.stdout.write(f'CPU: {_cpu_model()}, ядер: {os.cpu_count()}')
+        self.stdout.write(
+            f"\n{'Файл':<24} {'аудио, с':>9} {'декодер':>8} {'время, мс':>10} {'CPU, мс':>9}"
+        )
+        
+        for path in options['paths']:
+            if not os.path.exists(path):
+                raise CommandError(f'Файл не найден: {path}')
+            
+            for decoder, native in (('native', True), ('ffmpeg', False)):
+                with override_settings(AUDIO_NATIVE_DECODING=native, AUDIO_NATIVE_FORMATS=_NATIVE_FORMATS):
+                    # Прогрев: импорт scipy/soundfile, кеш страниц файла
+                    _decode(path)
+                    runs = [_decode(path) for _ in range(options['repeat'])]
+                
+                wall = statistics.median(run[0] for run in runs)
+                cpu = statistics.median(run[1] for run in runs)
+                seconds = runs[0][2]
+                self.stdout.write(
+                    f'{os.path.basename(path)[:24]:<24} {seconds:>9.1f} {decoder:>8} {wall:>10.1f} {cpu:>9.1f}'
+                )
+
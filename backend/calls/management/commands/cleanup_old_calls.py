@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 from calls.models import Call
+from calls import audio_cache
 import os
 
 
@@ -63,6 +64,7 @@ class Command(BaseCommand):
         for call in old_calls:
             if call.audio_file:
                 try:
+                    audio_cache.remove(call.audio_file.path)
                     if os.path.exists(call.audio_file.path):
                         os.remove(call.audio_file.path)
                         deleted_files += 1
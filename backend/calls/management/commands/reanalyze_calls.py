@@ -0,0 +1,226 @@
+"""
+Команда для массового переанализа транскрипций.
+"""
+import json
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from calls import corpus
+from calls.fingerprint import stale
+from calls.models import CallAnalysis, Transcription
+from calls.services import AnalysisService
+from calls.tokens import TokenStream
+
+
+class Command(BaseCommand):
+    """
+    Заново анализирует готовые транскрипции без повторного распознавания
+    (после изменения словарей или моделей spaCy).
+    
+    Транскрипции читаются потоком по возрастанию id, тексты обрабатываются
+    пачками через nlp.pipe, анализы записываются bulk_create/bulk_update
+    порциями по --chunk-size. После каждой порции id последней транскрипции
+    сохраняется в файл контрольной точки, и с --resume команда продолжает
+    с места остановки.
+    
+    По умолчанию выбираются только транскрипции без анализа или с анализом,
+    выполненным другой версией анализатора (запрос по индексу
+    CallAnalysis.analyzer_version); --force переанализирует все.
+    """
+    
+    help = 'Массовый переанализ транскрипций через nlp.pipe'
+    
+    def add_arguments(self, parser):
+        """Добавляет аргументы команды."""
+        parser.add_argument(
+            '--language',
+            action='append',
+            default=[],
+            help='Язык звонков (можно указать несколько раз; по умолчанию все с моделью spaCy)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=64,
+            help='Размер пачки nlp.pipe (по умолчанию 64)'
+        )
+        parser.add_argument(
+            '--n-process',
+            type=int,
+            default=1,
+            help='Число процессов nlp.pipe (по умолчанию 1)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Строк на чтение из БД и на одну запись анализов (по умолчанию 500)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Обработать не больше указанного числа транскрипций'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='reanalyze_calls.checkpoint.json',
+            help='Файл контрольной точки (по умолчанию reanalyze_calls.checkpoint.json)'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Переанализировать и актуальные анализы'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить с контрольной точки'
+        )
+    
+    def handle(self, *args, **options):
+        """Выполняет команду."""
+        if options['batch_size'] < 1 or options['chunk_size'] < 1 or options['n_process'] < 1:
+            raise CommandError('--batch-size, --chunk-size и --n-process должны быть положительными')
+        
+        service = AnalysisService()
+        languages = options['language'] or [lang for lang, nlp in service.pipelines.items() if nlp]
+        for language in languages:
+            if not service.pipelines.get(language):
+                raise CommandError(f'Нет модели spaCy для языка {language}')
+        
+        state = self._load_checkpoint(options['checkpoint']) if options['resume'] else {}
+        if state:
+            self.stdout.write(self.style.WARNING(f'Продолжение с контрольной точки: {state}'))
+        
+        started = time.perf_counter()
+        total = 0
+        chars = 0
+        limit = options['limit']
+        
+        for language in languages:
+            if limit and total >= limit:
+                break
+            
+            rows = Transcription.objects.filter(
+                call__language=language
+            ).exclude(text='').select_related('call').only(
+                'id', 'text', 'segments_packed', 'segments_json', 'call__id', 'call__language'
+            ).order_by('id')
+            if not options['force']:
+                rows = rows.filter(
+                    Q(call__analysis__isnull=True) | stale(service.fingerprint(language), 'call__analysis__')
+                )
+            if state.get(language):
+                rows = rows.filter(id__gt=state[language])
+            if limit:
+                rows = rows[:limit - total]
+            
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\nЯзык {language}'))
+            
+            for chunk in self._analyze(service, language, rows, options):
+                self._write(chunk)
+                
+                total += len(chunk)
+                chars += sum(len(transcription.text) for transcription, _ in chunk)
+                state[language] = str(chunk[-1][0].id)
+                self._save_checkpoint(options['checkpoint'], state)
+                
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{total:>8} транскрипций  {total / elapsed:>8.1f} в секунду  '
+                    f'{chars / elapsed / 1000:>8.1f} тыс. символов в секунду'
+                )
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Переанализировано {total} транскрипций за {elapsed:.1f} с '
+            f'({total / elapsed if elapsed else 0:.1f} в секунду)'
+        ))
+    
+    def _analyze(self, service, language, rows, options):
+        """
+        Прогоняет транскрипции через nlp.pipe и отдает порции
+        [(транскрипция, поля анализа), ...] по --chunk-size.
+        """
+        nlp = service.pipelines[language]
+        # В nlp.pipe уходят только тексты и id (контекст должен передаваться
+        # в дочерние процессы), сами строки ждут своих документов здесь
+        pending = {}
+        
+        def texts():
+            for transcription in rows.iterator(chunk_size=options['chunk_size']):
+                pending[transcription.id] = transcription
+                yield transcription.text, transcription.id
+        
+        docs = nlp.pipe(
+            texts(),
+            as_tuples=True,
+            batch_size=options['batch_size'],
+            n_process=options['n_process']
+        )
+        
+        chunk = []
+        for doc, transcription_id in docs:
+            transcription = pending.pop(transcription_id)
+            fields = service.analysis_fields(transcription, TokenStream(doc), language)
+            chunk.append((transcription, fields))
+            if len(chunk) >= options['chunk_size']:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    def _write(self, chunk):
+        """
+        Обновляет существующие анализы и создает недостающие. bulk-операции
+        не вызывают сигналы модели, поэтому документные частоты
+        обновляются здесь, одной порцией изменений на весь чанк.
+        """
+        call_ids = [transcription.call_id for transcription, _ in chunk]
+        existing = {
+            analysis.call_id: analysis
+            for analysis in CallAnalysis.objects.filter(call_id__in=call_ids)
+        }
+        
+        to_update = []
+        to_create = []
+        deltas = Counter()
+        for transcription, fields in chunk:
+            analysis = existing.get(transcription.call_id)
+            if analysis is None:
+                to_create.append(CallAnalysis(call_id=transcription.call_id, **fields))
+                corpus.collect_deltas(None, fields['document_terms'], deltas)
+            else:
+                corpus.collect_deltas(analysis.document_terms, fields['document_terms'], deltas)
+                for name, value in fields.items():
+                    setattr(analysis, name, value)
+                to_update.append(analysis)
+        
+        fields = list(chunk[0][1])
+        with transaction.atomic():
+            if to_update:
+                CallAnalysis.objects.bulk_update(to_update, fields)
+            if to_create:
+                CallAnalysis.objects.bulk_create(to_create)
+            corpus.apply_deltas(deltas)
+    
+    def _load_checkpoint(self, path):
+        """Последние обработанные id транскрипций по языкам."""
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f).get('languages', {})
+    
+    def _save_checkpoint(self, path, state):
+        """Записывает контрольную точку атомарно (через временный файл)."""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'languages': state, 'saved_at': timezone.now().isoformat()}, f)
+        os.replace(tmp_path, path)
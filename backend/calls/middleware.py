@@ -24,7 +24,7 @@ def get_user_from_token(token_string):
         user = User.objects.get(id=user_id)
         return user
     except Exception as e:
-        logger.error(f"Ошибка аутентификации токена: {e}")
+        logger.error("Ошибка аутентификации токена: %s", e)
         return AnonymousUser()
 
 
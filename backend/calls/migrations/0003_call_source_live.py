@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0002_rename_calls_call_user_id_created_idx_calls_call_user_id_ed5279_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='call',
+            name='source',
+            field=models.CharField(choices=[('web', 'Веб интерфейс'), ('telegram', 'Telegram'), ('api', 'API'), ('live', 'Потоковая запись')], default='web', max_length=20, verbose_name='Источник'),
+        ),
+    ]
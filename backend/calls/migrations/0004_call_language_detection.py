@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0003_call_source_live'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='language_confidence',
+            field=models.FloatField(blank=True, null=True, verbose_name='Уверенность определения языка'),
+        ),
+        migrations.AddField(
+            model_name='call',
+            name='language_source',
+            field=models.CharField(choices=[('auto', 'Определяется по аудио'), ('user', 'Указан пользователем')], default='auto', max_length=10, verbose_name='Источник языка'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.1 on 2026-10-19 08:02
+
+from django.db import migrations, models
+
+from calls.segments import SegmentList, pack
+
+BATCH_SIZE = 500
+
+
+def pack_existing(apps, schema_editor):
+    """Упаковывает сегменты существующих транскрипций."""
+    Transcription = apps.get_model('calls', 'Transcription')
+    rows = Transcription.objects.filter(segments_packed__isnull=True).only('id', 'segments_json')
+
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        row.segments_packed = pack(row.segments_json or [])
+        row.segments_json = []
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            Transcription.objects.bulk_update(batch, ['segments_packed', 'segments_json'])
+            batch = []
+    if batch:
+        Transcription.objects.bulk_update(batch, ['segments_packed', 'segments_json'])
+
+
+def unpack_existing(apps, schema_editor):
+    """Возвращает сегменты в JSON."""
+    Transcription = apps.get_model('calls', 'Transcription')
+    rows = Transcription.objects.filter(segments_packed__isnull=False).only('id', 'segments_packed')
+
+    batch = []
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        row.segments_json = SegmentList(row.segments_packed).to_list()
+        row.segments_packed = None
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            Transcription.objects.bulk_update(batch, ['segments_packed', 'segments_json'])
+            batch = []
+    if batch:
+        Transcription.objects.bulk_update(batch, ['segments_packed', 'segments_json'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0004_call_language_detection'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='transcription',
+            old_name='segments',
+            new_name='segments_json',
+        ),
+        migrations.AlterField(
+            model_name='transcription',
+            name='segments_json',
+            field=models.JSONField(blank=True, default=list, verbose_name='Сегменты (JSON)'),
+        ),
+        migrations.AddField(
+            model_name='transcription',
+            name='segments_packed',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Сегменты'),
+        ),
+        migrations.RunPython(pack_existing, unpack_existing),
+    ]
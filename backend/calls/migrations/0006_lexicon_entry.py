@@ -0,0 +1,37 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0005_transcription_packed_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callanalysis',
+            name='lexicon_scores',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Баллы словарей'),
+        ),
+        migrations.CreateModel(
+            name='LexiconEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=5, verbose_name='Язык')),
+                ('kind', models.CharField(choices=[('category', 'Категория'), ('sentiment', 'Тональность')], max_length=20, verbose_name='Вид')),
+                ('label', models.CharField(help_text='Код категории (complaint, order, ...) или тональности (positive, negative)', max_length=20, verbose_name='Метка')),
+                ('term', models.CharField(help_text='Совпадает с началом слова: «недовольн» найдет «недовольна»', max_length=100, verbose_name='Термин')),
+                ('weight', models.FloatField(default=1.0, verbose_name='Вес')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Термин словаря',
+                'verbose_name_plural': 'Словари анализа',
+                'ordering': ['language', 'kind', 'label', 'term'],
+                'unique_together': {('language', 'kind', 'label', 'term')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:30
+
+from django.db import migrations
+
+# Списки, которые раньше были зашиты в AnalysisService
+LEXICON = {
+    'ru': {
+        ('category', 'complaint'): ['жалоба', 'проблема', 'плохо', 'недовольн'],
+        ('category', 'order'): ['заказ', 'купить', 'оформить'],
+        ('category', 'support'): ['помощь', 'поддержка', 'как', 'вопрос'],
+        ('sentiment', 'positive'): ['хорошо', 'отлично', 'спасибо', 'благодарю'],
+        ('sentiment', 'negative'): ['плохо', 'ужасно', 'проблема', 'жалоба'],
+    },
+    'en': {
+        ('category', 'complaint'): ['complaint', 'problem'],
+        ('category', 'order'): ['order', 'purchase', 'buy'],
+        ('category', 'support'): ['help', 'support', 'question'],
+        ('sentiment', 'positive'): ['good', 'great', 'thanks'],
+        ('sentiment', 'negative'): ['bad', 'terrible', 'problem'],
+    },
+}
+
+
+def seed_lexicon(apps, schema_editor):
+    LexiconEntry = apps.get_model('calls', 'LexiconEntry')
+    LexiconEntry.objects.bulk_create(
+        [
+            LexiconEntry(language=language, kind=kind, label=label, term=term)
+            for language, groups in LEXICON.items()
+            for (kind, label), terms in groups.items()
+            for term in terms
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_lexicon(apps, schema_editor):
+    LexiconEntry = apps.get_model('calls', 'LexiconEntry')
+    for language, groups in LEXICON.items():
+        for (kind, label), terms in groups.items():
+            LexiconEntry.objects.filter(
+                language=language, kind=kind, label=label, term__in=terms
+            ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0006_lexicon_entry'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_lexicon, remove_lexicon),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0007_seed_lexicon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callanalysis',
+            name='document_terms',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Термины документа'),
+        ),
+        migrations.CreateModel(
+            name='DocumentFrequency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=5, verbose_name='Язык')),
+                ('term', models.CharField(blank=True, max_length=100, verbose_name='Термин')),
+                ('document_count', models.PositiveIntegerField(default=0, verbose_name='Число документов')),
+            ],
+            options={
+                'verbose_name': 'Документная частота',
+                'verbose_name_plural': 'Документные частоты',
+                'unique_together': {('language', 'term')},
+            },
+        ),
+    ]
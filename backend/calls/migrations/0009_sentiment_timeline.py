@@ -0,0 +1,43 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0008_document_frequency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callanalysis',
+            name='sentiment_final',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Тональность последней минуты'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='sentiment_min',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Минимальная тональность'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='sentiment_timeline',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Шкала тональности'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='sentiment_trend',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Тренд тональности (в минуту)'),
+        ),
+        migrations.AlterField(
+            model_name='lexiconentry',
+            name='kind',
+            field=models.CharField(choices=[('category', 'Категория'), ('sentiment', 'Тональность'), ('negation', 'Отрицание')], max_length=20, verbose_name='Вид'),
+        ),
+        migrations.AlterField(
+            model_name='lexiconentry',
+            name='label',
+            field=models.CharField(help_text='Код категории (complaint, order, ...), тональности (positive, negative) или negation', max_length=20, verbose_name='Метка'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:40
+
+from django.db import migrations
+
+# Отрицания для тональности по сегментам: меняют знак следующих терминов
+NEGATIONS = {
+    'ru': ['не', 'нет', 'ни', 'никогда', 'ничуть', 'нисколько'],
+    'en': ['not', 'no', 'never', "don't", "doesn't", "didn't", "isn't", "wasn't", "won't", "can't"],
+}
+
+
+def seed_negations(apps, schema_editor):
+    LexiconEntry = apps.get_model('calls', 'LexiconEntry')
+    LexiconEntry.objects.bulk_create(
+        [
+            LexiconEntry(language=language, kind='negation', label='negation', term=term)
+            for language, terms in NEGATIONS.items()
+            for term in terms
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_negations(apps, schema_editor):
+    LexiconEntry = apps.get_model('calls', 'LexiconEntry')
+    for language, terms in NEGATIONS.items():
+        LexiconEntry.objects.filter(
+            language=language, kind='negation', label='negation', term__in=terms
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0009_sentiment_timeline'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_negations, remove_negations),
+    ]
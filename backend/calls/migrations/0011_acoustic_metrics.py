@@ -0,0 +1,33 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0010_seed_negations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callanalysis',
+            name='hold_time',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Время удержания (сек)'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='loudness_dbfs',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Громкость (dBFS)'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='silence_ratio',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Доля тишины'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='speaking_rate',
+            field=models.FloatField(blank=True, db_index=True, null=True, verbose_name='Темп речи (слов в минуту)'),
+        ),
+    ]
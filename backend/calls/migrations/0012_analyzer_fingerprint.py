@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calls', '0011_acoustic_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callanalysis',
+            name='analyzer_version',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Версия анализатора'),
+        ),
+        migrations.AddField(
+            model_name='callanalysis',
+            name='text_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Хеш текста'),
+        ),
+    ]
@@ -5,6 +5,8 @@ from django.db import models
 from django.conf import settings
 import uuid
 
+from .segments import SegmentList, pack as pack_segments
+
 
 class Call(models.Model):
     """
@@ -22,6 +24,16 @@ class Call(models.Model):
         ('web', 'Веб интерфейс'),
         ('telegram', 'Telegram'),
         ('api', 'API'),
+        ('live', 'Потоковая запись'),
+    )
+    
+    # Этапы обработки, которые можно выбрать при загрузке (calls/tasks.py)
+    STAGE_CHOICES = (
+        ('transcribe', 'Транскрипция'),
+        ('analyze', 'Анализ текста'),
+        ('diarize', 'Разделение дикторов'),
+        ('acoustics', 'Акустические показатели'),
+        ('notify', 'Уведомление'),
     )
     
     id = models.UUIDField(
@@ -62,12 +74,30 @@ class Call(models.Model):
         verbose_name='Источник'
     )
     
+    LANGUAGE_SOURCE_CHOICES = (
+        ('auto', 'Определяется по аудио'),
+        ('user', 'Указан пользователем'),
+    )
+    
     language = models.CharField(
         max_length=5,
         default='ru',
         verbose_name='Язык'
     )
     
+    language_source = models.CharField(
+        max_length=10,
+        choices=LANGUAGE_SOURCE_CHOICES,
+        default='auto',
+        verbose_name='Источник языка'
+    )
+    
+    language_confidence = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Уверенность определения языка'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата создания'
@@ -89,6 +119,11 @@ class Call(models.Model):
     
     def __str__(self):
         return f"Звонок {self.id} от {self.user.username}"
+    
+    @property
+    def needs_language_detection(self):
+        """Язык не указан пользователем и еще не определен по аудио."""
+        return self.language_source == 'auto' and self.language_confidence is None
 
 
 class Transcription(models.Model):
@@ -119,11 +154,20 @@ class Transcription(models.Model):
         verbose_name='Уверенность (%)'
     )
     
-    segments = models.JSONField(
-        default=list,
+    # Сегменты хранятся упакованными (calls/segments.py); JSON остается
+    # только у записей, созданных до перехода на колоночный формат
+    segments_packed = models.BinaryField(
+        null=True,
+        blank=True,
         verbose_name='Сегменты'
     )
     
+    segments_json = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Сегменты (JSON)'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата создания'
@@ -134,7 +178,29 @@ class Transcription(models.Model):
         verbose_name_plural = 'Транскрипции'
     
     def __str__(self):
-        return f"Транскрипция {self.call.id}"
+        return f"Транскрипция {self.call_id}"
+    
+    @property
+    def segments(self):
+        """
+        Сегменты транскрипции (SegmentList): последовательность словарей
+        с ленивой распаковкой и доступом к колонкам массивами.
+        """
+        blob = self.segments_packed
+        cached = self.__dict__.get('_segments')
+        if cached is None or cached[0] is not blob:
+            if blob is not None:
+                value = SegmentList(blob)
+            else:
+                value = SegmentList.from_list(self.segments_json)
+            cached = (blob, value)
+            self.__dict__['_segments'] = cached
+        return cached[1]
+    
+    @segments.setter
+    def segments(self, value):
+        self.segments_packed = pack_segments(value)
+        self.segments_json = []
 
 
 class CallAnalysis(models.Model):
@@ -199,6 +265,96 @@ class CallAnalysis(models.Model):
         verbose_name='Краткое содержание'
     )
     
+    lexicon_scores = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Баллы словарей'
+    )
+    
+    # Тональность по сегментам (calls/sentiment.py): упакованная шкала
+    # и сводные показатели для фильтров, баллы в диапазоне [-1, 1]
+    sentiment_timeline = models.BinaryField(
+        null=True,
+        blank=True,
+        verbose_name='Шкала тональности'
+    )
+    
+    sentiment_min = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Минимальная тональность'
+    )
+    
+    sentiment_trend = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Тренд тональности (в минуту)'
+    )
+    
+    sentiment_final = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Тональность последней минуты'
+    )
+    
+    # Акустические показатели (calls/acoustics.py)
+    loudness_dbfs = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Громкость (dBFS)'
+    )
+    
+    silence_ratio = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Доля тишины'
+    )
+    
+    hold_time = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Время удержания (сек)'
+    )
+    
+    speaking_rate = models.FloatField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Темп речи (слов в минуту)'
+    )
+    
+    # Леммы, учтенные в документной частоте (DocumentFrequency):
+    # {'language': 'ru', 'terms': [...]}. По ним таблица частот
+    # уменьшается при удалении анализа или повторном анализе
+    document_terms = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Термины документа'
+    )
+    
+    # Отпечаток анализатора и хеш текста, по которым выполнен анализ
+    # (calls/fingerprint.py): при совпадении повторный анализ не нужен
+    analyzer_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        verbose_name='Версия анализатора'
+    )
+    
+    text_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name='Хеш текста'
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата создания'
@@ -209,7 +365,14 @@ class CallAnalysis(models.Model):
         verbose_name_plural = 'Анализы звонков'
     
     def __str__(self):
-        return f"Анализ {self.call.id}"
+        return f"Анализ {self.call_id}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Термины на момент загрузки: при сохранении сигнал учитывает в частотах разницу
+        instance._saved_document_terms = instance.__dict__.get('document_terms')
+        return instance
 
 
 class CallNote(models.Model):
@@ -251,4 +414,118 @@ class CallNote(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Заметка к {self.call.id}"
+        return f"Заметка к {self.call_id}"
+
+
+class LexiconEntry(models.Model):
+    """
+    Термин словаря категорий или тональности для анализа звонков.
+    """
+    
+    KIND_CHOICES = (
+        ('category', 'Категория'),
+        ('sentiment', 'Тональность'),
+        ('negation', 'Отрицание'),
+    )
+    
+    SENTIMENT_CHOICES = (
+        ('positive', 'Позитивная'),
+        ('negative', 'Негативная'),
+    )
+    
+    language = models.CharField(
+        max_length=5,
+        verbose_name='Язык'
+    )
+    
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        verbose_name='Вид'
+    )
+    
+    label = models.CharField(
+        max_length=20,
+        verbose_name='Метка',
+        help_text='Код категории (complaint, order, ...), тональности (positive, negative) или negation'
+    )
+    
+    term = models.CharField(
+        max_length=100,
+        verbose_name='Термин',
+        help_text='Совпадает с началом слова: «недовольн» найдет «недовольна»'
+    )
+    
+    weight = models.FloatField(
+        default=1.0,
+        verbose_name='Вес'
+    )
+    
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активен'
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+    
+    class Meta:
+        verbose_name = 'Термин словаря'
+        verbose_name_plural = 'Словари анализа'
+        ordering = ['language', 'kind', 'label', 'term']
+        unique_together = ('language', 'kind', 'label', 'term')
+    
+    def __str__(self):
+        return f"{self.term} ({self.language}, {self.kind}: {self.label})"
+    
+    def clean(self):
+        """Проверяет метку по виду термина и приводит термин к нижнему регистру."""
+        from django.core.exceptions import ValidationError
+        
+        self.term = self.term.strip().lower()
+        if self.kind == 'category':
+            allowed = dict(CallAnalysis.CATEGORY_CHOICES)
+        elif self.kind == 'negation':
+            allowed = {'negation': 'Отрицание'}
+        else:
+            allowed = dict(self.SENTIMENT_CHOICES)
+        if self.label not in allowed:
+            raise ValidationError({'label': f"Допустимые метки: {', '.join(allowed)}"})
+    
+    def save(self, *args, **kwargs):
+        self.term = self.term.strip().lower()
+        super().save(*args, **kwargs)
+
+
+class DocumentFrequency(models.Model):
+    """
+    Документная частота леммы: в скольких анализах звонков языка она
+    встречается. Обновляется при создании и удалении анализов
+    (calls/corpus.py), строка с пустым термином хранит число документов.
+    """
+    
+    language = models.CharField(
+        max_length=5,
+        verbose_name='Язык'
+    )
+    
+    term = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Термин'
+    )
+    
+    document_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число документов'
+    )
+    
+    class Meta:
+        verbose_name = 'Документная частота'
+        verbose_name_plural = 'Документные частоты'
+        unique_together = ('language', 'term')
+    
+    def __str__(self):
+        return f"{self.term or '<документов>'} ({self.language}): {self.document_count}"
@@ -1,6 +1,7 @@
 """
 Модуль отправки уведомлений пользователям через Telegram.
 """
+import html
 import logging
 from django.conf import settings
 from aiogram import Bot
@@ -18,27 +19,80 @@ class TelegramNotifier:
         """Инициализирует Telegram бота."""
         self.bot = Bot(token=settings.TELEGRAM_BOT_TOKEN)
     
-    def send_transcription_ready(self, user, call_id):
+    async def send_transcription_ready(self, user, call_id, text=None, status_message=None):
         """
         Отправляет уведомление о готовности транскрипции.
         
+        Если известно статусное сообщение бота (chat_id, message_id),
+        в нем черновик заменяется началом итоговой транскрипции.
+        
         Args:
             user: Объект пользователя
             call_id: ID звонка
+            text: Текст итоговой транскрипции
+            status_message: (chat_id, message_id) статусного сообщения
         """
         if not user.telegram_id:
-            logger.warning(f"Пользователь {user.username} не имеет Telegram ID")
+            logger.warning("Пользователь %s не имеет Telegram ID", user.username)
             return
         
-        message = (
-            f"✅ <b>Транскрипция готова!</b>\n\n"
-            f"🆔 ID звонка: <code>{call_id}</code>\n\n"
-            f"Используйте /calls для просмотра результата."
-        )
+        try:
+            if status_message and text is not None:
+                await self.edit_status_message(
+                    *status_message,
+                    f"✅ <b>Транскрипция готова</b>\n"
+                    f"🆔 ID звонка: <code>{call_id}</code>\n\n"
+                    f"{html.escape(_preview(text))}"
+                )
+            
+            message = (
+                f"✅ <b>Транскрипция готова!</b>\n\n"
+                f"🆔 ID звонка: <code>{call_id}</code>\n\n"
+                f"Используйте /calls для просмотра результата."
+            )
+            await self._send_message(user.telegram_id, message)
+        finally:
+            await self.bot.session.close()
+    
+    async def send_draft(self, status_message, call_id, text, seconds):
+        """
+        Показывает черновик транскрипции в статусном сообщении бота.
         
-        asyncio.create_task(
-            self._send_message(user.telegram_id, message)
-        )
+        Args:
+            status_message: (chat_id, message_id) статусного сообщения
+            call_id: ID звонка
+            text: Текст черновика
+            seconds: Сколько секунд записи покрывает черновик
+        """
+        try:
+            await self.edit_status_message(
+                *status_message,
+                f"📝 <b>Черновик</b> (первые {seconds} сек)\n"
+                f"🆔 ID звонка: <code>{call_id}</code>\n\n"
+                f"{html.escape(_preview(text))}\n\n"
+                f"⏳ Полная транскрипция в работе..."
+            )
+        finally:
+            await self.bot.session.close()
+    
+    async def edit_status_message(self, chat_id, message_id, text):
+        """
+        Заменяет текст ранее отправленного сообщения бота.
+        
+        Args:
+            chat_id: ID чата
+            message_id: ID сообщения
+            text: Новый текст (HTML)
+        """
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=chat_id,
+                message_id=message_id,
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.error("Ошибка обновления сообщения %s в чате %s: %s", message_id, chat_id, e)
     
     def send_daily_report(self, admin, report):
         """
@@ -101,6 +155,12 @@ class TelegramNotifier:
                 text=text,
                 parse_mode="HTML"
             )
-            logger.info(f"Уведомление отправлено в чат {chat_id}")
+            logger.info("Уведомление отправлено в чат %s", chat_id)
         except Exception as e:
-            logger.error(f"Ошибка отправки уведомления: {e}")
+            logger.error("Ошибка отправки уведомления: %s", e)
+
+
+def _preview(text, limit=3000):
+    """Обрезает текст до лимита сообщения Telegram с запасом на разметку."""
+    text = text.strip()
+    return text if len(text) <= limit else text[:limit].rstrip() + '…'
@@ -0,0 +1,216 @@
+"""
+Перекрытие декодирования аудио и инференса.
+
+- decode_ahead(): внутри задачи ffmpeg декодирует следующие окна в фоновом
+  потоке, пока модель распознает текущее (до TRANSCRIPTION_DECODE_AHEAD блоков);
+- prefetch_upcoming(): пул потоков воркера заранее декодирует аудио
+  следующих звонков в очереди (status=pending) в кеш PCM (audio_cache),
+  и их задачи стартуют сразу с инференса.
+
+Время декодирования, скрытое за инференсом, пишется в метрики
+decode_hidden_ms / decode_wait_ms.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+
+from call_system import metrics
+from . import audio_cache
+from .audio import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+# Блок, которым фоновый поток читает PCM
+BLOCK_SAMPLES = SAMPLE_RATE * 10
+
+
+class PrefetchingStream:
+    """
+    Обертка потока PCM: фоновый поток читает блоки в ограниченную очередь.
+    Исходный поток не закрывается оберткой, им владеет вызывающий код.
+    """
+    
+    def __init__(self, stream, depth, block_samples=BLOCK_SAMPLES):
+        self.stream = stream
+        self.sample_rate = stream.sample_rate
+        self.block_samples = block_samples
+        self.samples_read = 0
+        self.decode_ms = 0.0
+        self.wait_ms = 0.0
+        self._queue = queue.Queue(maxsize=depth)
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._produce,
+            name='pcm-decode-ahead',
+            daemon=True
+        )
+        self._thread.start()
+    
+    def read(self, samples):
+        """Читает до samples отсчетов (короче только в конце потока)."""
+        parts = [self._buffer]
+        available = self._buffer.size
+        
+        while available < samples and not self._eof:
+            started = time.perf_counter()
+            item = self._queue.get()
+            self.wait_ms += (time.perf_counter() - started) * 1000
+            
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            parts.append(item)
+            available += item.size
+            if item.size < self.block_samples:
+                self._eof = True
+        
+        data = np.concatenate(parts) if len(parts) > 1 else parts[0]
+        chunk, self._buffer = data[:samples], data[samples:]
+        self.samples_read += chunk.size
+        return chunk
+    
+    @property
+    def seconds_read(self):
+        return self.samples_read / self.sample_rate
+    
+    def close(self):
+        """Останавливает фоновый поток и экспортирует метрики перекрытия."""
+        self._stop.set()
+        self._thread.join()
+        
+        metrics.observe('decode_wait_ms', self.wait_ms)
+        metrics.observe('decode_hidden_ms', max(0.0, self.decode_ms - self.wait_ms))
+    
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                chunk = self.stream.read(self.block_samples)
+                self.decode_ms += (time.perf_counter() - started) * 1000
+                
+                if not self._put(chunk) or chunk.size < self.block_samples:
+                    return
+        except BaseException as e:
+            self._put(e)
+    
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def decode_ahead(stream):
+    """
+    Возвращает поток с декодированием наперед или исходный поток,
+    если он уже читается из кеша или перекрытие выключено.
+    """
+    depth = settings.TRANSCRIPTION_DECODE_AHEAD
+    if depth <= 0 or isinstance(stream, audio_cache.MappedPcmStream):
+        return _Passthrough(stream)
+    return PrefetchingStream(stream, depth)
+
+
+class _Passthrough:
+    """Контекстный менеджер, возвращающий поток без обертки и не закрывающий его."""
+    
+    def __init__(self, stream):
+        self.stream = stream
+    
+    def __enter__(self):
+        return self.stream
+    
+    def __exit__(self, *exc):
+        pass
+
+
+_executor = None
+_executor_pid = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # Пул не переживает fork воркера Celery, создаем заново в дочернем процессе
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.AUDIO_PREFETCH_WORKERS,
+            thread_name_prefix='pcm-prefetch'
+        )
+        _executor_pid = os.getpid()
+        _pending.clear()
+    return _executor
+
+
+def prefetch_upcoming(current_call_id=None):
+    """
+    Ставит в пул декодирование AUDIO_PREFETCH_DEPTH следующих звонков
+    из очереди, у которых еще нет кеша PCM.
+    """
+    from .models import Call
+    
+    depth = settings.AUDIO_PREFETCH_DEPTH
+    if depth <= 0 or not settings.AUDIO_CACHE_ENABLED:
+        return
+    
+    upcoming = Call.objects.filter(status='pending').exclude(
+        id=current_call_id
+    ).order_by('created_at').values_list('audio_file', flat=True)[:depth]
+    
+    executor = _get_executor()
+    for name in upcoming:
+        if not name:
+            continue
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        with _pending_lock:
+            if path in _pending or audio_cache.is_cached(path):
+                continue
+            _pending.add(path)
+        executor.submit(_warm_cache, path)
+
+
+def _warm_cache(path):
+    """Декодирует файл в кеш PCM; другие воркеры пропускают файл по lock файлу."""
+    lock = audio_cache.lock_path(path)
+    try:
+        try:
+            if time.time() - os.path.getmtime(lock) > audio_cache.LOCK_TIMEOUT:
+                os.remove(lock)
+        except FileNotFoundError:
+            pass
+        
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return
+        os.close(fd)
+        
+        try:
+            started = time.perf_counter()
+            audio_cache.load_pcm(path, wait=False)
+            metrics.observe('audio_prefetch_decode_ms', (time.perf_counter() - started) * 1000)
+        finally:
+            os.remove(lock)
+    except Exception as e:
+        logger.warning("Ошибка предзагрузки аудио %s: %s", path, e)
+    finally:
+        with _pending_lock:
+            _pending.discard(path)
@@ -0,0 +1,24 @@
+"""
+Отправка real-time сообщений в группы channel layer.
+"""
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+
+from call_system.tracing import current_trace_id, span
+
+
+def send_to_group(group, message):
+    """
+    Отправляет сообщение в группу channel layer.
+    Добавляет trace id текущего контекста и записывает спан публикации.
+    
+    Args:
+        group: Имя группы (transcription_<id>, user_calls_<id>)
+        message: Словарь сообщения с ключом 'type'
+    """
+    trace_id = current_trace_id()
+    if trace_id:
+        message = dict(message, trace_id=trace_id)
+    
+    with span('publish', group=group, type=message.get('type')):
+        async_to_sync(get_channel_layer().group_send)(group, message)
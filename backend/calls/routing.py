@@ -6,5 +6,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/transcription/(?P<call_id>[0-9a-f-]+)/$', consumers.TranscriptionConsumer.as_asgi()),
+    re_path(r'ws/live/$', consumers.LiveTranscriptionConsumer.as_asgi()),
     re_path(r'ws/calls/$', consumers.CallsConsumer.as_asgi()),
 ]
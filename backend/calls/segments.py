@@ -0,0 +1,270 @@
+"""
+Компактное колоночное хранение сегментов транскрипции.
+
+Вместо JSON списка словарей сегменты хранятся одним бинарным блоком:
+числовые колонки (время начала и конца, уверенность, показатели качества
+Whisper) - массивы float32, тексты сегментов и слов - один сжатый zlib блок.
+Разбор ленивый: массивы времени читаются через np.frombuffer без копирования,
+тексты распаковываются при первом обращении.
+
+Формат блока:
+    MAGIC | uint32 длина заголовка | заголовок JSON | колонки | zlib(тексты)
+"""
+import json
+import math
+import struct
+import zlib
+from collections.abc import Sequence
+
+import numpy as np
+
+MAGIC = b'SEG1'
+
+# Числовые ключи сегмента и точность, с которой они возвращаются
+SEGMENT_COLUMNS = {
+    'start': 3,
+    'end': 3,
+    'confidence': 4,
+    'avg_logprob': 4,
+    'no_speech_prob': 4,
+    'compression_ratio': 4,
+}
+WORD_COLUMNS = {
+    'start': 3,
+    'end': 3,
+    'probability': 4,
+}
+
+_F4 = np.dtype('<f4')
+_U4 = np.dtype('<u4')
+_I4 = np.dtype('<i4')
+
+
+def pack(segments):
+    """
+    Упаковывает сегменты в бинарный блок.
+    
+    Args:
+        segments: Список словарей сегментов (ключи SEGMENT_COLUMNS, text,
+            model и необязательный words - список слов Whisper)
+    
+    Returns:
+        bytes: Упакованный блок
+    """
+    segments = list(segments)
+    words = [(i, w) for i, s in enumerate(segments) for w in s.get('words') or ()]
+    
+    columns = [key for key in SEGMENT_COLUMNS if any(key in s for s in segments)]
+    models = sorted({s['model'] for s in segments if s.get('model')})
+    header = {
+        'count': len(segments),
+        'columns': columns,
+        'models': models,
+        'words': len(words),
+    }
+    
+    parts = []
+    for key in columns:
+        parts.append(np.array([s.get(key, math.nan) for s in segments], dtype=_F4))
+    if models:
+        index = {name: i for i, name in enumerate(models)}
+        parts.append(np.array([index.get(s.get('model'), -1) for s in segments], dtype=_I4))
+    
+    texts = [s.get('text', '').encode('utf-8') for s in segments]
+    word_texts = [w.get('word', '').encode('utf-8') for _, w in words]
+    if words:
+        for key in WORD_COLUMNS:
+            parts.append(np.array([w.get(key, math.nan) for _, w in words], dtype=_F4))
+        parts.append(np.array([i for i, _ in words], dtype=_U4))
+    parts.append(np.array([len(t) for t in texts + word_texts], dtype=_U4))
+    
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    # Колонки выравниваются по 4 байта
+    header_bytes += b' ' * (-len(header_bytes) % 4)
+    
+    return b''.join([
+        MAGIC,
+        struct.pack('<I', len(header_bytes)),
+        header_bytes,
+        *(part.tobytes() for part in parts),
+        zlib.compress(b''.join(texts + word_texts)),
+    ])
+
+
+def is_packed(value):
+    """Является ли значение упакованным блоком сегментов."""
+    return value is not None and bytes(value[:len(MAGIC)]) == MAGIC
+
+
+class SegmentList(Sequence):
+    """
+    Ленивое представление сегментов: последовательность словарей,
+    как в прежнем JSON формате, плюс доступ к колонкам массивами.
+    """
+    
+    def __init__(self, blob=None, items=None):
+        self._blob = memoryview(blob) if blob is not None else None
+        self._items = items
+        self._header = None
+        self._columns = None
+        self._texts = None
+        self._word_texts = None
+        self._body = 0
+        self._text_offset = 0
+    
+    @classmethod
+    def from_list(cls, segments):
+        """Сегменты в старом формате (список словарей)."""
+        return cls(items=list(segments or ()))
+    
+    def __len__(self):
+        if self._items is not None:
+            return len(self._items)
+        return self._parse()['count']
+    
+    def __getitem__(self, index):
+        if self._items is not None:
+            return self._items[index]
+        if isinstance(index, slice):
+            return [self._segment(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._segment(index)
+    
+    def __iter__(self):
+        if self._items is not None:
+            return iter(self._items)
+        return (self._segment(i) for i in range(len(self)))
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    @property
+    def starts(self):
+        """Время начала сегментов, float32."""
+        return self.column('start')
+    
+    @property
+    def ends(self):
+        """Время конца сегментов, float32."""
+        return self.column('end')
+    
+    @property
+    def texts(self):
+        """Тексты сегментов."""
+        if self._items is not None:
+            return [s.get('text', '') for s in self._items]
+        self._load_texts()
+        return self._texts
+    
+    def column(self, key):
+        """
+        Числовая колонка сегментов (NaN, если значение отсутствует).
+        
+        Returns:
+            np.ndarray: float32 длиной len(self)
+        """
+        if self._items is not None:
+            return np.array([s.get(key, math.nan) for s in self._items], dtype=_F4)
+        columns = self._parse_columns()
+        if key in columns:
+            return columns[key]
+        return np.full(len(self), math.nan, dtype=_F4)
+    
+    def words(self, index):
+        """Слова сегмента с временем (пустой список, если их нет)."""
+        if self._items is not None:
+            return list(self._items[index].get('words') or ())
+        
+        columns = self._parse_columns()
+        owner = columns.get('word_segment')
+        if owner is None:
+            return []
+        self._load_texts()
+        result = []
+        # Слова упакованы по порядку сегментов
+        first, last = np.searchsorted(owner, [index, index + 1])
+        for j in range(first, last):
+            word = {'word': self._word_texts[j]}
+            for key, digits in WORD_COLUMNS.items():
+                value = columns['word_' + key][j]
+                if not math.isnan(value):
+                    word[key] = round(float(value), digits)
+            result.append(word)
+        return result
+    
+    def to_list(self):
+        """Сегменты списком словарей (формат JSON API)."""
+        if self._items is not None:
+            return list(self._items)
+        return list(self)
+    
+    def _segment(self, index):
+        columns = self._parse_columns()
+        segment = {}
+        for key in self._header['columns']:
+            value = columns[key][index]
+            if not math.isnan(value):
+                segment[key] = round(float(value), SEGMENT_COLUMNS[key])
+        segment['text'] = self.texts[index]
+        if 'model' in columns and columns['model'][index] >= 0:
+            segment['model'] = self._header['models'][columns['model'][index]]
+        words = self.words(index) if self._header['words'] else None
+        if words:
+            segment['words'] = words
+        return segment
+    
+    def _parse(self):
+        if self._header is None:
+            if not is_packed(self._blob):
+                raise ValueError('Неизвестный формат сегментов')
+            size = struct.unpack_from('<I', self._blob, len(MAGIC))[0]
+            start = len(MAGIC) + 4
+            self._header = json.loads(bytes(self._blob[start:start + size]))
+            self._body = start + size
+        return self._header
+    
+    def _parse_columns(self):
+        if self._columns is not None:
+            return self._columns
+        
+        header = self._parse()
+        count, word_count = header['count'], header['words']
+        offset = self._body
+        columns = {}
+        
+        def take(dtype, n):
+            nonlocal offset
+            array = np.frombuffer(self._blob, dtype=dtype, count=n, offset=offset)
+            offset += n * dtype.itemsize
+            return array
+        
+        for key in header['columns']:
+            columns[key] = take(_F4, count)
+        if header['models']:
+            columns['model'] = take(_I4, count)
+        if word_count:
+            for key in WORD_COLUMNS:
+                columns['word_' + key] = take(_F4, word_count)
+            columns['word_segment'] = take(_U4, word_count)
+        columns['lengths'] = take(_U4, count + word_count)
+        
+        self._text_offset = offset
+        self._columns = columns
+        return columns
+    
+    def _load_texts(self):
+        if self._texts is not None:
+            return
+        
+        columns = self._parse_columns()
+        data = zlib.decompress(self._blob[self._text_offset:])
+        bounds = np.concatenate(([0], np.cumsum(columns['lengths'], dtype=np.int64)))
+        texts = [
+            data[bounds[i]:bounds[i + 1]].decode('utf-8')
+            for i in range(len(bounds) - 1)
+        ]
+        count = self._header['count']
+        self._texts, self._word_texts = texts[:count], texts[count:]
@@ -0,0 +1,156 @@
+"""
+Тональность разговора по сегментам транскрипции (временная шкала).
+
+Тексты всех сегментов склеиваются и проходят через автомат словарей языка
+(calls/lexicon.py) один раз. Дальше вхождения раскладываются по сегментам
+и словам массивами NumPy. Термин тональности меняет знак, если не дальше
+NEGATION_WINDOW слов перед ним в том же сегменте и предложении стоит
+отрицание (термин словаря вида negation, совпадающий со словом целиком). Балл сегмента равен
+tanh суммы весов, то есть лежит в диапазоне [-1, 1].
+
+Шкала хранится в CallAnalysis.sentiment_timeline компактно: на сегмент
+приходятся начало и конец в миллисекундах (uint32) и балл (int8, шаг 1/127).
+Сводные показатели для фильтров хранятся в отдельных полях.
+"""
+import re
+
+import numpy as np
+
+from . import lexicon
+from .tokens import lowercase
+
+TIMELINE_DTYPE = np.dtype([('start', '<u4'), ('end', '<u4'), ('score', 'i1')])
+SCORE_SCALE = 127
+
+# Отрицание действует на столько следующих слов
+NEGATION_WINDOW = 3
+
+# Окно скользящего среднего (в сегментах) для минимума тональности
+SMOOTHING_SEGMENTS = 5
+
+# Итоговая тональность - по последним секундам разговора
+FINAL_SECONDS = 60.0
+
+WORD_RE = re.compile(r'\w+')
+SENTENCE_END_RE = re.compile(r'[.!?…]')
+
+EMPTY_FIELDS = {
+    'sentiment_timeline': None,
+    'sentiment_min': None,
+    'sentiment_trend': None,
+    'sentiment_final': None,
+}
+
+
+def score_segments(segments, language):
+    """
+    Баллы тональности сегментов.
+    
+    Args:
+        segments: SegmentList транскрипции
+        language: Язык словарей
+    
+    Returns:
+        np.ndarray: Балл каждого сегмента в диапазоне [-1, 1]
+    """
+    texts = segments.texts
+    scores = np.zeros(len(texts))
+    if not texts:
+        return scores
+    
+    joined = lowercase('\n'.join(texts))
+    offsets = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+    
+    compiled = lexicon.get_lexicon(language)
+    starts, weights, negations = [], [], []
+    for index, start, end in compiled.automaton.search(joined):
+        for kind, label, weight in compiled.payloads[index]:
+            if kind == 'sentiment':
+                starts.append(start)
+                weights.append(weight if label == 'positive' else -weight)
+            elif kind == 'negation' and (end == len(joined) or not joined[end].isalnum()):
+                negations.append(start)
+    
+    if not starts:
+        return scores
+    
+    starts = np.asarray(starts)
+    weights = np.asarray(weights, dtype=np.float64)
+    segment_of = np.searchsorted(offsets, starts, side='right') - 1
+    
+    if negations:
+        word_starts = np.fromiter((m.start() for m in WORD_RE.finditer(joined)), dtype=np.int64)
+        word_of = np.searchsorted(word_starts, starts, side='right') - 1
+        negation_words = np.searchsorted(word_starts, negations, side='right') - 1
+        negation_segments = np.searchsorted(offsets, negations, side='right') - 1
+        sentence_ends = np.fromiter((m.start() for m in SENTENCE_END_RE.finditer(joined)), dtype=np.int64)
+        negation_sentences = np.searchsorted(sentence_ends, negations)
+        
+        # Ближайшее отрицание перед каждым вхождением
+        previous = np.searchsorted(negation_words, word_of, side='left') - 1
+        has_previous = previous >= 0
+        previous = np.maximum(previous, 0)
+        distance = word_of - negation_words[previous]
+        negated = (
+            has_previous
+            & (distance <= NEGATION_WINDOW)
+            & (negation_segments[previous] == segment_of)
+            & (negation_sentences[previous] == np.searchsorted(sentence_ends, starts))
+        )
+        weights[negated] *= -1
+    
+    return np.tanh(np.bincount(segment_of, weights=weights, minlength=len(texts)))
+
+
+def timeline_fields(segments, language):
+    """
+    Поля CallAnalysis с тональностью по сегментам: упакованная шкала,
+    минимум (по скользящему среднему), тренд (изменение балла в минуту)
+    и тональность последней минуты.
+    """
+    if not segments:
+        return dict(EMPTY_FIELDS)
+    
+    scores = score_segments(segments, language)
+    starts = np.asarray(segments.starts, dtype=np.float64)
+    ends = np.asarray(segments.ends, dtype=np.float64)
+    durations = np.maximum(ends - starts, 0.1)
+    
+    window = min(SMOOTHING_SEGMENTS, scores.size)
+    smoothed = np.convolve(scores, np.ones(window) / window, mode='valid')
+    
+    trend = 0.0
+    if scores.size > 1 and np.ptp(starts) > 0:
+        trend = np.polyfit(starts / 60.0, scores, 1, w=np.sqrt(durations))[0]
+    
+    final = ends > ends.max() - FINAL_SECONDS
+    
+    timeline = np.empty(scores.size, dtype=TIMELINE_DTYPE)
+    timeline['start'] = np.round(np.maximum(starts, 0) * 1000)
+    timeline['end'] = np.round(np.maximum(ends, 0) * 1000)
+    timeline['score'] = np.round(scores * SCORE_SCALE)
+    
+    return {
+        'sentiment_timeline': timeline.tobytes(),
+        'sentiment_min': round(float(smoothed.min()), 4),
+        'sentiment_trend': round(float(trend), 4),
+        'sentiment_final': round(float(np.average(scores[final], weights=durations[final])), 4),
+    }
+
+
+def unpack_timeline(blob):
+    """
+    Шкала тональности списком словарей.
+    
+    Returns:
+        list: [{'start': сек, 'end': сек, 'score': балл}, ...]
+    """
+    if not blob:
+        return []
+    timeline = np.frombuffer(bytes(blob), dtype=TIMELINE_DTYPE)
+    return [
+        {'start': start / 1000, 'end': end / 1000, 'score': round(score / SCORE_SCALE, 3)}
+        for start, end, score in zip(
+            timeline['start'].tolist(), timeline['end'].tolist(), timeline['score'].tolist()
+        )
+    ]
@@ -1,8 +1,47 @@
 """
 Сериализаторы для работы со звонками.
 """
+from django.conf import settings
 from rest_framework import serializers
 from .models import Call, Transcription, CallAnalysis, CallNote
+from .sentiment import unpack_timeline
+
+
+def _validate_language(value):
+    if value not in settings.SUPPORTED_LANGUAGES:
+        raise serializers.ValidationError(
+            f"Поддерживаемые языки: {', '.join(settings.SUPPORTED_LANGUAGES)}"
+        )
+    return value
+
+
+class SegmentsField(serializers.Field):
+    """
+    Сегменты транскрипции в прежнем JSON формате (список словарей),
+    независимо от формата хранения.
+    """
+    
+    def to_representation(self, value):
+        return value.to_list()
+    
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError("Ожидается список сегментов")
+        return data
+
+
+class SentimentTimelineField(serializers.Field):
+    """
+    Шкала тональности списком словарей {'start', 'end', 'score'}
+    (в БД хранится упакованной).
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return unpack_timeline(value)
 
 
 class TranscriptionSerializer(serializers.ModelSerializer):
@@ -10,6 +49,8 @@ class TranscriptionSerializer(serializers.ModelSerializer):
     Сериализатор для транскрипции звонка.
     """
     
+    segments = SegmentsField()
+    
     class Meta:
         model = Transcription
         fields = (
@@ -29,14 +70,49 @@ class CallAnalysisSerializer(serializers.ModelSerializer):
         read_only=True
     )
     
+    sentiment_timeline = SentimentTimelineField()
+    
     class Meta:
         model = CallAnalysis
         fields = (
             'id', 'call', 'category', 'category_display',
-            'keywords', 'sentiment', 'word_frequency',
-            'speaker_stats', 'summary', 'created_at'
+            'keywords', 'sentiment', 'sentiment_timeline',
+            'sentiment_min', 'sentiment_trend', 'sentiment_final',
+            'word_frequency', 'speaker_stats', 'summary',
+            'loudness_dbfs', 'silence_ratio', 'hold_time', 'speaking_rate',
+            'lexicon_scores', 'created_at'
+        )
+        read_only_fields = (
+            'id', 'sentiment_min', 'sentiment_trend', 'sentiment_final',
+            'loudness_dbfs', 'silence_ratio', 'hold_time', 'speaking_rate',
+            'created_at'
+        )
+
+
+class TextAnalysisSerializer(serializers.Serializer):
+    """
+    Текст для анализа без аудио.
+    """
+    
+    text = serializers.CharField(max_length=settings.TEXT_ANALYSIS_MAX_CHARS)
+    language = serializers.CharField(default='ru')
+    
+    def validate_language(self, value):
+        """Проверяет, что язык поддерживается."""
+        return _validate_language(value)
+
+
+class TextAnalysisResultSerializer(CallAnalysisSerializer):
+    """
+    Результат анализа текста без аудио: показатели, которые
+    не требуют сегментов и записи.
+    """
+    
+    class Meta(CallAnalysisSerializer.Meta):
+        fields = (
+            'category', 'category_display', 'keywords', 'sentiment',
+            'word_frequency', 'summary', 'lexicon_scores'
         )
-        read_only_fields = ('id', 'created_at')
 
 
 class CallNoteSerializer(serializers.ModelSerializer):
@@ -75,10 +151,25 @@ class CallSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'user', 'user_name', 'audio_file', 'duration',
             'status', 'status_display', 'source', 'source_display',
-            'language', 'transcription', 'analysis', 'notes',
+            'language', 'language_source', 'language_confidence',
+            'transcription', 'analysis', 'notes',
             'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'user', 'duration', 'status', 'created_at', 'updated_at')
+        read_only_fields = (
+            'id', 'user', 'duration', 'status', 'language_source',
+            'language_confidence', 'created_at', 'updated_at'
+        )
+    
+    def validate_language(self, value):
+        """Проверяет, что язык поддерживается."""
+        return _validate_language(value)
+    
+    def update(self, instance, validated_data):
+        """Язык, измененный пользователем, больше не определяется по аудио."""
+        if validated_data.get('language', instance.language) != instance.language:
+            validated_data['language_source'] = 'user'
+            validated_data['language_confidence'] = None
+        return super().update(instance, validated_data)
 
 
 class CallUploadSerializer(serializers.ModelSerializer):
@@ -86,9 +177,37 @@ class CallUploadSerializer(serializers.ModelSerializer):
     Сериализатор для загрузки звонка.
     """
     
+    stages = serializers.MultipleChoiceField(
+        choices=Call.STAGE_CHOICES,
+        required=False,
+        write_only=True,
+        help_text='Этапы обработки (по умолчанию все)'
+    )
+    
     class Meta:
         model = Call
-        fields = ('audio_file', 'language', 'source')
+        fields = ('audio_file', 'language', 'source', 'stages')
+    
+    def validate_language(self, value):
+        """Проверяет, что язык поддерживается."""
+        return _validate_language(value)
+    
+    def validate_stages(self, value):
+        """Этапы в порядке выполнения; без транскрипции остальным нечего обрабатывать."""
+        # В multipart отсутствующее поле приходит пустым списком: все этапы
+        if not value:
+            return None
+        if 'transcribe' not in value:
+            raise serializers.ValidationError(
+                "Загруженное аудио нужно транскрибировать: этап transcribe обязателен"
+            )
+        return [name for name, _ in Call.STAGE_CHOICES if name in value]
+    
+    def create(self, validated_data):
+        """Без явно указанного языка он определяется по аудио."""
+        validated_data.pop('stages', None)
+        validated_data['language_source'] = 'user' if 'language' in validated_data else 'auto'
+        return super().create(validated_data)
     
     def validate_audio_file(self, value):
         """Проверяет размер и формат аудио файла."""
@@ -126,7 +245,7 @@ class CallListSerializer(serializers.ModelSerializer):
         model = Call
         fields = (
             'id', 'user_name', 'duration', 'status', 'status_display',
-            'language', 'source', 'has_transcription', 'has_analysis',
+            'language', 'language_source', 'source', 'has_transcription', 'has_analysis',
             'created_at'
         )
     
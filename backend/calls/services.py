@@ -3,17 +3,104 @@
 """
 import whisper
 import torch
-from pydub import AudioSegment
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-import tempfile
+import numpy as np
 import os
 import logging
-from collections import Counter
-import re
+import math
+import threading
+import time
+
+from call_system import metrics
+from call_system.task_profiler import stage
+from . import acoustics, audio_cache, corpus, diarization, lexicon, prefetch
+from .audio import SAMPLE_RATE, open_pcm, probe_duration
+from .fingerprint import analyzer_fingerprint, text_hash
+from .realtime import send_to_group
+from .sentiment import timeline_fields
+from .summary import summarize
+from .tokens import TokenStream
 
 logger = logging.getLogger(__name__)
 
+# Показатели качества сегмента, которые возвращает Whisper
+QUALITY_KEYS = ('avg_logprob', 'no_speech_prob', 'compression_ratio')
+
+_models = {}
+_models_lock = threading.Lock()
+_analysis_service = None
+
+
+def get_whisper_model(name):
+    """
+    Возвращает модель Whisper из кеша процесса.
+    Модель загружается один раз на воркер, а не в каждой задаче.
+    """
+    with _models_lock:
+        model = _models.get(name)
+        if model is None:
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            logger.info("Загрузка модели Whisper: %s на %s", name, device)
+            with stage('model_load', model=name):
+                model = whisper.load_model(name, device=device)
+            _models[name] = model
+    return model
+
+
+def get_analysis_service():
+    """
+    Возвращает AnalysisService из кеша процесса: модели spaCy
+    загружаются один раз на воркер или веб-процесс, а не в каждой
+    задаче и каждом запросе.
+    """
+    global _analysis_service
+    with _models_lock:
+        if _analysis_service is None:
+            _analysis_service = AnalysisService()
+    return _analysis_service
+
+
+def detect_language(model, audio):
+    """
+    Определяет язык по началу записи (до 30 с, окно энкодера Whisper).
+    Выбор ограничен SUPPORTED_LANGUAGES.
+    
+    Args:
+        model: Модель Whisper
+        audio: PCM float32 16 кГц
+    
+    Returns:
+        tuple: (код языка, вероятность) или (None, None) для пустого аудио
+    """
+    from django.conf import settings
+    
+    if not audio.size:
+        return None, None
+    
+    n_mels = getattr(model.dims, 'n_mels', 80)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), n_mels=n_mels).to(model.device)
+    with stage('language_detection'):
+        _, probs = model.detect_language(mel)
+    
+    language = max(settings.SUPPORTED_LANGUAGES, key=lambda code: probs.get(code, 0))
+    return language, float(probs.get(language, 0))
+
+
+def needs_refinement(segment):
+    """
+    Нужно ли повторно распознать сегмент более крупной моделью.
+    Пороги совпадают по смыслу с порогами fallback в whisper.transcribe.
+    """
+    from django.conf import settings
+    
+    avg_logprob = segment.get('avg_logprob')
+    if avg_logprob is None:
+        return False
+    return (
+        avg_logprob < settings.TRANSCRIPTION_CASCADE_LOGPROB_THRESHOLD or
+        segment.get('compression_ratio', 0) > settings.TRANSCRIPTION_CASCADE_COMPRESSION_THRESHOLD or
+        segment.get('no_speech_prob', 0) > settings.TRANSCRIPTION_CASCADE_NO_SPEECH_THRESHOLD
+    )
+
 
 class TranscriptionService:
     """
@@ -21,16 +108,17 @@ class TranscriptionService:
     Поддерживает отправку промежуточных результатов через WebSocket.
     """
     
-    def __init__(self):
-        """Инициализирует модель Whisper."""
-        from django.conf import settings
+    def __init__(self, model_name=None):
+        """
+        Инициализирует модель Whisper.
         
-        model_name = settings.WHISPER_MODEL
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+        Args:
+            model_name: Имя модели, по умолчанию WHISPER_MODEL (первый проход)
+        """
+        from django.conf import settings
         
-        logger.info(f"Загрузка модели Whisper: {model_name} на {device}")
-        self.model = whisper.load_model(model_name, device=device)
-        self.channel_layer = get_channel_layer()
+        self.model_name = model_name or settings.WHISPER_MODEL
+        self.model = get_whisper_model(self.model_name)
     
     def transcribe(self, call):
         """
@@ -38,109 +126,321 @@ class TranscriptionService:
         
         Args:
             call: Объект Call для транскрипции
-            
+        
         Returns:
             dict: Данные транскрипции
         """
+        from django.conf import settings
         from .models import Transcription
         
-        logger.info(f"Начало транскрипции звонка {call.id}")
+        logger.info("Начало транскрипции звонка %s", call.id)
         
         try:
             # Получаем путь к аудио файлу
             audio_path = call.audio_file.path
             
-            # Конвертируем аудио в WAV если нужно
-            audio_path = self._prepare_audio(audio_path)
-            
-            # Получаем длительность аудио
-            audio = AudioSegment.from_file(audio_path)
-            duration = len(audio) / 1000.0  # в секундах
-            call.duration = duration
-            call.save()
+            # Длительность известна без ffprobe, если PCM уже в кеше (retry)
+            cached = audio_cache.load(audio_path)
+            metrics.incr('audio_cache', result='hit' if cached is not None else 'miss')
+            duration = cached.size / SAMPLE_RATE if cached is not None else probe_duration(audio_path)
+            if duration is not None:
+                call.duration = duration
+                call.save(update_fields=['duration', 'updated_at'])
             
             # Отправляем начальное уведомление
             self._send_progress(call.id, 0, "Начало транскрипции...")
             
-            # Транскрибируем с промежуточными результатами
-            result = self.model.transcribe(
-                audio_path,
-                language=call.language,
-                verbose=True,
-                task='transcribe'
-            )
-            
-            # Обрабатываем сегменты
             segments = []
             full_text = []
             
-            for i, segment in enumerate(result['segments']):
-                segment_data = {
-                    'start': segment['start'],
-                    'end': segment['end'],
-                    'text': segment['text'].strip(),
-                    'confidence': segment.get('confidence', 0)
-                }
-                segments.append(segment_data)
-                full_text.append(segment['text'].strip())
+            # Транскрибируем окнами: в памяти только текущее окно PCM.
+            # PCM кешируется при первом декодировании, повторы читают memmap
+            with audio_cache.open_stream(audio_path) as source, prefetch.decode_ahead(source) as stream:
+                # Начало записи нужно и для определения языка, и как первое окно
+                head = stream.read(int(settings.TRANSCRIPTION_WINDOW_SECONDS * SAMPLE_RATE))
+                if call.needs_language_detection:
+                    self._detect_call_language(call, head[:int(settings.LANGUAGE_DETECTION_SECONDS * SAMPLE_RATE)])
                 
-                # Отправляем прогресс по сегментам
-                progress = int((i + 1) / len(result['segments']) * 100)
-                self._send_progress(
-                    call.id,
-                    progress,
-                    segment['text'].strip(),
-                    segment_data
-                )
+                for segment in self._transcribe_windows(stream, call.language, head):
+                    segment_data = self._segment_data(segment)
+                    segments.append(segment_data)
+                    full_text.append(segment_data['text'])
+                    
+                    # Отправляем прогресс по сегментам
+                    progress = min(99, int(segment['end'] / duration * 100)) if duration else 0
+                    logger.info(
+                        "Сегмент %d звонка %s (%.1f с)",
+                        len(segments), call.id, segment['end'],
+                        extra={'sample': 'segment_progress'}
+                    )
+                    self._send_progress(
+                        call.id,
+                        progress,
+                        segment_data['text'],
+                        segment_data
+                    )
+                
+                if duration is None:
+                    call.duration = stream.seconds_read
+                    call.save(update_fields=['duration', 'updated_at'])
             
             # Создаем транскрипцию
             transcription_text = ' '.join(full_text)
             avg_confidence = sum(s.get('confidence', 0) for s in segments) / len(segments) if segments else 0
             
-            transcription = Transcription.objects.create(
+            # update_or_create: при повторе задачи транскрипция уже может существовать
+            transcription, _ = Transcription.objects.update_or_create(
                 call=call,
-                text=transcription_text,
-                confidence=avg_confidence * 100,
-                segments=segments
+                defaults={
+                    'text': transcription_text,
+                    'confidence': avg_confidence * 100,
+                    'segments': segments,
+                }
             )
             
-            logger.info(f"Транскрипция звонка {call.id} завершена")
+            refine_count = sum(1 for s in segments if needs_refinement(s))
+            logger.info(
+                "Транскрипция звонка %s завершена, сегментов для уточнения: %d",
+                call.id, refine_count
+            )
             
             return {
                 'text': transcription_text,
                 'segments': segments,
-                'confidence': avg_confidence
+                'confidence': avg_confidence,
+                'refine_count': refine_count
             }
-            
+        
         except Exception as e:
-            logger.error(f"Ошибка транскрипции звонка {call.id}: {str(e)}")
+            logger.error("Ошибка транскрипции звонка %s: %s", call.id, e)
             self._send_error(call.id, str(e))
             raise
     
-    def _prepare_audio(self, audio_path):
+    def transcribe_draft(self, call, seconds):
+        """
+        Быстрый черновик: распознает только первые seconds секунд записи.
+        Ничего не сохраняет, результат публикуется вызывающей задачей.
+        
+        Returns:
+            str: Текст черновика
+        """
+        samples = int(seconds * SAMPLE_RATE)
+        
+        cached = audio_cache.load(call.audio_file.path)
+        with stage('decode'):
+            if cached is not None:
+                audio = np.asarray(cached[:samples])
+            else:
+                with open_pcm(call.audio_file.path, max_seconds=seconds) as stream:
+                    audio = stream.read(samples)
+        
+        if not audio.size:
+            return ''
+        
+        # Язык еще не определен основной задачей: Whisper определит его сам
+        language = None if call.needs_language_detection else call.language
+        with stage('inference', model=self.model_name, duration=audio.size / SAMPLE_RATE):
+            result = self.model.transcribe(audio, language=language, task='transcribe')
+        
+        return ' '.join(s['text'].strip() for s in result['segments']).strip()
+    
+    def refine(self, call):
+        """
+        Второй проход каскада: повторно распознает сегменты с низким
+        качеством этой (более крупной) моделью по PCM из кеша.
+        
+        Args:
+            call: Объект Call с транскрипцией
+        
+        Returns:
+            int: Количество уточненных сегментов
+        """
+        from django.conf import settings
+        
+        transcription = call.transcription
+        segments = list(transcription.segments)
+        flagged = [
+            i for i, s in enumerate(segments)
+            if s.get('model') != self.model_name and needs_refinement(s)
+        ]
+        if not flagged:
+            return 0
+        
+        logger.info(
+            "Уточнение %d сегментов звонка %s моделью %s",
+            len(flagged), call.id, self.model_name
+        )
+        
+        pcm = audio_cache.load_pcm(call.audio_file.path)
+        pad = int(settings.TRANSCRIPTION_CASCADE_PAD_SECONDS * SAMPLE_RATE)
+        
+        for i in flagged:
+            segment = segments[i]
+            start = max(0, int(segment['start'] * SAMPLE_RATE) - pad)
+            end = min(pcm.size, int(segment['end'] * SAMPLE_RATE) + pad)
+            
+            with stage('inference.refine', model=self.model_name):
+                result = self.model.transcribe(
+                    np.asarray(pcm[start:end]),
+                    language=call.language,
+                    initial_prompt=segments[i - 1]['text'] if i else None,
+                    task='transcribe',
+                    word_timestamps=settings.TRANSCRIPTION_WORD_TIMESTAMPS
+                )
+            
+            parts = result['segments']
+            if not parts:
+                continue
+            
+            refined = {
+                'start': segment['start'],
+                'end': segment['end'],
+                'text': ' '.join(p['text'].strip() for p in parts).strip(),
+                'avg_logprob': sum(p['avg_logprob'] for p in parts) / len(parts),
+                'no_speech_prob': max(p['no_speech_prob'] for p in parts),
+                'compression_ratio': max(p['compression_ratio'] for p in parts),
+                'words': [
+                    dict(w, start=w['start'] + start / SAMPLE_RATE, end=w['end'] + start / SAMPLE_RATE)
+                    for p in parts for w in p.get('words') or ()
+                ],
+            }
+            segments[i] = self._segment_data(refined)
+        
+        transcription.segments = segments
+        transcription.text = ' '.join(s['text'] for s in segments)
+        transcription.confidence = sum(s['confidence'] for s in segments) / len(segments) * 100
+        transcription.save(update_fields=['segments_packed', 'segments_json', 'text', 'confidence'])
+        
+        metrics.incr('transcription_refined_segments', len(flagged), model=self.model_name)
+        return len(flagged)
+    
+    def _detect_call_language(self, call, audio):
+        """
+        Определяет язык звонка по началу записи и сохраняет его с уверенностью.
+        """
+        language, confidence = detect_language(self.model, audio)
+        if language is None:
+            return
+        
+        call.language = language
+        call.language_confidence = round(confidence, 4)
+        call.save(update_fields=['language', 'language_confidence', 'updated_at'])
+        
+        metrics.incr('language_detected', language=language)
+        logger.info(
+            "Язык звонка %s: %s (уверенность %.2f)",
+            call.id, language, confidence
+        )
+    
+    def _segment_data(self, segment):
         """
-        Подготавливает аудио файл для транскрипции.
-        Конвертирует в WAV если необходимо.
+        Сегмент для сохранения: время, текст, уверенность,
+        модель, которая его распознала, и показатели качества Whisper.
         """
-        # Если файл уже WAV, возвращаем как есть
-        if audio_path.lower().endswith('.wav'):
-            return audio_path
+        data = {
+            'start': segment['start'],
+            'end': segment['end'],
+            'text': segment['text'].strip(),
+            'model': self.model_name,
+        }
+        for key in QUALITY_KEYS:
+            if key in segment:
+                data[key] = round(float(segment[key]), 4)
         
-        # Конвертируем в WAV
-        audio = AudioSegment.from_file(audio_path)
+        # Слова с временем (TRANSCRIPTION_WORD_TIMESTAMPS)
+        if segment.get('words'):
+            data['words'] = [
+                {
+                    'word': w['word'],
+                    'start': round(float(w['start']), 3),
+                    'end': round(float(w['end']), 3),
+                    'probability': round(float(w.get('probability', 0)), 4),
+                }
+                for w in segment['words']
+            ]
         
-        # Создаем временный файл
-        temp_path = tempfile.mktemp(suffix='.wav')
-        audio.export(temp_path, format='wav')
+        # Уверенность: средняя вероятность токена сегмента
+        if 'avg_logprob' in data:
+            data['confidence'] = round(math.exp(data['avg_logprob']), 4)
+        else:
+            data['confidence'] = segment.get('confidence', 0)
+        return data
+    
+    def _transcribe_windows(self, stream, language, head=None):
+        """
+        Транскрибирует поток PCM окнами по TRANSCRIPTION_WINDOW_SECONDS.
+        
+        Текст предыдущих окон передается модели как initial_prompt, чтобы
+        сохранить контекст между окнами. Последний сегмент окна, скорее
+        всего, обрезан границей окна, поэтому его аудио переносится
+        в начало следующего окна и распознается повторно.
+        
+        Args:
+            stream: Поток PCM
+            language: Код языка
+            head: Уже прочитанное начало потока (первое окно)
         
-        return temp_path
+        Yields:
+            dict: Сегменты Whisper с временем от начала записи
+        """
+        from django.conf import settings
+        
+        window_samples = int(settings.TRANSCRIPTION_WINDOW_SECONDS * SAMPLE_RATE)
+        carry = head if head is not None else np.zeros(0, dtype=np.float32)
+        offset = 0.0  # время начала carry от начала записи
+        prompt = ''
+        
+        while True:
+            needed = window_samples - carry.size
+            with stage('decode'):
+                chunk = stream.read(needed)
+            is_last = chunk.size < needed
+            
+            audio = np.concatenate((carry, chunk)) if carry.size else chunk
+            if not audio.size:
+                break
+            
+            with stage('inference', offset=offset, language=language):
+                result = self.model.transcribe(
+                    audio,
+                    language=language,
+                    initial_prompt=prompt or None,
+                    task='transcribe',
+                    word_timestamps=settings.TRANSCRIPTION_WORD_TIMESTAMPS
+                )
+            
+            window_segments = result['segments']
+            cut = audio.size / SAMPLE_RATE
+            if (not is_last and len(window_segments) > 1 and
+                    window_segments[-1]['start'] >= cut / 2):
+                cut = window_segments[-1]['start']
+                window_segments = window_segments[:-1]
+            
+            for segment in window_segments:
+                segment['start'] += offset
+                segment['end'] += offset
+                for word in segment.get('words') or ():
+                    word['start'] += offset
+                    word['end'] += offset
+                yield segment
+            
+            text = ' '.join(s['text'].strip() for s in window_segments)
+            if text:
+                prompt = (prompt + ' ' + text)[-settings.TRANSCRIPTION_PROMPT_CHARS:]
+            
+            # Копия, чтобы не удерживать буфер всего окна
+            carry = audio[int(cut * SAMPLE_RATE):].copy()
+            offset += cut
+            
+            if is_last:
+                break
     
     def _send_progress(self, call_id, progress, text, segment=None):
         """
         Отправляет прогресс транскрипции через WebSocket.
         """
         try:
-            async_to_sync(self.channel_layer.group_send)(
+            send_to_group(
                 f'transcription_{call_id}',
                 {
                     'type': 'transcription_progress',
@@ -151,14 +451,14 @@ class TranscriptionService:
                 }
             )
         except Exception as e:
-            logger.error(f"Ошибка отправки прогресса: {e}")
+            logger.error("Ошибка отправки прогресса: %s", e)
     
     def _send_error(self, call_id, error_message):
         """
         Отправляет сообщение об ошибке через WebSocket.
         """
         try:
-            async_to_sync(self.channel_layer.group_send)(
+            send_to_group(
                 f'transcription_{call_id}',
                 {
                     'type': 'transcription_error',
@@ -167,7 +467,7 @@ class TranscriptionService:
                 }
             )
         except Exception as e:
-            logger.error(f"Ошибка отправки ошибки: {e}")
+            logger.error("Ошибка отправки ошибки: %s", e)
 
 
 class AnalysisService:
@@ -178,26 +478,50 @@ class AnalysisService:
     def __init__(self):
         """Инициализирует NLP модели."""
         import spacy
+        from django.conf import settings
         
-        try:
-            self.nlp_ru = spacy.load('ru_core_news_sm')
-        except:
-            logger.warning("Русская модель spaCy не найдена")
-            self.nlp_ru = None
-        
-        try:
-            self.nlp_en = spacy.load('en_core_web_sm')
-        except:
-            logger.warning("Английская модель spaCy не найдена")
-            self.nlp_en = None
+        # Синтаксический разбор и NER анализу не нужны
+        disabled = settings.SPACY_DISABLED_COMPONENTS
+        with stage('model_load', model='spacy'):
+            try:
+                self.nlp_ru = spacy.load('ru_core_news_sm', disable=disabled)
+            except:
+                logger.warning("Русская модель spaCy не найдена")
+                self.nlp_ru = None
+            
+            try:
+                self.nlp_en = spacy.load('en_core_web_sm', disable=disabled)
+            except:
+                logger.warning("Английская модель spaCy не найдена")
+                self.nlp_en = None
+        
+        self.pipelines = {'ru': self.nlp_ru, 'en': self.nlp_en}
+        # Отпечатки по языкам; живут вместе с экземпляром из get_analysis_service,
+        # поэтому проверка актуальности анализа в задачах не пересчитывает их
+        self._fingerprints = {}
     
-    def analyze(self, call):
+    def fingerprint(self, language):
+        """
+        Отпечаток анализатора языка. Пересчитывается только
+        при смене версии словарей.
         """
-        Анализирует текст транскрипции звонка.
+        version = lexicon.lexicon_version()
+        cached = self._fingerprints.get(language)
+        if cached is None or cached[0] != version:
+            cached = (version, analyzer_fingerprint(self.pipelines.get(language), language))
+            self._fingerprints[language] = cached
+        return cached[1]
+    
+    def analyze(self, call, force=False):
+        """
+        Анализирует текст транскрипции звонка. Если анализ уже выполнен
+        по тому же тексту той же версией анализатора, он возвращается
+        без повторной обработки.
         
         Args:
             call: Объект Call для анализа
-            
+            force: Анализировать, даже если анализ актуален
+        
         Returns:
             CallAnalysis: Созданный объект анализа
         """
@@ -206,153 +530,254 @@ class AnalysisService:
         if not hasattr(call, 'transcription'):
             raise ValueError("Звонок не имеет транскрипции")
         
-        logger.info(f"Начало анализа звонка {call.id}")
+        logger.info("Начало анализа звонка %s", call.id)
         
         text = call.transcription.text
         
-        # Выбираем модель в зависимости от языка
-        nlp = self.nlp_ru if call.language == 'ru' else self.nlp_en
+        # Выбираем модель по языку звонка (определенному по аудио или указанному пользователем)
+        nlp = self.pipelines.get(call.language)
         
         if not nlp:
-            logger.warning(f"NLP модель для языка {call.language} не доступна")
+            logger.warning("NLP модель для языка %s не доступна", call.language)
             return None
         
-        # Обрабатываем текст
-        doc = nlp(text)
-        
-        # Извлекаем ключевые слова
-        keywords = self._extract_keywords(doc)
-        
-        # Подсчитываем частоту слов
-        word_frequency = self._calculate_word_frequency(text)
-        
-        # Определяем категорию
-        category = self._classify_category(text, keywords)
-        
-        # Определяем тональность
-        sentiment = self._analyze_sentiment(text)
+        if not force:
+            current = CallAnalysis.objects.filter(
+                call=call,
+                analyzer_version=self.fingerprint(call.language),
+                text_hash=text_hash(text)
+            ).first()
+            if current is not None:
+                metrics.incr('analysis_skipped', language=call.language)
+                logger.info("Анализ звонка %s актуален, пропуск", call.id)
+                return current
         
-        # Статистика говорящих (упрощенная версия)
-        speaker_stats = self._analyze_speakers(call.transcription.segments)
+        # Обрабатываем текст: один проход spaCy, дальше все шаги
+        # работают с общим потоком токенов
+        with stage('analysis.nlp', chars=len(text)):
+            tokens = TokenStream(nlp(text))
         
-        # Создаем краткое содержание
-        summary = self._generate_summary(text, keywords[:5])
+        fields = self.analysis_fields(call.transcription, tokens, call.language)
         
         # Создаем анализ
-        analysis = CallAnalysis.objects.create(
-            call=call,
-            category=category,
-            keywords=keywords,
-            sentiment=sentiment,
-            word_frequency=word_frequency,
-            speaker_stats=speaker_stats,
-            summary=summary
-        )
+        analysis, _ = CallAnalysis.objects.update_or_create(call=call, defaults=fields)
         
-        logger.info(f"Анализ звонка {call.id} завершен")
+        logger.info("Анализ звонка %s завершен", call.id)
         
         return analysis
     
-    def _extract_keywords(self, doc):
-        """
-        Извлекает ключевые слова из документа.
+    def analyze_text(self, text, language):
         """
-        keywords = []
+        Анализирует текст без звонка и аудио. Результат не сохраняется
+        и не учитывается в документных частотах корпуса.
         
-        for token in doc:
-            # Фильтруем по части речи и длине
-            if (token.pos_ in ['NOUN', 'PROPN', 'VERB', 'ADJ'] and
-                len(token.text) > 3 and
-                not token.is_stop):
-                keywords.append(token.lemma_.lower())
+        Args:
+            text: Текст для анализа
+            language: Язык текста
         
-        # Возвращаем топ 20 уникальных слов
-        counter = Counter(keywords)
-        return [word for word, count in counter.most_common(20)]
-    
-    def _calculate_word_frequency(self, text):
-        """
-        Подсчитывает частоту слов в тексте.
+        Returns:
+            CallAnalysis: Несохраненный объект анализа или None, если нет модели языка
         """
-        # Простая токенизация
-        words = re.findall(r'\b\w+\b', text.lower())
+        from .models import CallAnalysis, Transcription
         
-        # Фильтруем короткие слова
-        words = [w for w in words if len(w) > 3]
+        nlp = self.pipelines.get(language)
+        if not nlp:
+            logger.warning("NLP модель для языка %s не доступна", language)
+            return None
         
-        # Подсчитываем частоту
-        counter = Counter(words)
+        with stage('analysis.nlp', chars=len(text)):
+            tokens = TokenStream(nlp(text))
         
-        # Возвращаем топ 50
-        return dict(counter.most_common(50))
+        return CallAnalysis(**self.analysis_fields(Transcription(text=text), tokens, language))
     
-    def _classify_category(self, text, keywords):
+    def analysis_fields(self, transcription, tokens, language):
         """
-        Классифицирует звонок по категории на основе ключевых слов.
+        Поля CallAnalysis по уже обработанному spaCy тексту.
+        Используется и при анализе одного звонка, и при массовом
+        переанализе (команда reanalyze_calls), где документы
+        обрабатываются пачками через nlp.pipe.
+        
+        Args:
+            transcription: Транскрипция звонка
+            tokens: TokenStream текста транскрипции
+            language: Язык звонка
+        
+        Returns:
+            dict: Значения полей анализа
         """
-        text_lower = text.lower()
+        # Извлекаем ключевые слова (TF-IDF по документным частотам корпуса)
+        keywords, terms = self._extract_keywords(tokens, language)
+        
+        # Подсчитываем частоту слов
+        word_frequency = self._calculate_word_frequency(tokens)
         
-        # Упрощенная классификация по ключевым словам
-        complaint_words = ['жалоба', 'проблема', 'плохо', 'недовольн', 'complaint', 'problem']
-        order_words = ['заказ', 'купить', 'оформить', 'order', 'purchase', 'buy']
-        support_words = ['помощь', 'поддержка', 'как', 'вопрос', 'help', 'support', 'question']
+        # Один проход словарей языка по началам слов: баллы категорий и тональности
+        with stage('analysis.lexicon'):
+            lexicon_result = lexicon.scan_tokens(tokens, language)
         
-        for word in complaint_words:
-            if word in text_lower:
-                return 'complaint'
+        # Определяем категорию
+        category = self._classify_category(lexicon_result)
+        
+        # Определяем тональность
+        sentiment = self._analyze_sentiment(lexicon_result)
         
-        for word in order_words:
-            if word in text_lower:
-                return 'order'
+        # Тональность по сегментам: шкала и сводные показатели
+        with stage('analysis.sentiment_timeline'):
+            timeline = timeline_fields(transcription.segments, language)
         
-        for word in support_words:
-            if word in text_lower:
-                return 'support'
+        # Создаем краткое содержание
+        with stage('analysis.summary'):
+            summary = self._generate_summary(tokens, keywords[:5])
+        
+        return {
+            'category': category,
+            'keywords': keywords,
+            'sentiment': sentiment,
+            'word_frequency': word_frequency,
+            'summary': summary,
+            'lexicon_scores': lexicon_result,
+            'document_terms': terms,
+            'analyzer_version': self.fingerprint(language),
+            'text_hash': text_hash(transcription.text),
+            **timeline,
+        }
+    
+    def _extract_keywords(self, tokens, language):
+        """
+        Извлекает ключевые слова: леммы существительных, глаголов
+        и прилагательных без стоп-слов, ранжированные по TF-IDF,
+        чтобы общие для всех звонков слова не вытесняли характерные.
         
-        return 'inquiry'
+        Returns:
+            tuple: (ключевые слова, термины документа для таблицы частот)
+        """
+        terms, counts = tokens.keyword_counts()
+        keywords = corpus.rank_keywords(language, [(terms, counts)], limit=20)[0]
+        return keywords, corpus.document_terms(language, terms)
+    
+    def _calculate_word_frequency(self, tokens):
+        """
+        Подсчитывает частоту слов в тексте (топ 50).
+        """
+        return tokens.word_frequency(limit=50)
+    
+    def _classify_category(self, lexicon_result):
+        """
+        Категория звонка: наибольший суммарный вес терминов категории.
+        """
+        return lexicon.best_category(lexicon_result['categories'])
+    
+    def _analyze_sentiment(self, lexicon_result):
+        """
+        Тональность по суммарным весам позитивных и негативных терминов.
+        """
+        return lexicon.sentiment_label(lexicon_result['sentiment'])
     
-    def _analyze_sentiment(self, text):
+    def _generate_summary(self, tokens, top_keywords):
         """
-        Анализирует тональность текста (упрощенная версия).
+        Генерирует краткое содержание: наиболее характерные предложения
+        разговора в пределах SUMMARY_MAX_CHARS + ключевые слова.
         """
-        text_lower = text.lower()
+        from django.conf import settings
         
-        positive_words = ['хорошо', 'отлично', 'спасибо', 'благодарю', 'good', 'great', 'thanks']
-        negative_words = ['плохо', 'ужасно', 'проблема', 'жалоба', 'bad', 'terrible', 'problem']
+        summary = summarize(tokens, settings.SUMMARY_MAX_CHARS)
         
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
+        summary += f"\n\nКлючевые слова: {', '.join(top_keywords)}"
         
-        if positive_count > negative_count:
-            return 'positive'
-        elif negative_count > positive_count:
-            return 'negative'
-        else:
-            return 'neutral'
+        return summary
+
+
+def load_call_pcm(call):
+    """
+    PCM звонка для анализа аудио после транскрипции: из кеша,
+    заполненного при транскрипции (memmap, без повторного декодирования).
     
-    def _analyze_speakers(self, segments):
-        """
-        Анализирует статистику говорящих (упрощенная версия).
+    Returns:
+        np.ndarray | None: Отсчеты float32 или None, если аудио недоступно
+    """
+    try:
+        return audio_cache.load_pcm(call.audio_file.path)
+    except Exception as e:
+        logger.warning("Аудио звонка %s недоступно для анализа: %s", call.id, e)
+        return None
+
+
+class DiarizationService:
+    """
+    Сервис разделения дикторов (calls/diarization.py): заполняет
+    CallAnalysis.speaker_stats.
+    """
+    
+    def diarize(self, call, pcm=None):
         """
-        if not segments:
-            return {}
+        Считает статистику говорящих звонка и сохраняет ее в анализ.
+        Если аудио недоступно или разделение выключено, сохраняется
+        статистика по сегментам без дикторов.
         
-        total_duration = segments[-1]['end'] if segments else 0
+        Args:
+            call: Объект Call с транскрипцией
+            pcm: Уже загруженный PCM звонка (load_call_pcm)
         
-        return {
-            'total_segments': len(segments),
-            'total_duration': total_duration,
-            'average_segment_length': total_duration / len(segments) if segments else 0
-        }
+        Returns:
+            dict: Статистика говорящих
+        """
+        from django.conf import settings
+        from .models import CallAnalysis
+        
+        segments = call.transcription.segments
+        stats = None
+        
+        if settings.DIARIZATION_ENABLED and segments:
+            if pcm is None:
+                pcm = load_call_pcm(call)
+            if pcm is not None:
+                seconds = pcm.size / SAMPLE_RATE
+                started = time.perf_counter()
+                try:
+                    with stage('diarization.cluster', seconds=round(seconds)):
+                        stats = diarization.speaker_stats(
+                            pcm, SAMPLE_RATE, segments, settings.DIARIZATION_SPEAKERS
+                        )
+                except Exception as e:
+                    logger.warning("Не удалось разделить дикторов звонка %s: %s", call.id, e)
+                if stats is not None and seconds:
+                    metrics.observe('diarization_realtime_factor', (time.perf_counter() - started) / seconds)
+        
+        if stats is None:
+            stats = diarization.basic_stats(segments)
+        
+        CallAnalysis.objects.filter(call=call).update(speaker_stats=stats)
+        logger.info("Статистика говорящих звонка %s: %s дикторов", call.id, stats.get('speaker_count', '-'))
+        
+        return stats
+
+
+class AcousticService:
+    """
+    Сервис акустических показателей (calls/acoustics.py): громкость,
+    доля тишины, время удержания и темп речи в полях CallAnalysis.
+    """
     
-    def _generate_summary(self, text, top_keywords):
+    def measure(self, call, pcm=None):
         """
-        Генерирует краткое содержание (первые 200 символов + ключевые слова).
+        Считает акустические показатели звонка и сохраняет их в анализ.
+        
+        Args:
+            call: Объект Call с транскрипцией
+            pcm: Уже загруженный PCM звонка (load_call_pcm)
+        
+        Returns:
+            dict: Показатели (пустые, если аудио недоступно)
         """
-        summary = text[:200].strip()
-        if len(text) > 200:
-            summary += '...'
+        from .models import CallAnalysis
         
-        summary += f"\n\nКлючевые слова: {', '.join(top_keywords)}"
+        if pcm is None:
+            pcm = load_call_pcm(call)
+        if pcm is None:
+            return dict(acoustics.EMPTY_METRICS)
         
-        return summary
+        with stage('acoustics.measure', seconds=round(pcm.size / SAMPLE_RATE)):
+            values = acoustics.measure(pcm, SAMPLE_RATE, call.transcription.segments)
+        
+        CallAnalysis.objects.filter(call=call).update(**values)
+        return values
@@ -3,11 +3,11 @@ Django signals для отправки WebSocket уведомлений при 
 """
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 import logging
 
-from .models import Call, Transcription, CallAnalysis
+from .models import Call, Transcription, CallAnalysis, LexiconEntry
+from . import corpus, lexicon
+from .realtime import send_to_group
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +17,10 @@ def call_saved(sender, instance, created, **kwargs):
     """
     Отправляет WebSocket уведомление при создании или обновлении звонка.
     """
-    channel_layer = get_channel_layer()
-    
     try:
         # Уведомление для группы пользователя
-        async_to_sync(channel_layer.group_send)(
-            f'user_calls_{instance.user.id}',
+        send_to_group(
+            f'user_calls_{instance.user_id}',
             {
                 'type': 'call_created' if created else 'call_updated',
                 'call_id': str(instance.id),
@@ -39,7 +37,7 @@ def call_saved(sender, instance, created, **kwargs):
         
         # Уведомление об изменении статуса для конкретного звонка
         if not created:
-            async_to_sync(channel_layer.group_send)(
+            send_to_group(
                 f'transcription_{instance.id}',
                 {
                     'type': 'status_update',
@@ -48,9 +46,9 @@ def call_saved(sender, instance, created, **kwargs):
                     'message': f'Статус обновлен на: {instance.get_status_display()}'
                 }
             )
-        
+    
     except Exception as e:
-        logger.error(f"Ошибка отправки WebSocket уведомления: {e}")
+        logger.error("Ошибка отправки WebSocket уведомления: %s", e)
 
 
 @receiver(post_delete, sender=Call)
@@ -58,18 +56,16 @@ def call_deleted(sender, instance, **kwargs):
     """
     Отправляет WebSocket уведомление при удалении звонка.
     """
-    channel_layer = get_channel_layer()
-    
     try:
-        async_to_sync(channel_layer.group_send)(
-            f'user_calls_{instance.user.id}',
+        send_to_group(
+            f'user_calls_{instance.user_id}',
             {
                 'type': 'call_deleted',
                 'call_id': str(instance.id)
             }
         )
     except Exception as e:
-        logger.error(f"Ошибка отправки WebSocket уведомления об удалении: {e}")
+        logger.error("Ошибка отправки WebSocket уведомления об удалении: %s", e)
 
 
 @receiver(post_save, sender=Transcription)
@@ -80,24 +76,43 @@ def transcription_saved(sender, instance, created, **kwargs):
     if not created:
         return
     
-    channel_layer = get_channel_layer()
-    
     try:
-        async_to_sync(channel_layer.group_send)(
-            f'transcription_{instance.call.id}',
+        send_to_group(
+            f'transcription_{instance.call_id}',
             {
                 'type': 'transcription_completed',
-                'call_id': str(instance.call.id),
+                'call_id': str(instance.call_id),
                 'transcription': {
                     'id': str(instance.id),
                     'text': instance.text,
                     'confidence': instance.confidence,
-                    'segments': instance.segments
+                    'segments': instance.segments.to_list()
                 }
             }
         )
     except Exception as e:
-        logger.error(f"Ошибка отправки уведомления о транскрипции: {e}")
+        logger.error("Ошибка отправки уведомления о транскрипции: %s", e)
+
+
+@receiver(post_save, sender=CallAnalysis)
+def analysis_document_saved(sender, instance, update_fields=None, **kwargs):
+    """
+    Учитывает термины анализа в документных частотах: при создании
+    прибавляет, при повторном анализе применяет разницу с прежними.
+    """
+    if update_fields is not None and 'document_terms' not in update_fields:
+        return
+    
+    previous = getattr(instance, '_saved_document_terms', None)
+    if previous != instance.document_terms:
+        corpus.replace_document(previous, instance.document_terms)
+    instance._saved_document_terms = instance.document_terms
+
+
+@receiver(post_delete, sender=CallAnalysis)
+def analysis_document_deleted(sender, instance, **kwargs):
+    """Вычитает термины удаленного анализа из документных частот."""
+    corpus.replace_document(instance.document_terms, None)
 
 
 @receiver(post_save, sender=CallAnalysis)
@@ -108,17 +123,25 @@ def analysis_saved(sender, instance, created, **kwargs):
     if not created:
         return
     
-    channel_layer = get_channel_layer()
-    
     try:
-        async_to_sync(channel_layer.group_send)(
-            f'transcription_{instance.call.id}',
+        send_to_group(
+            f'transcription_{instance.call_id}',
             {
                 'type': 'status_update',
-                'call_id': str(instance.call.id),
+                'call_id': str(instance.call_id),
                 'status': 'analysis_completed',
                 'message': 'Анализ звонка завершен'
             }
         )
     except Exception as e:
-        logger.error(f"Ошибка отправки уведомления об анализе: {e}")
+        logger.error("Ошибка отправки уведомления об анализе: %s", e)
+
+
+@receiver(post_save, sender=LexiconEntry)
+@receiver(post_delete, sender=LexiconEntry)
+def lexicon_changed(sender, **kwargs):
+    """
+    Сбрасывает кеш словарей процесса: автоматы пересоберутся при следующем
+    анализе. Другие процессы заметят изменение по версии словарей.
+    """
+    lexicon.invalidate()
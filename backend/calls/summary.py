@@ -0,0 +1,112 @@
+"""
+Экстрактивное краткое содержание звонка.
+
+Текст делится на предложения, предложения переводятся в разреженные
+векторы TF-IDF по леммам значимых слов (из общего потока токенов анализа,
+calls/tokens.py). Вес предложения - косинусная близость к центроиду всех
+предложений звонка. В краткое содержание попадают самые близкие
+к центроиду предложения, которые помещаются в бюджет длины и не повторяют
+уже выбранные, в порядке следования в разговоре.
+"""
+import re
+
+import numpy as np
+from scipy import sparse
+
+# Предложение: до знака конца предложения включительно или до конца текста
+SENTENCE_RE = re.compile(r'[^\s.!?…][^.!?…]*(?:[.!?…]+|$)')
+
+# Предложения с меньшим числом значимых слов не выбираются
+MIN_SENTENCE_TERMS = 3
+
+# Предложение, косинусная близость которого к уже выбранному выше порога,
+# считается повтором
+REDUNDANCY_THRESHOLD = 0.7
+
+
+def summarize(tokens, max_chars):
+    """
+    Краткое содержание из предложений текста.
+    
+    Args:
+        tokens: TokenStream текста транскрипции
+        max_chars: Бюджет длины в символах
+    
+    Returns:
+        str: Выбранные предложения в порядке следования
+    """
+    text = tokens.text.strip()
+    if len(text) <= max_chars:
+        return text
+    
+    spans = [match.span() for match in SENTENCE_RE.finditer(tokens.text)]
+    mask = tokens.content_mask()
+    if len(spans) < 2 or not mask.any():
+        return _truncate(text, max_chars)
+    
+    matrix = _sentence_matrix(spans, tokens.start[mask], tokens.lemma[mask])
+    
+    centroid = np.asarray(matrix.sum(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    if not norm:
+        return _truncate(text, max_chars)
+    scores = matrix @ (centroid / norm)
+    scores[np.diff(matrix.indptr) < MIN_SENTENCE_TERMS] = 0.0
+    
+    chosen = []
+    chosen_vectors = np.zeros((0, matrix.shape[1]))
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        if scores[index] <= 0:
+            break
+        start, end = spans[index]
+        length = len(tokens.text[start:end].strip()) + 1
+        if used + length > max_chars:
+            continue
+        
+        row = slice(matrix.indptr[index], matrix.indptr[index + 1])
+        columns, weights = matrix.indices[row], matrix.data[row]
+        if chosen and (chosen_vectors[:, columns] @ weights).max() > REDUNDANCY_THRESHOLD:
+            continue
+        
+        dense = np.zeros(matrix.shape[1])
+        dense[columns] = weights
+        chosen_vectors = np.vstack([chosen_vectors, dense])
+        chosen.append(index)
+        used += length
+    
+    if not chosen:
+        return _truncate(text, max_chars)
+    
+    return ' '.join(tokens.text[slice(*spans[index])].strip() for index in sorted(chosen))
+
+
+def _sentence_matrix(spans, positions, lemmas):
+    """
+    Матрица предложения x леммы: сублинейный TF, IDF по предложениям
+    звонка, строки нормированы по L2.
+    """
+    starts = np.fromiter((start for start, _ in spans), dtype=np.int64, count=len(spans))
+    rows = np.maximum(np.searchsorted(starts, positions, side='right') - 1, 0)
+    _, columns = np.unique(lemmas, return_inverse=True)
+    
+    # При переводе в CSR повторы леммы в предложении суммируются
+    matrix = sparse.coo_matrix(
+        (np.ones(rows.size), (rows, columns.ravel())),
+        shape=(len(spans), int(columns.max()) + 1)
+    ).tocsr()
+    
+    sentence_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    idf = np.log((1.0 + len(spans)) / (1.0 + sentence_frequency)) + 1.0
+    matrix.data = (1.0 + np.log(matrix.data)) * idf[matrix.indices]
+    
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def _truncate(text, max_chars):
+    """Начало текста по границе слова."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0].rstrip() + '...'
@@ -1,24 +1,94 @@
 """
 Celery задачи для обработки звонков.
 """
+from asgiref.sync import async_to_sync
 from celery import shared_task
+from django.conf import settings
 from django.core.files import File
 import logging
 import asyncio
 
+from call_system.logging_config import bind_log_context
+from call_system.task_profiler import stage
+
 logger = logging.getLogger(__name__)
 
 
+def pipeline_stages(stages=None):
+    """
+    Выбранные этапы обработки (Call.STAGE_CHOICES).
+    
+    Args:
+        stages: Имена этапов или None для всех
+    
+    Returns:
+        set: Имена этапов
+    """
+    from .models import Call
+    
+    names = {name for name, _ in Call.STAGE_CHOICES}
+    return names if stages is None else names & set(stages)
+
+
+def start_call_processing(call_id, status_message=None, stages=None):
+    """
+    Запускает обработку загруженного звонка: быстрый черновик
+    (если включен) и полную обработку.
+    
+    Args:
+        call_id: ID звонка
+        status_message: (chat_id, message_id) статусного сообщения Telegram бота
+        stages: Этапы обработки (по умолчанию все)
+    """
+    if settings.TRANSCRIPTION_DRAFT_ENABLED and 'transcribe' in pipeline_stages(stages):
+        draft_transcription_task.delay(call_id, status_message=status_message)
+    process_call_task.delay(call_id, status_message=status_message, stages=stages)
+
+
+def run_text_stages(call, stages):
+    """
+    Этапы после транскрипции: анализ текста, дикторы и акустические
+    показатели. Дикторы и акустика считаются по PCM, закешированному
+    при транскрипции (один memmap на оба этапа).
+    
+    Args:
+        call: Звонок с сохраненной транскрипцией
+        stages: Выбранные этапы (pipeline_stages)
+    """
+    from .services import DiarizationService, AcousticService, get_analysis_service, load_call_pcm
+    
+    if 'analyze' in stages:
+        with stage('analysis'):
+            get_analysis_service().analyze(call)
+        logger.info("Анализ звонка %s завершен", call.id)
+    
+    if stages & {'diarize', 'acoustics'}:
+        pcm = load_call_pcm(call)
+        if 'diarize' in stages:
+            with stage('diarization'):
+                DiarizationService().diarize(call, pcm)
+        if 'acoustics' in stages:
+            with stage('acoustics'):
+                AcousticService().measure(call, pcm)
+
+
 @shared_task(bind=True, max_retries=3)
-def process_call_task(self, call_id):
+def process_call_task(self, call_id, status_message=None, stages=None):
     """
     Асинхронная обработка звонка: транскрипция и анализ.
     
     Args:
         call_id: ID звонка для обработки
+        status_message: (chat_id, message_id) статусного сообщения Telegram бота,
+            в котором итоговая транскрипция заменит черновик
+        stages: Этапы обработки (по умолчанию все)
     """
     from .models import Call
-    from .services import TranscriptionService, AnalysisService
+    from .services import TranscriptionService
+    from .prefetch import prefetch_upcoming
+    
+    bind_log_context(call_id=call_id)
+    selected = pipeline_stages(stages)
     
     try:
         # Получаем звонок
@@ -26,39 +96,47 @@ def process_call_task(self, call_id):
         call.status = 'processing'
         call.save()
         
-        logger.info(f"Начало обработки звонка {call_id}")
-        
-        # Транскрибируем аудио
-        transcription_service = TranscriptionService()
-        transcription_data = transcription_service.transcribe(call)
-        
-        logger.info(f"Транскрипция звонка {call_id} завершена")
+        logger.info("Начало обработки звонка %s, этапы: %s", call_id, ', '.join(sorted(selected)))
         
-        # Анализируем текст
-        analysis_service = AnalysisService()
-        analysis_service.analyze(call)
+        transcription_data = {}
+        if 'transcribe' in selected:
+            # Пока идет инференс этого звонка, пул воркера декодирует следующие
+            prefetch_upcoming(current_call_id=call_id)
+            
+            # Транскрибируем аудио
+            with stage('transcription'):
+                transcription_service = TranscriptionService()
+                transcription_data = transcription_service.transcribe(call)
+            
+            logger.info("Транскрипция звонка %s завершена", call_id)
         
-        logger.info(f"Анализ звонка {call_id} завершен")
+        run_text_stages(call, selected)
         
         # Обновляем статус
         call.status = 'completed'
         call.save()
         
         # Отправляем уведомление пользователю
-        send_notification_task.delay(call.user.id, call_id)
+        if 'notify' in selected:
+            send_notification_task.delay(call.user_id, call_id, status_message=status_message)
+        
+        # Второй проход каскада: сомнительные сегменты уточняет крупная модель
+        # в очереди TRANSCRIPTION_CASCADE_QUEUE (обрабатывается в непиковое время)
+        if transcription_data.get('refine_count') and settings.TRANSCRIPTION_CASCADE_ENABLED:
+            refine_transcription_task.delay(call_id, stages=stages)
         
         return {
             'status': 'success',
             'call_id': call_id,
             'transcription_length': len(transcription_data.get('text', ''))
         }
-        
+    
     except Call.DoesNotExist:
-        logger.error(f"Звонок {call_id} не найден")
+        logger.error("Звонок %s не найден", call_id)
         return {'status': 'error', 'message': 'Call not found'}
-        
+    
     except Exception as exc:
-        logger.error(f"Ошибка при обработке звонка {call_id}: {str(exc)}")
+        logger.error("Ошибка при обработке звонка %s: %s", call_id, exc)
         
         # Обновляем статус на ошибку
         try:
@@ -73,30 +151,224 @@ def process_call_task(self, call_id):
 
 
 @shared_task
-def send_notification_task(user_id, call_id):
+def draft_transcription_task(call_id, status_message=None):
+    """
+    Черновик транскрипции: модель WHISPER_DRAFT_MODEL по первым
+    TRANSCRIPTION_DRAFT_SECONDS секундам. Публикуется в группу
+    transcription_<id> и в статусное сообщение Telegram; итоговая
+    транскрипция (transcription_completed) заменяет его.
+    
+    Args:
+        call_id: ID звонка
+        status_message: (chat_id, message_id) статусного сообщения Telegram бота
+    """
+    from .models import Call, Transcription
+    from .services import TranscriptionService
+    from .realtime import send_to_group
+    
+    bind_log_context(call_id=call_id)
+    
+    try:
+        call = Call.objects.get(id=call_id)
+        
+        # Полная обработка могла завершиться раньше, черновик уже не нужен
+        if Transcription.objects.filter(call_id=call_id).exists():
+            return {'status': 'skipped', 'call_id': call_id}
+        
+        seconds = settings.TRANSCRIPTION_DRAFT_SECONDS
+        with stage('transcription.draft'):
+            text = TranscriptionService(settings.WHISPER_DRAFT_MODEL).transcribe_draft(call, seconds)
+        
+        if not text or Transcription.objects.filter(call_id=call_id).exists():
+            return {'status': 'skipped', 'call_id': call_id}
+        
+        send_to_group(
+            f'transcription_{call_id}',
+            {
+                'type': 'transcription_draft',
+                'call_id': str(call_id),
+                'text': text,
+                'seconds': seconds,
+                'model': settings.WHISPER_DRAFT_MODEL
+            }
+        )
+        
+        if status_message:
+            from .notifications import TelegramNotifier
+            async_to_sync(TelegramNotifier().send_draft)(status_message, call_id, text, seconds)
+        
+        logger.info("Черновик транскрипции звонка %s опубликован", call_id)
+        return {'status': 'success', 'call_id': call_id, 'draft_length': len(text)}
+    
+    except Call.DoesNotExist:
+        logger.error("Звонок %s не найден", call_id)
+        return {'status': 'error', 'message': 'Call not found'}
+    except Exception as exc:
+        # Черновик необязателен: ошибки не влияют на основную обработку
+        logger.warning("Ошибка черновика транскрипции звонка %s: %s", call_id, exc)
+        return {'status': 'error', 'message': str(exc)}
+
+
+@shared_task(bind=True, max_retries=2)
+def refine_transcription_task(self, call_id, stages=None):
+    """
+    Повторная транскрипция сегментов с низким качеством моделью
+    WHISPER_CASCADE_MODEL и повторный анализ уточненного текста.
+    
+    Args:
+        call_id: ID звонка
+        stages: Этапы обработки звонка; без analyze текст не анализируется
+    """
+    from .models import Call
+    from .services import TranscriptionService, get_analysis_service
+    from .realtime import send_to_group
+    
+    bind_log_context(call_id=call_id)
+    
+    try:
+        call = Call.objects.select_related('transcription').get(id=call_id)
+        
+        with stage('transcription.refine'):
+            refined = TranscriptionService(settings.WHISPER_CASCADE_MODEL).refine(call)
+        
+        if not refined:
+            return {'status': 'success', 'call_id': call_id, 'refined_segments': 0}
+        
+        if 'analyze' in pipeline_stages(stages):
+            with stage('analysis'):
+                get_analysis_service().analyze(call)
+        
+        send_to_group(
+            f'transcription_{call_id}',
+            {
+                'type': 'status_update',
+                'call_id': str(call_id),
+                'status': 'transcription_refined',
+                'message': 'Транскрипция уточнена'
+            }
+        )
+        
+        logger.info("Уточнено %d сегментов звонка %s", refined, call_id)
+        return {'status': 'success', 'call_id': call_id, 'refined_segments': refined}
+    
+    except Call.DoesNotExist:
+        logger.error("Звонок %s не найден", call_id)
+        return {'status': 'error', 'message': 'Call not found'}
+    
+    except Exception as exc:
+        logger.error("Ошибка уточнения транскрипции звонка %s: %s", call_id, exc)
+        raise self.retry(exc=exc, countdown=300)
+
+
+@shared_task(bind=True, max_retries=3)
+def analyze_call_task(self, call_id, stages=None):
+    """
+    Анализ звонка, транскрипция которого уже сохранена
+    (например, потоковой сессией ws/live/).
+    
+    Args:
+        call_id: ID звонка
+        stages: Этапы обработки (по умолчанию все; transcribe не выполняется)
+    """
+    from .models import Call
+    
+    bind_log_context(call_id=call_id)
+    selected = pipeline_stages(stages) - {'transcribe'}
+    
+    try:
+        call = Call.objects.select_related('transcription').get(id=call_id)
+        
+        run_text_stages(call, selected)
+        
+        call.status = 'completed'
+        call.save(update_fields=['status', 'updated_at'])
+        
+        if 'notify' in selected:
+            send_notification_task.delay(call.user_id, call_id)
+        
+        logger.info("Анализ звонка %s завершен", call_id)
+        return {'status': 'success', 'call_id': call_id}
+    
+    except Call.DoesNotExist:
+        logger.error("Звонок %s не найден", call_id)
+        return {'status': 'error', 'message': 'Call not found'}
+    
+    except Exception as exc:
+        logger.error("Ошибка анализа звонка %s: %s", call_id, exc)
+        Call.objects.filter(id=call_id).update(status='failed')
+        raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task
+def send_notification_task(user_id, call_id, status_message=None):
     """
     Отправляет уведомление пользователю о готовности транскрипции.
     
     Args:
         user_id: ID пользователя
         call_id: ID звонка
+        status_message: (chat_id, message_id) статусного сообщения с черновиком
     """
     from users.models import User
+    from .models import Transcription
     from .notifications import TelegramNotifier
     
+    bind_log_context(user_id=user_id, call_id=call_id)
+    
     try:
         user = User.objects.get(id=user_id)
         
         if user.notifications_enabled and user.telegram_id:
+            text = Transcription.objects.filter(call_id=call_id).values_list('text', flat=True).first()
             notifier = TelegramNotifier()
-            async_to_sync(notifier.send_transcription_ready)(user, call_id)
+            async_to_sync(notifier.send_transcription_ready)(
+                user, call_id, text=text, status_message=status_message
+            )
             
-            logger.info(f"Уведомление отправлено пользователю {user_id}")
-        
+            logger.info("Уведомление отправлено пользователю %s", user_id)
+    
     except User.DoesNotExist:
-        logger.error(f"Пользователь {user_id} не найден")
+        logger.error("Пользователь %s не найден", user_id)
     except Exception as exc:
-        logger.error(f"Ошибка при отправке уведомления: {str(exc)}")
+        logger.error("Ошибка при отправке уведомления: %s", exc)
+
+
+def is_offpeak(hour):
+    """Попадает ли час в TRANSCRIPTION_CASCADE_HOURS (интервал может переходить через полночь)."""
+    start, end = settings.TRANSCRIPTION_CASCADE_HOURS
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+@shared_task
+def sync_offpeak_queue_task():
+    """
+    Включает очередь каскада у воркеров TRANSCRIPTION_CASCADE_WORKER_PREFIX
+    в непиковые часы и отключает в остальное время, чтобы уточнение
+    транскрипций не конкурировало с основной нагрузкой.
+    Запускается Celery Beat каждые 10 минут.
+    """
+    from celery import current_app
+    from django.utils import timezone
+    
+    queue = settings.TRANSCRIPTION_CASCADE_QUEUE
+    replies = current_app.control.ping(timeout=1.0)
+    workers = [
+        name for reply in replies for name in reply
+        if name.startswith(settings.TRANSCRIPTION_CASCADE_WORKER_PREFIX)
+    ]
+    if not workers:
+        return {'status': 'skipped', 'workers': []}
+    
+    enabled = is_offpeak(timezone.localtime().hour)
+    if enabled:
+        current_app.control.add_consumer(queue, destination=workers)
+    else:
+        current_app.control.cancel_consumer(queue, destination=workers)
+    
+    logger.info("Очередь %s %s у воркеров %s", queue, 'включена' if enabled else 'отключена', workers)
+    return {'status': 'success', 'enabled': enabled, 'workers': workers}
 
 
 @shared_task
@@ -111,7 +383,7 @@ def generate_daily_report_task():
         report_service = ReportService()
         report = report_service.generate_daily_report()
         
-        logger.info(f"Ежедневный отчет создан: {report.date}")
+        logger.info("Ежедневный отчет создан: %s", report.date)
         
         # Отправляем отчет админам
         from users.models import User
@@ -124,7 +396,22 @@ def generate_daily_report_task():
                 notifier.send_daily_report(admin, report)
         
         return {'status': 'success', 'report_date': str(report.date)}
-        
+    
     except Exception as exc:
-        logger.error(f"Ошибка при создании отчета: {str(exc)}")
+        logger.error("Ошибка при создании отчета: %s", exc)
         return {'status': 'error', 'message': str(exc)}
+
+
+@shared_task
+def purge_profiles_task():
+    """
+    Удаляет устаревшие профили задач и запросов.
+    Запускается автоматически по расписанию.
+    """
+    from call_system.middleware import purge_request_profiles
+    from call_system.task_profiler import purge_task_profiles
+    
+    tasks_deleted = purge_task_profiles()
+    requests_deleted = purge_request_profiles()
+    logger.info("Удалено профилей задач: %s, запросов: %s", tasks_deleted, requests_deleted)
+    return {'status': 'success', 'task_profiles': tasks_deleted, 'request_profiles': requests_deleted}
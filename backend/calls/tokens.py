@@ -0,0 +1,111 @@
+"""
+Общий поток токенов для шагов анализа.
+
+Документ spaCy переводится в колонки NumPy одним вызовом doc.to_array
+(хеши нижнего регистра и леммы, часть речи, стоп-слово, смещения),
+без создания объекта Token на каждое слово. Ключевые слова, частота слов
+и поиск по словарям работают с этими колонками, а не токенизируют текст
+заново.
+"""
+from collections import Counter
+
+import numpy as np
+
+# Части речи ключевых слов
+KEYWORD_POS = ('NOUN', 'PROPN', 'VERB', 'ADJ')
+# Слова короче не учитываются в ключевых словах и частоте
+MIN_WORD_LENGTH = 4
+
+
+def lowercase(text):
+    """
+    Текст в нижнем регистре той же длины, чтобы смещения токенов
+    оставались верными. У некоторых символов (например, 'İ') нижний
+    регистр длиннее; от них берется первый символ.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(char.lower()[0] for char in text)
+
+
+class TokenStream:
+    """
+    Токены документа колонками:
+    lower, lemma (хеши строк словаря), pos, is_stop, is_alpha, is_digit,
+    start, length (смещение и длина в тексте).
+    """
+    
+    def __init__(self, doc):
+        from spacy.attrs import LOWER, LEMMA, POS, IS_STOP, IS_ALPHA, IS_DIGIT, IDX, LENGTH
+        
+        self.text = doc.text
+        self.strings = doc.vocab.strings
+        
+        columns = doc.to_array([LOWER, LEMMA, POS, IS_STOP, IS_ALPHA, IS_DIGIT, IDX, LENGTH])
+        columns = columns.reshape(-1, 8)
+        self.lower = columns[:, 0]
+        self.lemma = columns[:, 1]
+        self.pos = columns[:, 2]
+        self.is_stop = columns[:, 3].astype(bool)
+        self.is_alpha = columns[:, 4].astype(bool)
+        self.is_digit = columns[:, 5].astype(bool)
+        self.start = columns[:, 6].astype(np.int64)
+        self.length = columns[:, 7].astype(np.int64)
+        self._lowered = None
+    
+    def __len__(self):
+        return self.lower.size
+    
+    @property
+    def lowered(self):
+        """Текст в нижнем регистре (для поиска по словарям), считается один раз."""
+        if self._lowered is None:
+            self._lowered = lowercase(self.text)
+        return self._lowered
+    
+    @property
+    def word_starts(self):
+        """Смещения начала слов (токенов из букв или цифр) по возрастанию."""
+        return self.start[self.is_alpha | self.is_digit].tolist()
+    
+    def keyword_counts(self):
+        """
+        Леммы-кандидаты в ключевые слова с числом вхождений
+        (для ранжирования по TF-IDF, calls/corpus.py).
+        
+        Returns:
+            tuple: (леммы в порядке первого вхождения, массив чисел вхождений)
+        """
+        counts = self._counts(self.lemma[self.content_mask()])
+        return list(counts), np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    
+    def word_frequency(self, limit=50):
+        """
+        Частота слов (буквенно-цифровые токены от MIN_WORD_LENGTH символов).
+        
+        Returns:
+            dict: Слово в нижнем регистре -> число вхождений
+        """
+        mask = (self.is_alpha | self.is_digit) & (self.length >= MIN_WORD_LENGTH)
+        return dict(self._counts(self.lower[mask]).most_common(limit))
+    
+    def content_mask(self):
+        """Маска значимых слов: части речи KEYWORD_POS, не стоп-слова, от MIN_WORD_LENGTH символов."""
+        from spacy import symbols
+        
+        pos_ids = [getattr(symbols, name) for name in KEYWORD_POS]
+        return np.isin(self.pos, pos_ids) & (self.length >= MIN_WORD_LENGTH) & ~self.is_stop
+    
+    def _counts(self, hashes):
+        """
+        Число вхождений строк по массиву хешей в порядке первого вхождения,
+        поэтому при равной частоте most_common ставит выше более раннюю строку.
+        """
+        counter = Counter()
+        if not hashes.size:
+            return counter
+        values, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+        for i in np.argsort(first, kind='stable'):
+            counter[self.strings[int(values[i])].lower()] += int(counts[i])
+        return counter
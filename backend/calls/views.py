@@ -7,7 +7,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from django.db.models import Q
+from django.db.models import Q, Prefetch
 
 from .models import Call, Transcription, CallAnalysis, CallNote
 from .serializers import (
@@ -16,9 +16,13 @@ from .serializers import (
     CallUploadSerializer,
     TranscriptionSerializer,
     CallAnalysisSerializer,
-    CallNoteSerializer
+    CallNoteSerializer,
+    TextAnalysisSerializer,
+    TextAnalysisResultSerializer
 )
-from .tasks import process_call_task
+from .tasks import start_call_processing, process_call_task
+from call_system.logging_config import bind_log_context
+from call_system.tracing import start_trace
 
 
 class CallViewSet(viewsets.ModelViewSet):
@@ -29,21 +33,41 @@ class CallViewSet(viewsets.ModelViewSet):
     
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'source', 'language']
+    filterset_fields = {
+        'status': ['exact'],
+        'source': ['exact'],
+        'language': ['exact'],
+        # Акустические показатели анализа: ?analysis__silence_ratio__gte=0.4
+        'analysis__loudness_dbfs': ['gte', 'lte'],
+        'analysis__silence_ratio': ['gte', 'lte'],
+        'analysis__hold_time': ['gte', 'lte'],
+        'analysis__speaking_rate': ['gte', 'lte'],
+    }
     search_fields = ['transcription__text']
-    ordering_fields = ['created_at', 'duration']
+    ordering_fields = [
+        'created_at', 'duration',
+        'analysis__loudness_dbfs', 'analysis__silence_ratio',
+        'analysis__hold_time', 'analysis__speaking_rate',
+    ]
     ordering = ['-created_at']
     
+    def initial(self, request, *args, **kwargs):
+        """Добавляет пользователя и звонок в контекст логов после аутентификации."""
+        super().initial(request, *args, **kwargs)
+        bind_log_context(user_id=request.user.id, call_id=kwargs.get('pk'))
+    
     def get_queryset(self):
         """Возвращает звонки пользователя или все для админа."""
         user = self.request.user
+        # Автор заметки нужен сериализатору (user_name), подгружаем его вместе с заметками
+        notes = Prefetch('notes', queryset=CallNote.objects.select_related('user'))
         if user.is_admin():
             return Call.objects.all().select_related(
                 'user', 'transcription', 'analysis'
-            ).prefetch_related('notes')
+            ).prefetch_related(notes)
         return Call.objects.filter(user=user).select_related(
             'user', 'transcription', 'analysis'
-        ).prefetch_related('notes')
+        ).prefetch_related(notes)
     
     def get_serializer_class(self):
         """Возвращает соответствующий сериализатор."""
@@ -51,8 +75,22 @@ class CallViewSet(viewsets.ModelViewSet):
             return CallListSerializer
         elif self.action == 'upload':
             return CallUploadSerializer
+        elif self.action == 'analyze_text':
+            return TextAnalysisSerializer
         return CallSerializer
     
+    def perform_update(self, serializer):
+        """
+        При смене языка пользователем обработанный звонок
+        транскрибируется и анализируется заново.
+        """
+        language = serializer.instance.language
+        call = serializer.save()
+        if call.language != language and call.status in ('completed', 'failed'):
+            call.status = 'pending'
+            call.save(update_fields=['status', 'updated_at'])
+            process_call_task.delay(str(call.id))
+    
     @extend_schema(
         summary="Загрузить аудио файл",
         request=CallUploadSerializer,
@@ -62,21 +100,51 @@ class CallViewSet(viewsets.ModelViewSet):
     def upload(self, request):
         """
         Загружает аудио файл и запускает процесс транскрипции.
+        Поле stages ограничивает этапы обработки (например, только
+        transcribe, если клиенту нужен лишь текст).
         """
         serializer = CallUploadSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Создаем запись звонка
-        call = serializer.save(user=request.user, status='pending')
-        
-        # Запускаем асинхронную обработку
-        process_call_task.delay(str(call.id))
+        # Трассировка продолжается в задачах Celery через заголовки
+        with start_trace():
+            # Создаем запись звонка
+            call = serializer.save(user=request.user, status='pending')
+            bind_log_context(call_id=call.id)
+            
+            # Запускаем асинхронную обработку (черновик и полная транскрипция)
+            start_call_processing(str(call.id), stages=serializer.validated_data.get('stages'))
         
         return Response(
             CallSerializer(call).data,
             status=status.HTTP_201_CREATED
         )
     
+    @extend_schema(
+        summary="Анализ текста без аудио",
+        request=TextAnalysisSerializer,
+        responses={200: TextAnalysisResultSerializer}
+    )
+    @action(detail=False, methods=['post'], url_path='analyze-text')
+    def analyze_text(self, request):
+        """
+        Анализирует переданный текст (категория, ключевые слова,
+        тональность, краткое содержание). Звонок не создается.
+        """
+        from .services import get_analysis_service
+        
+        serializer = TextAnalysisSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        analysis = get_analysis_service().analyze_text(**serializer.validated_data)
+        if analysis is None:
+            return Response(
+                {'detail': 'NLP модель для языка не доступна'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        return Response(TextAnalysisResultSerializer(analysis).data)
+    
     @extend_schema(
         summary="Получить транскрипцию звонка",
         responses={200: TranscriptionSerializer}
@@ -170,7 +238,7 @@ class CallNoteViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Возвращает заметки пользователя."""
-        return CallNote.objects.filter(user=self.request.user)
+        return CallNote.objects.filter(user=self.request.user).select_related('user')
     
     def perform_create(self, serializer):
         """Автоматически устанавливает пользователя."""
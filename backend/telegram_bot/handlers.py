@@ -21,6 +21,8 @@ from .utils import (
     format_statistics,
     download_file
 )
+from call_system.logging_config import bind_log_context
+from call_system.tracing import new_trace_id, span
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -152,6 +154,10 @@ async def upload_voice_handler(message: types.Message):
         )
         return
     
+    # Каждое обновление обрабатывается в своей asyncio задаче со своим контекстом,
+    # поэтому trace id и контекст логов не пересекаются между обновлениями
+    bind_log_context(user_id=user.id, trace_id=new_trace_id())
+    
     # Определяем тип файла
     if message.voice:
         file_id = message.voice.file_id
@@ -180,11 +186,12 @@ async def upload_voice_handler(message: types.Message):
             suffix='.ogg' if file_type == 'voice' else '.mp3'
         )
         
-        await bot.download_file(file.file_path, temp_file.name)
+        with span('telegram.download', file_type=file_type):
+            await bot.download_file(file.file_path, temp_file.name)
         
         # Создаем запись звонка
         from calls.models import Call
-        from calls.tasks import process_call_task
+        from calls.tasks import start_call_processing
         from django.core.files import File
         
         with open(temp_file.name, 'rb') as audio_file:
@@ -192,17 +199,18 @@ async def upload_voice_handler(message: types.Message):
                 user=user,
                 audio_file=File(audio_file, name=f'telegram_{file_id}.ogg'),
                 source='telegram',
-                language='ru',
+                # Язык определяется по аудио при транскрипции
+                language_source='auto',
                 status='pending'
             )
         
+        bind_log_context(call_id=call.id)
+        
         # Удаляем временный файл
         os.unlink(temp_file.name)
         
-        # Запускаем обработку
-        process_call_task.delay(str(call.id))
-        
-        # Обновляем сообщение
+        # Обновляем сообщение до запуска задач: дальше его редактирует
+        # черновик, а затем итоговая транскрипция
         await status_message.edit_text(
             f"✅ Файл загружен!\n"
             f"🆔 ID звонка: {call.id}\n"
@@ -211,10 +219,16 @@ async def upload_voice_handler(message: types.Message):
             f"Вы получите уведомление, когда транскрипция будет готова."
         )
         
-        logger.info(f"Звонок {call.id} создан пользователем {user.username} через Telegram")
+        # Запускаем обработку
+        start_call_processing(
+            str(call.id),
+            status_message=(status_message.chat.id, status_message.message_id)
+        )
+        
+        logger.info("Звонок %s создан пользователем %s через Telegram", call.id, user.username)
         
     except Exception as e:
-        logger.error(f"Ошибка загрузки файла: {e}")
+        logger.error("Ошибка загрузки файла: %s", e)
         await status_message.edit_text(
             f"❌ Произошла ошибка при загрузке файла.\n"
             f"Попробуйте еще раз позже."